@@ -0,0 +1,348 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+
+# Stella's options use Ollama's names (plus a few historical aliases); each
+# backend maps them onto what its server understands and drops the rest.
+OLLAMA_OPTION_NAMES = {
+    "batch_size": "num_batch",
+    "gpu_layers": "num_gpu",
+    "f16": None,
+}
+
+OPENAI_OPTION_NAMES = {
+    "temperature": "temperature",
+    "top_p": "top_p",
+    "seed": "seed",
+    "num_predict": "max_tokens",
+    "stop": "stop",
+}
+
+# Samplers that llama.cpp's server (and vLLM for some) accept on top of the
+# OpenAI fields. Load-time settings such as num_ctx or num_thread cannot be
+# changed per request on these servers and are never sent.
+OPENAI_EXTRA_OPTION_NAMES = {
+    "top_k": "top_k",
+    "repeat_penalty": "repeat_penalty",
+    "mirostat": "mirostat",
+    "mirostat_tau": "mirostat_tau",
+    "mirostat_eta": "mirostat_eta",
+}
+
+STUB_REPLY = "That sounds lovely! Remember to take a short break and drink some water."
+
+
+def _client_settings(timeout, connect_timeout, max_connections, keepalive_expiry):
+    import httpx
+
+    return {
+        "timeout": httpx.Timeout(timeout, connect=connect_timeout),
+        "limits": httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry
+        ),
+    }
+
+
+def translate_options(options, names, passthrough=True):
+    translated = {}
+    for key, value in (options or {}).items():
+        if key in names:
+            if names[key] is not None:
+                translated[names[key]] = value
+        elif passthrough:
+            translated.setdefault(key, value)
+    return translated
+
+
+class OllamaBackend:
+    """Ollama through its python client, on one pooled keep-alive connection.
+
+    The client (and with it httpx) is only imported on first use, which is
+    usually a background thread, so it stays off Stella's startup path.
+    """
+
+    def __init__(self, host=None, timeout=300, connect_timeout=5, max_connections=4,
+                 keepalive_expiry=300, **kwargs):
+        self.host = host
+        self.pool = (timeout, connect_timeout, max_connections, keepalive_expiry)
+        self.lock = threading.Lock()
+        self._client = None
+        self._async_client = None
+
+    @property
+    def client(self):
+        with self.lock:
+            if self._client is None:
+                import ollama
+                self._client = ollama.Client(self.host, **_client_settings(*self.pool))
+            return self._client
+
+    def translate_options(self, options):
+        options = dict(options or {})
+        if "gpu_layers" in options:
+            # num_gpu is a layer count for Ollama; let gpu_layers decide it.
+            options.pop("num_gpu", None)
+        return translate_options(options, OLLAMA_OPTION_NAMES)
+
+    def chat(self, model, messages, options=None, stream=False, keep_alive=None):
+        return self.client.chat(
+            model=model, messages=messages, options=self.translate_options(options),
+            stream=stream, keep_alive=keep_alive
+        )
+
+    async def achat(self, model, messages, options=None, keep_alive=None):
+        if self._async_client is None:
+            import ollama
+            self._async_client = ollama.AsyncClient(self.host, **_client_settings(*self.pool))
+        return await self._async_client.chat(
+            model=model, messages=messages, options=self.translate_options(options),
+            stream=True, keep_alive=keep_alive
+        )
+
+    def generate(self, model, prompt="", options=None, keep_alive=None):
+        return self.client.generate(
+            model=model, prompt=prompt, options=self.translate_options(options), keep_alive=keep_alive
+        )
+
+    def list(self):
+        return self.client.list()
+
+    def embed(self, model, input, keep_alive=None):
+        return self.client.embed(model=model, input=input, keep_alive=keep_alive)
+
+
+class OpenAIBackend:
+    """Any OpenAI-compatible server: llama.cpp's llama-server, vLLM, LM Studio...
+
+    Responses are reshaped into Ollama's chunk format so the rest of Stella
+    does not care which server answered. Loading and unloading models is up
+    to the server, so residency requests are accepted and ignored.
+    """
+
+    def __init__(self, host=None, api_key=None, timeout=300, connect_timeout=5, max_connections=4,
+                 keepalive_expiry=300, sampling_extras=True, **kwargs):
+        self.base_url = (host or "http://127.0.0.1:8080/v1").rstrip("/")
+        self.names = dict(OPENAI_OPTION_NAMES)
+        if sampling_extras:
+            self.names.update(OPENAI_EXTRA_OPTION_NAMES)
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.pool = (timeout, connect_timeout, max_connections, keepalive_expiry)
+        self.lock = threading.Lock()
+        self._client = None
+        self._async_client = None
+
+    def _settings(self):
+        return {"base_url": self.base_url, "headers": self.headers, **_client_settings(*self.pool)}
+
+    @property
+    def client(self):
+        with self.lock:
+            if self._client is None:
+                import httpx
+                self._client = httpx.Client(**self._settings())
+            return self._client
+
+    def translate_options(self, options):
+        return translate_options(options, self.names, passthrough=False)
+
+    def _chat_request(self, model, messages, options, stream):
+        request = {"model": model, "messages": messages, "stream": stream}
+        request.update(self.translate_options(options))
+        if stream:
+            request["stream_options"] = {"include_usage": True}
+        return request
+
+    def _final_chunk(self, model, usage, started, first_token_at, content=""):
+        finished = time.perf_counter()
+        first_token_at = first_token_at or finished
+        usage = usage or {}
+        prompt_tokens = usage.get("prompt_tokens")
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+        if prompt_tokens is not None and cached:
+            # Count only the tokens the server evaluated, as Ollama does.
+            prompt_tokens -= cached
+        return {
+            "model": model,
+            "message": {"role": "assistant", "content": content},
+            "done": True,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int((first_token_at - started) * 1e9),
+            "eval_count": usage.get("completion_tokens"),
+            "eval_duration": int((finished - first_token_at) * 1e9),
+            "load_duration": 0,
+        }
+
+    def _parse_event(self, line):
+        if not line.startswith("data:"):
+            return None
+        data = line[5:].strip()
+        if not data or data == "[DONE]":
+            return None
+        return json.loads(data)
+
+    def _delta(self, event):
+        choices = event.get("choices") or []
+        if not choices:
+            return ""
+        return (choices[0].get("delta") or {}).get("content") or ""
+
+    def _stream(self, model, request):
+        started = time.perf_counter()
+        first_token_at = None
+        usage = None
+        with self.client.stream("POST", "/chat/completions", json=request) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                event = self._parse_event(line)
+                if event is None:
+                    continue
+                usage = event.get("usage") or usage
+                token = self._delta(event)
+                if token:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    yield {"model": model, "message": {"role": "assistant", "content": token}, "done": False}
+        yield self._final_chunk(model, usage, started, first_token_at)
+
+    async def _astream(self, model, request):
+        started = time.perf_counter()
+        first_token_at = None
+        usage = None
+        async with self._async_client.stream("POST", "/chat/completions", json=request) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                event = self._parse_event(line)
+                if event is None:
+                    continue
+                usage = event.get("usage") or usage
+                token = self._delta(event)
+                if token:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    yield {"model": model, "message": {"role": "assistant", "content": token}, "done": False}
+        yield self._final_chunk(model, usage, started, first_token_at)
+
+    def chat(self, model, messages, options=None, stream=False, keep_alive=None):
+        request = self._chat_request(model, messages, options, stream)
+        if stream:
+            return self._stream(model, request)
+        started = time.perf_counter()
+        response = self.client.post("/chat/completions", json=request)
+        response.raise_for_status()
+        data = response.json()
+        content = data["choices"][0]["message"].get("content") or ""
+        return self._final_chunk(model, data.get("usage"), started, None, content)
+
+    async def achat(self, model, messages, options=None, keep_alive=None):
+        if self._async_client is None:
+            import httpx
+            self._async_client = httpx.AsyncClient(**self._settings())
+        return self._astream(model, self._chat_request(model, messages, options, True))
+
+    def generate(self, model, prompt="", options=None, keep_alive=None):
+        if not prompt:
+            return {"model": model, "response": "", "done": True}
+        request = {"model": model, "prompt": prompt}
+        request.update(self.translate_options(options))
+        response = self.client.post("/completions", json=request)
+        response.raise_for_status()
+        return {"model": model, "response": response.json()["choices"][0].get("text", ""), "done": True}
+
+    def list(self):
+        response = self.client.get("/models")
+        response.raise_for_status()
+        return {"models": [
+            {"model": model["id"], "name": model["id"], "size": None, "details": None}
+            for model in response.json().get("data", [])
+        ]}
+
+    def embed(self, model, input, keep_alive=None):
+        response = self.client.post("/embeddings", json={"model": model, "input": input})
+        response.raise_for_status()
+        data = sorted(response.json()["data"], key=lambda item: item.get("index", 0))
+        return {"model": model, "embeddings": [item["embedding"] for item in data]}
+
+
+class StubBackend:
+    """Canned in-process replies, for running Stella without any model server."""
+
+    def __init__(self, models=None, reply=STUB_REPLY, token_delay=0.0, **kwargs):
+        self.models = list(models or ["llama3.2:3b"])
+        self.reply = reply
+        self.token_delay = token_delay
+
+    def translate_options(self, options):
+        return dict(options or {})
+
+    def _tokens(self):
+        words = self.reply.split(" ")
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+    def _final_chunk(self, model, content=""):
+        return {
+            "model": model,
+            "message": {"role": "assistant", "content": content},
+            "done": True,
+            "prompt_eval_count": 0,
+            "prompt_eval_duration": 0,
+            "eval_count": len(self._tokens()),
+            "eval_duration": 0,
+            "load_duration": 0,
+        }
+
+    def _stream(self, model):
+        for token in self._tokens():
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield {"model": model, "message": {"role": "assistant", "content": token}, "done": False}
+        yield self._final_chunk(model)
+
+    async def _astream(self, model):
+        for token in self._tokens():
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield {"model": model, "message": {"role": "assistant", "content": token}, "done": False}
+        yield self._final_chunk(model)
+
+    def chat(self, model, messages, options=None, stream=False, keep_alive=None):
+        if stream:
+            return self._stream(model)
+        return self._final_chunk(model, self.reply)
+
+    async def achat(self, model, messages, options=None, keep_alive=None):
+        return self._astream(model)
+
+    def generate(self, model, prompt="", options=None, keep_alive=None):
+        return {"model": model, "response": "", "done": True}
+
+    def list(self):
+        return {"models": [
+            {"model": name, "name": name, "size": 0, "details": {"parameter_size": None}}
+            for name in self.models
+        ]}
+
+    def embed(self, model, input, keep_alive=None):
+        texts = [input] if isinstance(input, str) else input
+        return {"model": model, "embeddings": [
+            [byte / 255 - 0.5 for byte in hashlib.sha256(text.encode()).digest()]
+            for text in texts
+        ]}
+
+
+BACKENDS = {
+    "ollama": OllamaBackend,
+    "openai": OpenAIBackend,
+    "stub": StubBackend,
+}
+
+
+def create_backend(settings):
+    settings = dict(settings or {})
+    kind = settings.pop("type", "ollama")
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown backend '{kind}', expected one of: {', '.join(BACKENDS)}")
+    return BACKENDS[kind](**settings)
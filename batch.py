@@ -0,0 +1,173 @@
+import asyncio
+import json
+import sys
+import threading
+import time
+
+from engine import stream_reply
+
+PROMPT_FIELDS = ("prompt", "content", "input", "body", "text")
+ID_FIELDS = ("id", "request_id")
+
+
+def read_items(source):
+    """(id, prompt, item) for each line of a JSONL file or plain-text stream."""
+    for number, line in enumerate(source, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            item = line
+        if isinstance(item, str):
+            yield f"line-{number}", item, {}
+            continue
+        if not isinstance(item, dict):
+            continue
+        prompt = next((item[field] for field in PROMPT_FIELDS if item.get(field)), None)
+        if not prompt:
+            continue
+        item_id = next((str(item[field]) for field in ID_FIELDS if item.get(field) is not None), f"line-{number}")
+        yield item_id, prompt, item
+
+
+def completed_ids(path):
+    """Ids already answered in an earlier run, so it can resume."""
+    done = set()
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    continue
+                if result.get("reply") is not None and not result.get("error"):
+                    done.add(result["id"])
+    except FileNotFoundError:
+        pass
+    return done
+
+
+class BatchRunner:
+    """Answers a stream of prompts with Stella's persona and memory, without the UI.
+
+    Every prompt is answered against the current conversation as if it were
+    the next message; prompts do not see each other. Up to `concurrency`
+    requests are in flight at once, each through the chat's own generation
+    path (response cache, model fallback, metrics). With `remember` the
+    exchanges are written to memory as they complete, otherwise memory is
+    left untouched.
+    """
+
+    def __init__(self, stella, concurrency=4, remember=False):
+        self.stella = stella
+        self.concurrency = max(1, concurrency)
+        self.remember = remember
+        self.lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+
+    def _build(self, prompt):
+        with self.lock:
+            log = self.stella.memory.memory["log"].extended([{"role": "user", "content": prompt}])
+            return self.stella.new_turn(prompt, log)
+
+    def _remember(self, prompt, reply):
+        with self.lock:
+            self.stella.memory.add_user_message(prompt)
+            self.stella.memory.add_assistant_message(reply)
+
+    async def answer(self, item_id, prompt):
+        started = time.time()
+        clock = time.perf_counter()
+        messages, turn = await asyncio.to_thread(self._build, prompt)
+        turn["started"] = clock
+        reply, model = await stream_reply(self.stella, prompt, messages, turn)
+
+        result = {"id": item_id, "prompt": prompt, "reply": reply, "model": model, "started": started}
+        if reply is None:
+            result["error"] = turn["error"]
+        else:
+            result["eval"] = turn["eval"]
+            result["ttft"] = turn["first_token"] - clock if turn["first_token"] else None
+        result["latency"] = time.perf_counter() - clock
+        if reply is not None and self.remember:
+            await asyncio.to_thread(self._remember, prompt, reply)
+        return result
+
+    async def run(self, items, output):
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                item_id, prompt = item
+                try:
+                    result = await self.answer(item_id, prompt)
+                except Exception as e:
+                    result = {"id": item_id, "prompt": prompt, "reply": None, "error": str(e)}
+                if result.get("error"):
+                    self.failed += 1
+                else:
+                    self.completed += 1
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                output.flush()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        items = iter(items)
+        while True:
+            # Reading may block on stdin; keep it off the event loop.
+            item = await asyncio.to_thread(next, items, None)
+            if item is None:
+                break
+            await queue.put(item)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+
+def main(stella_module, input_path="-", output_path=None, concurrency=4, remember=False, reprobe=False, profile=None):
+    """`stella batch`: answer prompts from a JSONL file or stdin, streaming JSONL results."""
+    done = completed_ids(output_path) if output_path else set()
+    source = sys.stdin if input_path == "-" else open(input_path, "r")
+    output = open(output_path, "a") if output_path else sys.stdout
+
+    stella = stella_module.Stella(reprobe=reprobe, headless=True, profile=profile)
+    if stella.summarizer:
+        # Keep background summaries from competing with the batch for the model.
+        stella.summarizer.begin_turn()
+    runner = BatchRunner(stella, concurrency=concurrency, remember=remember)
+
+    skipped = 0
+
+    def pending():
+        nonlocal skipped
+        for item_id, prompt, _ in read_items(source):
+            if item_id in done:
+                skipped += 1
+                continue
+            done.add(item_id)
+            yield item_id, prompt
+
+    try:
+        asyncio.run(runner.run(pending(), output))
+    except KeyboardInterrupt:
+        print("\nInterrupted; run the same command again to resume.", file=sys.stderr)
+        return 130
+    finally:
+        if stella.summarizer:
+            stella.summarizer.end_turn()
+        stella.memory.close()
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    print(
+        f"Batch finished: {runner.completed} answered, {runner.failed} failed, {skipped} already done",
+        file=sys.stderr
+    )
+    return 1 if runner.failed else 0
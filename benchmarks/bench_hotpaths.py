@@ -0,0 +1,254 @@
+"""Microbenchmarks for the work Stella does around the model.
+
+Every case runs in its own child process inside a scratch directory, with
+the in-process stub backend instead of a model server, so the numbers
+cover only Stella's own overhead and peak RSS is per case.
+
+    python benchmarks/bench_hotpaths.py                       # default sizes
+    python benchmarks/bench_hotpaths.py --sizes 1000,1000000 --output new.json
+    python benchmarks/bench_hotpaths.py --compare old.json new.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+SIZED_CASES = ["load_memory", "save_memory", "append_message", "prepare_turn", "generate_response"]
+UNSIZED_CASES = ["print_slowly", "probe_capabilities", "cached_capabilities"]
+
+BENCH_CONFIG = {
+    "backend": {"type": "stub"},
+    "recall": {"enabled": False},
+    "summaries": {"enabled": False},
+    "residency": {"warmup": False},
+}
+
+WORDS = (
+    "stella remember tea break music coding tired happy sleep window rain project "
+    "deadline friend walk dinner weekend terminal memory garden book movie"
+).split()
+
+
+def write_synthetic_memory(path, size, seed=1234):
+    rng = random.Random(seed)
+    log = []
+    for i in range(size):
+        role = "user" if i % 2 == 0 else "assistant"
+        content = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 60)))
+        log.append({"role": role, "content": content})
+    with open(path, "w") as f:
+        json.dump({"log": log, "user_preferences": {}}, f)
+
+
+def _setup(case, size):
+    sys.path.insert(0, ROOT)
+
+    with open("config.json", "w") as f:
+        json.dump(BENCH_CONFIG, f)
+    if size:
+        write_synthetic_memory("memory.json", size)
+
+    import full
+
+    if size:
+        # Let Stella move the synthetic history into its own on-disk layout
+        # (hot snapshot plus cold segments) before anything is timed.
+        full.StellaMemory().close()
+
+    if case == "load_memory":
+        def op():
+            full.StellaMemory().close()
+        return op, 5
+
+    if case == "save_memory":
+        memory = full.StellaMemory()
+        return memory.save_memory, 5
+
+    if case == "append_message":
+        memory = full.StellaMemory()
+
+        def op():
+            memory.add_user_message("how was your day?")
+            memory.store.flush()
+        return op, 50
+
+    if case in ("prepare_turn", "generate_response"):
+        with redirect_stdout(io.StringIO()):
+            stella = full.Stella()
+        if case == "prepare_turn":
+            def op():
+                stella.prepare_turn("what should I cook tonight?")
+                stella.end_turn()
+        else:
+            def op():
+                stella.generate_response("what should I cook tonight?", on_token=lambda token: None)
+        return op, 30
+
+    if case == "print_slowly":
+        ui = full.StellaUI()
+        text = "Stella: " + " ".join(WORDS[:12])
+
+        def op():
+            with redirect_stdout(io.StringIO()):
+                ui.print_slowly(text)
+        return op, 3
+
+    if case == "probe_capabilities":
+        os.environ["XDG_CACHE_HOME"] = os.path.abspath("cache")
+        return lambda: full.SystemCapabilities(reprobe=True), 5
+
+    if case == "cached_capabilities":
+        os.environ["XDG_CACHE_HOME"] = os.path.abspath("cache")
+        full.SystemCapabilities(reprobe=True)
+        return lambda: full.SystemCapabilities(), 20
+
+    raise SystemExit(f"unknown case: {case}")
+
+
+def run_case(case, size, iterations=None):
+    op, default_iterations = _setup(case, size)
+    iterations = iterations or default_iterations
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        op()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    op()
+    after = tracemalloc.take_snapshot()
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    allocations = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+
+    timings.sort()
+    return {
+        "case": case,
+        "size": size,
+        "iterations": iterations,
+        "min_ms": timings[0],
+        "median_ms": statistics.median(timings),
+        "mean_ms": statistics.fmean(timings),
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        "allocations": allocations,
+        "traced_peak_kb": traced_peak // 1024,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def run_all(cases, sizes, iterations=None):
+    results = []
+    for case in cases:
+        for size in (sizes if case in SIZED_CASES else [0]):
+            with tempfile.TemporaryDirectory(prefix="stella-bench-") as workdir:
+                result_path = os.path.join(workdir, "result.json")
+                command = [
+                    sys.executable, os.path.abspath(__file__),
+                    "--run-case", case, "--size", str(size), "--result", result_path
+                ]
+                if iterations:
+                    command += ["--iterations", str(iterations)]
+                output = subprocess.run(command, cwd=workdir, capture_output=True, text=True)
+                if output.returncode != 0:
+                    print(f"{case} [{size}] failed:\n{output.stderr}", file=sys.stderr)
+                    continue
+                with open(result_path) as f:
+                    result = json.load(f)
+            results.append(result)
+            print(
+                f"{case:<22}{size:>9}  median {result['median_ms']:>10.3f} ms  "
+                f"p95 {result['p95_ms']:>10.3f} ms  allocs {result['allocations']:>9}  "
+                f"rss {result['peak_rss_kb'] // 1024:>6} MB",
+                file=sys.stderr
+            )
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(old_path, new_path, threshold):
+    with open(old_path) as f:
+        old = {(r["case"], r["size"]): r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = {(r["case"], r["size"]): r for r in json.load(f)["results"]}
+
+    regressions = 0
+    for key in sorted(set(old) & set(new)):
+        before, after = old[key]["median_ms"], new[key]["median_ms"]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{key[0]:<22}{key[1]:>9}  {before:>10.3f} -> {after:>10.3f} ms  {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Stella's internal hot paths")
+    parser.add_argument("--cases", default=",".join(SIZED_CASES + UNSIZED_CASES))
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma separated history sizes (messages), e.g. 1000,1000000")
+    parser.add_argument("--iterations", type=int)
+    parser.add_argument("--output", help="write machine-readable results here")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative median slowdown reported as a regression")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        # The child's stdout belongs to Stella; results go through a file.
+        with redirect_stdout(io.StringIO()):
+            result = run_case(args.run_case, args.size, args.iterations)
+        with open(args.result, "w") as f:
+            json.dump(result, f)
+        return
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    results = run_all(
+        [c for c in args.cases.split(",") if c],
+        [int(s) for s in args.sizes.split(",") if s],
+        args.iterations
+    )
+    report = {
+        "created": time.time(),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""Replays recorded conversations through Stella and reports end-to-end latency.
+
+User turns are taken from a memory.json or from a JSONL file (one message
+per line, as a string or an object with a content/prompt/input/body field)
+and fed one by one through the real `Stella.generate_response` path, each
+configuration in a fresh process and scratch directory. The model server is
+either the one OLLAMA_HOST points at or, with --stub, the bundled stand-in
+from benchmarks/stub_server.py.
+
+    python benchmarks/replay.py memory.json --stub --ttft 0.2 --tokens-per-second 30
+    python benchmarks/replay.py chats.jsonl --configs configs.json --output replay.json
+
+A configs file is a JSON list of objects such as
+    {"name": "qwen-2k", "model": "qwen2.5:7b", "options": {"num_ctx": 2048},
+     "config": {"prompt": {"layout": "stable"}}, "root": "../stella-old"}
+where every key but "name" is optional: "config" becomes that run's
+config.json, "profile" the resource profile to pin (default "full") and
+"root" points at another Stella checkout to compare versions.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_CONFIG = {"config": {"recall": {"enabled": False}, "summaries": {"enabled": False}}}
+MESSAGE_FIELDS = ("content", "prompt", "input", "body", "text")
+
+
+def load_conversation(path, limit=None):
+    prompts = []
+    if path.endswith(".json"):
+        with open(path) as f:
+            data = json.load(f)
+        log = data.get("log", [])
+        if data.get("cold"):
+            sys.path.insert(0, ROOT)
+            from memory_tiers import ColdSegments, cold_directory
+            log = ColdSegments(cold_directory(path), data["cold"]).entries() + log
+        prompts = [entry["content"] for entry in log if entry.get("role") == "user"]
+    else:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    item = line
+                if isinstance(item, dict):
+                    if item.get("role", "user") != "user":
+                        continue
+                    item = next((item[field] for field in MESSAGE_FIELDS if item.get(field)), None)
+                if isinstance(item, str) and item.strip():
+                    prompts.append(item)
+    return prompts[:limit] if limit else prompts
+
+
+def summarize(turns):
+    sys.path.insert(0, ROOT)
+    from metrics import percentile
+
+    def pick(key):
+        return [turn[key] for turn in turns if turn.get(key) is not None]
+
+    latency = pick("latency")
+    ttft = pick("ttft")
+    rate = pick("tokens_per_second")
+    overhead = pick("overhead")
+    saved = pick("prefill_saved")
+    return {
+        "turns": len(turns),
+        "ttft_p50": percentile(ttft, 50),
+        "ttft_p95": percentile(ttft, 95),
+        "tokens_per_second": sum(rate) / len(rate) if rate else None,
+        "latency_p50": percentile(latency, 50),
+        "latency_p95": percentile(latency, 95),
+        "latency_p99": percentile(latency, 99),
+        "overhead_p50": percentile(overhead, 50),
+        "overhead_p95": percentile(overhead, 95),
+        "prefill_saved_p50": percentile(saved, 50),
+    }
+
+
+def replay(setup, prompts, warmup, think=0):
+    """Runs in the child process, inside its scratch directory."""
+    sys.path.insert(0, os.path.abspath(setup.get("root") or ROOT))
+    with open("config.json", "w") as f:
+        json.dump(setup.get("config", {}), f)
+
+    import full
+
+    try:
+        # Pinned, so the resource profile does not change the settings being compared.
+        stella = full.Stella(profile=setup.get("profile", "full"))
+    except TypeError:
+        # A checkout from before resource profiles.
+        stella = full.Stella()
+    if setup.get("model"):
+        stella.models.models_for_turn = lambda: [setup["model"]]
+    if setup.get("options"):
+        get_options = stella.system_config.get_ollama_options
+        stella.system_config.get_ollama_options = lambda *args: {**get_options(*args), **setup["options"]}
+
+    # Everything outside the model call is Stella's own overhead.
+    name = "stream_chat" if hasattr(stella, "stream_chat") else "_stream_chat"
+    stream_chat = getattr(stella, name)
+    model_time = []
+
+    if asyncio.iscoroutinefunction(stream_chat):
+        async def timed_stream_chat(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await stream_chat(*args, **kwargs)
+            finally:
+                model_time.append(time.perf_counter() - start)
+    else:
+        # A checkout from before the shared async generation path.
+        def timed_stream_chat(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return stream_chat(*args, **kwargs)
+            finally:
+                model_time.append(time.perf_counter() - start)
+
+    setattr(stella, name, timed_stream_chat)
+
+    turns = []
+    for i, prompt in enumerate(prompts):
+        token_times = []
+        model_time.clear()
+        stella.last_eval = None
+        start = time.perf_counter()
+        reply = stella.generate_response(prompt, on_token=lambda token: token_times.append(time.perf_counter()))
+        latency = time.perf_counter() - start
+        prefill = getattr(stella, "last_prefill", None)
+        if think:
+            # The user reading the reply and typing the next message.
+            time.sleep(think)
+        if i < warmup:
+            continue
+
+        turn = {
+            "latency": latency,
+            "ttft": token_times[0] - start if token_times else None,
+            "tokens": len(token_times),
+            "tokens_per_second": None,
+            "overhead": latency - sum(model_time),
+            "model_calls": len(model_time),
+            "fallback": reply == stella.FALLBACK_REPLY,
+            "eval": stella.last_eval,
+            "prefill_saved": prefill / 1000 if prefill is not None else None,
+        }
+        if len(token_times) > 1 and token_times[-1] > token_times[0]:
+            turn["tokens_per_second"] = (len(token_times) - 1) / (token_times[-1] - token_times[0])
+        turns.append(turn)
+
+    stella.memory.close()
+    return turns
+
+
+def run_configuration(setup, conversation, host, warmup, limit, think=0):
+    with tempfile.TemporaryDirectory(prefix="stella-replay-") as workdir:
+        result_path = os.path.join(workdir, "result.json")
+        command = [
+            sys.executable, os.path.abspath(__file__), conversation,
+            "--run-config", json.dumps(setup), "--result", result_path, "--warmup", str(warmup),
+            "--think", str(think)
+        ]
+        if limit:
+            command += ["--turns", str(limit)]
+        env = dict(os.environ)
+        if host:
+            env["OLLAMA_HOST"] = host
+        output = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+        if output.returncode != 0:
+            print(f"{setup.get('name', 'default')} failed:\n{output.stderr}", file=sys.stderr)
+            return None
+        with open(result_path) as f:
+            return json.load(f)
+
+
+def _ms(value):
+    return f"{value * 1000:>9.1f}" if value is not None else f"{'-':>9}"
+
+
+def print_report(results):
+    print(f"{'configuration':<20}{'turns':>6}{'ttft p50':>10}{'tok/s':>8}"
+          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'overhead':>10}{'prefill':>10}")
+    for result in results:
+        s = result["summary"]
+        rate = f"{s['tokens_per_second']:>8.1f}" if s["tokens_per_second"] else f"{'-':>8}"
+        print(f"{result['name']:<20}{s['turns']:>6} {_ms(s['ttft_p50'])}{rate} {_ms(s['latency_p50'])} "
+              f"{_ms(s['latency_p95'])} {_ms(s['latency_p99'])} {_ms(s['overhead_p50'])} "
+              f"{_ms(s.get('prefill_saved_p50'))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay conversations through Stella and measure latency")
+    parser.add_argument("conversation", help="memory.json or a JSONL file of user messages")
+    parser.add_argument("--configs", help="JSON file with a list of configurations to compare")
+    parser.add_argument("--turns", type=int, help="replay at most this many user turns")
+    parser.add_argument("--warmup", type=int, default=1, help="leading turns left out of the statistics")
+    parser.add_argument("--host", help="Ollama URL (defaults to OLLAMA_HOST)")
+    parser.add_argument("--stub", action="store_true", help="run against the bundled stand-in server")
+    parser.add_argument("--ttft", type=float, default=0.1, help="stub: fixed seconds before the first token")
+    parser.add_argument("--prompt-rate", type=float, default=2000.0, help="stub: prompt tokens per second")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0, help="stub: generation speed")
+    parser.add_argument("--prompt-cache", action="store_true", help="stub: reuse cached prompt prefixes like Ollama")
+    parser.add_argument("--think", type=float, default=0, help="seconds of user 'typing' between turns")
+    parser.add_argument("--output", help="write per-turn and summary results as JSON")
+    parser.add_argument("--run-config", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    prompts = load_conversation(args.conversation, args.turns)
+
+    if args.run_config:
+        with redirect_stdout(io.StringIO()):
+            turns = replay(json.loads(args.run_config), prompts, args.warmup, args.think)
+        with open(args.result, "w") as f:
+            json.dump(turns, f)
+        return
+
+    if not prompts:
+        sys.exit(f"No user messages found in {args.conversation}")
+
+    setups = [dict(DEFAULT_CONFIG, name="default")]
+    if args.configs:
+        with open(args.configs) as f:
+            setups = [dict(DEFAULT_CONFIG, **setup) for setup in json.load(f)]
+
+    host = args.host
+    if args.stub:
+        sys.path.insert(0, HERE)
+        from stub_server import StubServer
+        sys.path.insert(0, ROOT)
+        import full
+        models = set(full.Stella.MODELS) | {s["model"] for s in setups if s.get("model")}
+        server = StubServer(
+            models=sorted(models), ttft=args.ttft,
+            prompt_rate=args.prompt_rate, token_rate=args.tokens_per_second, prompt_cache=args.prompt_cache
+        )
+        host = server.start()
+
+    results = []
+    for i, setup in enumerate(setups):
+        setup.setdefault("name", f"config-{i + 1}")
+        turns = run_configuration(setup, os.path.abspath(args.conversation), host, args.warmup, args.turns, args.think)
+        if turns is None:
+            continue
+        results.append({"name": setup["name"], "setup": setup, "summary": summarize(turns), "turns": turns})
+
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"created": time.time(), "host": host, "stub": args.stub, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
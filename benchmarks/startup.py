@@ -0,0 +1,177 @@
+"""Startup time: from launching `stella.py` to the first "You:" prompt.
+
+Stella is started in a pseudo-terminal inside a scratch directory, with the
+in-process stub backend, and watched like a user would: the launcher's
+header, Stella's welcome screen and the chat prompt. The median over several
+launches is checked against a fixed budget, so a slow import creeping onto
+the startup path fails the run (exit status 1). The modules that cost the
+most to import, as reported by `python -X importtime`, are listed with it.
+
+    python benchmarks/startup.py                    # adaptive and pinned low profile
+    python benchmarks/startup.py --profiles auto --runs 10 --budget 1.5
+    python benchmarks/startup.py --top 25 --output startup.json
+"""
+import argparse
+import json
+import os
+import pty
+import select
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds from launch to the chat prompt, typing animation of the greeting
+# included (about 0.9s). Measured around 1.2s on a laptop; the headroom
+# covers slower machines, not new work on the startup path.
+STARTUP_BUDGET = 1.75
+
+CLEAR_SCREEN = "\033[2J"
+
+STARTUP_CONFIG = {
+    "backend": {"type": "stub"},
+    "residency": {"warmup": False},
+}
+
+
+class Timeout(Exception):
+    pass
+
+
+def _wait_for(fd, marker, output, deadline):
+    while marker not in output[0]:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            raise Timeout(f"no {marker!r} after {output[0][-200:]!r}")
+        ready, _, _ = select.select([fd], [], [], remaining)
+        if not ready:
+            continue
+        try:
+            data = os.read(fd, 65536)
+        except OSError:
+            data = b""
+        if not data:
+            raise Timeout(f"stella exited before {marker!r}: {output[0][-200:]!r}")
+        output[0] += data.decode(errors="replace")
+    return time.perf_counter()
+
+
+def launch(workdir, profile, timeout=30):
+    """One launch; seconds to the launcher's header, to Stella's welcome and to the chat prompt."""
+    env = dict(os.environ, XDG_CACHE_HOME=os.path.join(workdir, "cache"), TERM="xterm", COLUMNS="100", LINES="40")
+    pid, fd = pty.fork()
+    if pid == 0:
+        os.chdir(workdir)
+        os.execve(sys.executable, [sys.executable, os.path.join(ROOT, "stella.py"), "--profile", profile], env)
+
+    started = time.perf_counter()
+    deadline = started + timeout
+    output = [""]
+    try:
+        launcher_at = _wait_for(fd, "Starting Stella", output, deadline)
+        # Stella clears the screen again once it is set up and greets the user.
+        output[0] = output[0][output[0].index("Starting Stella"):]
+        ready_at = _wait_for(fd, CLEAR_SCREEN, output, deadline)
+        prompt_at = _wait_for(fd, "You:", output, deadline)
+        os.write(fd, b"exit\r")
+        try:
+            _wait_for(fd, "See you", output, time.perf_counter() + 5)
+        except Timeout:
+            pass
+    finally:
+        try:
+            os.kill(pid, 9)
+        except OSError:
+            pass
+        os.waitpid(pid, 0)
+        os.close(fd)
+    return {"launcher": launcher_at - started, "ready": ready_at - started, "prompt": prompt_at - started}
+
+
+def import_times(module, top=15):
+    """Total and slowest imports (cumulative, own microseconds) under `import module`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    # Children are listed before their parent, so the rows between the last
+    # top-level import and `module` are its subtree; the rest is the
+    # interpreter's own startup.
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        try:
+            row = (int(cumulative), int(own), name.strip())
+        except ValueError:
+            # The header line.
+            continue
+        top_level = name.startswith(" ") and not name.startswith("  ")
+        if top_level and row[2] == module:
+            return row[0], sorted(rows, reverse=True)[:top]
+        rows = [] if top_level else rows + [row]
+    return None, []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Stella's startup time against a fixed budget")
+    parser.add_argument("--profiles", default="auto,low", help="comma-separated profiles to launch with")
+    parser.add_argument("--runs", type=int, default=5, help="measured launches per profile")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET,
+                        help="fail if the median time to the chat prompt exceeds this many seconds")
+    parser.add_argument("--top", type=int, default=15, help="how many slow imports to list")
+    parser.add_argument("--output", help="write machine-readable results here")
+    args = parser.parse_args()
+
+    results = {}
+    failed = False
+    total_us, slowest = import_times("full", args.top)
+    print(f"import full: {total_us / 1000:.1f} ms; slowest imports:" if total_us else "import full: not measured")
+    for cumulative, own, name in slowest:
+        print(f"    {cumulative / 1000:8.1f} ms  (self {own / 1000:6.1f})  {name}")
+
+    for profile in args.profiles.split(","):
+        with tempfile.TemporaryDirectory(prefix="stella-startup-") as workdir:
+            with open(os.path.join(workdir, "config.json"), "w") as f:
+                json.dump(STARTUP_CONFIG, f)
+            # The first launch probes the hardware and fills the caches.
+            cold = launch(workdir, profile)
+            runs = [launch(workdir, profile) for _ in range(args.runs)]
+
+        launcher = statistics.median(r["launcher"] for r in runs)
+        ready = statistics.median(r["ready"] for r in runs)
+        prompt = statistics.median(r["prompt"] for r in runs)
+        over = prompt > args.budget
+        failed = failed or over
+        results[profile] = {
+            "cold_prompt": cold["prompt"],
+            "launcher": launcher,
+            "ready": ready,
+            "prompt": prompt,
+            "runs": runs,
+            "budget": args.budget,
+            "over_budget": over,
+        }
+        print(f"{profile}: launcher {launcher * 1000:.0f} ms, ready {ready * 1000:.0f} ms, chat prompt {prompt * 1000:.0f} ms "
+              f"(first launch {cold['prompt'] * 1000:.0f} ms), budget {args.budget * 1000:.0f} ms"
+              f"{'  OVER BUDGET' if over else ''}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "python": sys.version.split()[0],
+                "import_ms": total_us / 1000 if total_us else None,
+                "slowest_imports": [
+                    {"module": name, "cumulative_ms": c / 1000, "self_ms": s / 1000} for c, s, name in slowest
+                ],
+                "results": results,
+            }, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
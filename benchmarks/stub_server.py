@@ -0,0 +1,203 @@
+"""Local stand-in for the Ollama HTTP API with configurable speed.
+
+It speaks enough of the API for Stella (/api/tags, /api/chat with and
+without streaming, /api/generate, /api/embed, /api/show, /api/version) and
+paces replies like a real model would: a fixed latency plus prompt
+processing before the first token, then tokens at a steady rate. With
+--prompt-cache it also keeps one KV cache slot per model, like Ollama: only
+the messages after the longest prefix shared with the previous chat request
+(and its reply) count as evaluated.
+
+    python benchmarks/stub_server.py --port 11435 --ttft 0.15 --tokens-per-second 40
+    OLLAMA_HOST=http://127.0.0.1:11435 python stella.py
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = (
+    "That sounds like a lot to carry today. Maybe take a short break, stretch a little "
+    "and drink some water, then we can look at the rest together. I'm right here if you "
+    "want to talk it through."
+)
+
+
+def _prompt_tokens(body, messages=None):
+    if "messages" in body:
+        text = "".join(m.get("content", "") for m in (body["messages"] if messages is None else messages))
+    else:
+        text = body.get("prompt", "")
+    return max(1, len(text) // 4)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, payload, status=200):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _chunk(self, payload):
+        data = (json.dumps(payload) + "\n").encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._json({"models": [
+                {"name": name, "model": name, "size": 0, "digest": hashlib.sha256(name.encode()).hexdigest()}
+                for name in self.server.models
+            ]})
+        elif self.path == "/api/version":
+            self._json({"version": "0.0.0-stub"})
+        else:
+            self._json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.path in ("/api/chat", "/api/generate"):
+            if body.get("model") not in self.server.models:
+                return self._json({"error": f"model '{body.get('model')}' not found"}, 404)
+            self._reply(body)
+        elif self.path == "/api/embed":
+            texts = body.get("input", "")
+            texts = [texts] if isinstance(texts, str) else texts
+            self._json({"model": body.get("model"), "embeddings": [self._embedding(text) for text in texts]})
+        elif self.path == "/api/show":
+            self._json({"modelfile": "", "parameters": "", "template": "", "details": {"parameter_size": "3B"}, "model_info": {}})
+        else:
+            self._json({"error": "not found"}, 404)
+
+    def _embedding(self, text):
+        digest = hashlib.sha256(text.encode()).digest()
+        return [byte / 255 - 0.5 for byte in digest]
+
+    def _reply(self, body):
+        server = self.server
+        model = body["model"]
+        chat = self.path == "/api/chat"
+        # An empty generate prompt is a load/unload request.
+        words = server.reply.split(" ") if chat or body.get("prompt") else []
+        tokens = [word if i == 0 else " " + word for i, word in enumerate(words)]
+        limit = (body.get("options") or {}).get("num_predict")
+        if limit and limit > 0:
+            tokens = tokens[:limit]
+
+        prompt_tokens = _prompt_tokens(body)
+        if chat and server.prompt_cache:
+            messages = [(m.get("role"), m.get("content", "")) for m in body.get("messages", [])]
+            with server.lock:
+                cached = server.cache.get(model, [])
+                shared = 0
+                while shared < min(len(cached), len(messages)) and cached[shared] == messages[shared]:
+                    shared += 1
+                server.cache[model] = messages + [("assistant", "".join(tokens))]
+            prompt_tokens = _prompt_tokens(body, body["messages"][shared:])
+
+        started = time.perf_counter()
+        prefill = server.ttft + prompt_tokens / server.prompt_rate if words else 0
+
+        def final(content):
+            total = time.perf_counter() - started
+            payload = {
+                "model": model,
+                "done": True,
+                "done_reason": "stop",
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int(prompt_tokens / server.prompt_rate * 1e9) if words else 0,
+                "eval_count": len(tokens),
+                "eval_duration": int(max(total - prefill, 0) * 1e9),
+                "load_duration": 0,
+                "total_duration": int(total * 1e9),
+            }
+            if chat:
+                payload["message"] = {"role": "assistant", "content": content}
+            else:
+                payload["response"] = content
+            return payload
+
+        if not body.get("stream", True):
+            time.sleep(prefill + len(tokens) / server.token_rate)
+            return self._json(final("".join(tokens)))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            time.sleep(prefill)
+            for token in tokens:
+                if chat:
+                    self._chunk({"model": model, "message": {"role": "assistant", "content": token}, "done": False})
+                else:
+                    self._chunk({"model": model, "response": token, "done": False})
+                time.sleep(1 / server.token_rate)
+            self._chunk(final(""))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, models=("llama3.2:3b",), ttft=0.1,
+                 prompt_rate=2000.0, token_rate=40.0, reply=REPLY, prompt_cache=False):
+        super().__init__((host, port), StubHandler)
+        self.models = list(models)
+        self.ttft = ttft
+        self.prompt_rate = prompt_rate
+        self.token_rate = token_rate
+        self.reply = reply
+        self.prompt_cache = prompt_cache
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="stub-ollama", daemon=True).start()
+        return self.url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in Ollama server with configurable latency")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--models", default="llama3.2:3b", help="comma separated model names to advertise")
+    parser.add_argument("--ttft", type=float, default=0.1, help="fixed seconds before the first token")
+    parser.add_argument("--prompt-rate", type=float, default=2000.0, help="prompt tokens processed per second")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--reply", default=REPLY)
+    parser.add_argument("--prompt-cache", action="store_true", help="reuse the prompt prefix of the last chat per model")
+    args = parser.parse_args()
+
+    server = StubServer(
+        args.host, args.port, args.models.split(","), ttft=args.ttft,
+        prompt_rate=args.prompt_rate, token_rate=args.tokens_per_second, reply=args.reply,
+        prompt_cache=args.prompt_cache
+    )
+    print(f"Stub Ollama listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import copy
+import json
+import os
+
+CONFIG_FILE = "config.json"
+
+DEFAULTS = {
+    "backend": {
+        "type": "ollama",
+        "host": None,
+        "models": None,
+        "timeout": 300,
+        "connect_timeout": 5,
+        "max_connections": 4,
+        "keepalive_expiry": 300,
+    },
+    "daemon": {
+        "socket": None,
+        "port": None,
+        "max_queue": 16,
+        "max_per_client": 4,
+    },
+    "memory": {
+        "backend": "auto",
+        "db_path": "memory.db",
+        "hot_messages": 500,
+    },
+    "journal": {
+        "max_bytes": 1024 * 1024,
+        "rotate": "monthly",
+        "max_segments": 24,
+        "flush_interval": 5,
+    },
+    "prompt": {
+        "layout": "stable",
+    },
+    "residency": {
+        "warmup": True,
+        "keep_alive": "2h",
+        "embed_keep_alive": "5m",
+        "unload_after": 1200,
+        "resume_below": 60,
+        "check_interval": 30,
+    },
+    "prefill": {
+        "enabled": False,
+    },
+    "response_cache": {
+        "enabled": False,
+        "path": "response_cache.json",
+        "max_entries": 256,
+        "max_age": 7 * 86400,
+        "context_turns": 0,
+        "similarity": None,
+    },
+    "idle": {
+        "interval": 15,
+        "break_reminder": True,
+        "remind_after": 50 * 60,
+        "break_length": 5 * 60,
+        "repeat_after": 20 * 60,
+    },
+    "profiles": {
+        "profile": "auto",
+        "interval": 15,
+        "calm_samples": 3,
+        "min_available": 0.1,
+        "min_available_mb": 1024,
+        "max_swap_rate": 1024 * 1024,
+        "max_cpu": 85,
+        "battery_low": 20,
+        "battery_critical": 10,
+        "log": "profiles.log",
+    },
+    "metrics": {
+        "enabled": True,
+        "path": "metrics.jsonl",
+        "max_records": 10000,
+    },
+    "recall": {
+        "enabled": True,
+        "embed_model": "nomic-embed-text",
+        "top_k": 3,
+        "min_score": 0.35,
+    },
+    "summaries": {
+        "enabled": True,
+        "span": 20,
+        "fanout": 4,
+        "keep_recent": 40,
+        "idle_delay": 30,
+    },
+}
+
+
+def load_config(path=CONFIG_FILE):
+    """Defaults overlaid with the optional config.json next to memory.json."""
+    config = copy.deepcopy(DEFAULTS)
+    if not os.path.exists(path):
+        return config
+    try:
+        with open(path, "r") as f:
+            user_config = json.load(f)
+    except Exception:
+        return config
+
+    for section, values in user_config.items():
+        if isinstance(values, dict) and isinstance(config.get(section), dict):
+            config[section].update(values)
+        else:
+            config[section] = values
+    return config
@@ -0,0 +1,128 @@
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def message_tokens(entry):
+    tokens = entry.get("tokens")
+    if tokens is None:
+        tokens = estimate_tokens(entry.get("content", "")) + MESSAGE_OVERHEAD
+    return tokens
+
+
+class ContextBuilder:
+    """Packs the prompt by token budget rather than by message count.
+
+    The system messages always go in; history is added newest first until
+    `num_ctx - reserve` is used up, where `reserve` is kept free for the
+    reply. Stored messages carry a cached "tokens" estimate so packing only
+    costs a walk over the messages that actually fit.
+
+    With `stable=True` the window start is anchored: new turns are appended
+    behind an unchanged prefix, and only when the window overflows does the
+    anchor jump forward so the history refills to `refill` of the budget.
+    Volatile `tail_messages` go after the history. Together this keeps the
+    prompt prefix byte-identical across turns so the server can reuse its
+    KV cache.
+    """
+
+    def __init__(self, num_ctx, reserve=512, stable=False, refill=0.5):
+        self.num_ctx = num_ctx
+        self.reserve = reserve
+        self.stable = stable
+        self.refill = refill
+        self.anchor = None
+
+    @property
+    def budget(self):
+        return self.num_ctx - self.reserve
+
+    @staticmethod
+    def _token_counts(history):
+        # A TieredLog can answer without building each entry.
+        return getattr(history, "tokens_at", None) or (lambda index: message_tokens(history[index]))
+
+    def _pick_newest(self, history, start, available):
+        tokens_at = self._token_counts(history)
+        first = len(history)
+        used = 0
+        for index in range(len(history) - 1, start - 1, -1):
+            tokens = tokens_at(index)
+            # The newest message always goes in, even if it alone is too big.
+            if first < len(history) and used + tokens > available:
+                break
+            first = index
+            used += tokens
+        return first, used
+
+    def _pick_anchored(self, history, start, available):
+        if self.anchor is None or self.anchor < start:
+            # No window yet: start one from the newest messages rather than
+            # walking (and, for a TieredLog, decompressing) the whole history.
+            anchor, used = self._pick_newest(history, start, int(available * self.refill))
+        else:
+            anchor = self.anchor
+            tokens_at = self._token_counts(history)
+            used = 0
+            for index in range(anchor, len(history)):
+                used += tokens_at(index)
+                if used > available:
+                    anchor, used = self._pick_newest(history, start, int(available * self.refill))
+                    break
+        self.anchor = anchor
+        return anchor, used
+
+    def build(self, system_messages, history, start=0, tail_messages=()):
+        system_tokens = sum(message_tokens(m) for m in system_messages)
+        system_tokens += sum(message_tokens(m) for m in tail_messages)
+        available = self.budget - system_tokens
+
+        if self.stable:
+            first, history_tokens = self._pick_anchored(history, start, available)
+        else:
+            first, history_tokens = self._pick_newest(history, start, available)
+        if hasattr(history, "messages"):
+            picked = history.messages(first)
+        else:
+            picked = [{"role": m["role"], "content": m["content"]} for m in history[first:]]
+
+        messages = [{"role": m["role"], "content": m["content"]} for m in system_messages]
+        messages += picked
+        messages += [{"role": m["role"], "content": m["content"]} for m in tail_messages]
+
+        stats = {
+            "num_ctx": self.num_ctx,
+            "reserve": self.reserve,
+            "system_tokens": system_tokens,
+            "history_tokens": history_tokens,
+            "history_messages": len(picked),
+            "total_tokens": system_tokens + history_tokens,
+        }
+        return messages, stats
+
+    @staticmethod
+    def describe(stats):
+        return (
+            f"{stats['total_tokens']}/{stats['num_ctx']} tokens "
+            f"(system {stats['system_tokens']}, history {stats['history_tokens']} "
+            f"over {stats['history_messages']} messages, {stats['reserve']} reserved for the reply)"
+        )
+
+
+def eval_stats(chunk):
+    """Server-side timings from the final chunk of a chat response."""
+    stats = {}
+    for key in ("prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration", "load_duration"):
+        value = chunk.get(key)
+        if value is not None:
+            stats[key] = value
+    return stats
+
+
+def describe_eval(stats):
+    prompt_tokens = stats.get("prompt_eval_count", 0)
+    prompt_ms = stats.get("prompt_eval_duration", 0) / 1e6
+    return f"server evaluated {prompt_tokens} prompt tokens in {prompt_ms:.0f} ms"
@@ -0,0 +1,416 @@
+import asyncio
+import hashlib
+import io
+import itertools
+import json
+import os
+import signal
+import socket
+from collections import OrderedDict, deque
+from contextlib import redirect_stdout
+
+import hwprobe
+
+DEFAULT_PORT = 11500
+
+# Inputs that Stella.handle_command answers instead of the model.
+COMMANDS = ("system info", "profile", "current model", "which model", "cache", "context", "models", "stats")
+COMMAND_PREFIXES = ("recall ", "journal ", "stats ")
+
+
+def is_command(text):
+    text = text.strip().lower()
+    return text in COMMANDS or text.startswith(COMMAND_PREFIXES)
+
+
+def default_address(config=None, directory=None):
+    """Unix socket path where available, otherwise a localhost TCP port.
+
+    Both are derived from the memory directory (the working directory), so
+    a Stella started elsewhere gets its own daemon rather than this one's
+    memory.
+    """
+    settings = (config or {}).get("daemon", {})
+    key = hashlib.sha1(os.path.abspath(directory or os.getcwd()).encode()).hexdigest()[:12]
+    if hasattr(socket, "AF_UNIX"):
+        if settings.get("socket"):
+            return settings["socket"]
+        runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or hwprobe.cache_dir()
+        return os.path.join(runtime_dir, f"stella-{key}.sock")
+    return ("127.0.0.1", settings.get("port") or DEFAULT_PORT + int(key, 16) % 1000)
+
+
+async def open_connection(address):
+    if isinstance(address, tuple):
+        return await asyncio.open_connection(*address)
+    return await asyncio.open_unix_connection(address)
+
+
+def send(writer, message):
+    if not writer.is_closing():
+        writer.write((json.dumps(message, ensure_ascii=False) + "\n").encode())
+
+
+def is_running(address):
+    """True when a daemon answers on `address`."""
+    family = socket.AF_INET if isinstance(address, tuple) else socket.AF_UNIX
+    try:
+        with socket.socket(family, socket.SOCK_STREAM) as probe:
+            probe.settimeout(0.5)
+            probe.connect(address)
+        return True
+    except OSError:
+        return False
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Scheduler:
+    """Round-robin queue over clients, so a chatty shell cannot starve the others.
+
+    Each client has its own FIFO; `next()` takes the head of the next client
+    in turn. `max_queue` bounds the waiting requests overall and
+    `max_per_client` the requests one client may have waiting or running.
+    """
+
+    def __init__(self, max_queue=16, max_per_client=4):
+        self.max_queue = max_queue
+        self.max_per_client = max_per_client
+        self.queues = OrderedDict()
+        self.running = {}
+        self.last = None
+        self.ready = asyncio.Event()
+
+    def waiting(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    def submit(self, request):
+        client = request["client"]
+        if client not in self.queues:
+            self.queues[client] = deque()
+            if self.last in self.queues and self.last != client:
+                # A newcomer goes ahead of the client served last, not behind it.
+                self.queues.move_to_end(self.last)
+        queue = self.queues[client]
+        if self.waiting() >= self.max_queue:
+            raise QueueFull(f"Stella is busy ({self.max_queue} requests waiting), try again shortly")
+        if len(queue) + (1 if client in self.running else 0) >= self.max_per_client:
+            raise QueueFull(f"Too many requests from this terminal (limit {self.max_per_client})")
+        queue.append(request)
+        self.ready.set()
+        return self.waiting()
+
+    def cancel(self, client, request_id):
+        queue = self.queues.get(client)
+        if queue:
+            for request in queue:
+                if request["id"] == request_id:
+                    queue.remove(request)
+                    return request
+        return None
+
+    def drop_client(self, client):
+        return list(self.queues.pop(client, ()))
+
+    async def next(self):
+        while True:
+            for client in list(self.queues):
+                queue = self.queues[client]
+                if queue:
+                    # Move this client to the back of the rotation.
+                    self.queues.move_to_end(client)
+                    self.last = client
+                    return queue.popleft()
+            self.ready.clear()
+            await self.ready.wait()
+
+
+class StellaDaemon:
+    """Serves one Stella (model, residency, memory) to many terminals.
+
+    Clients speak newline-delimited JSON over a Unix socket (localhost TCP
+    where there are no Unix sockets):
+        -> {"type": "chat", "id": "...", "text": "..."}
+        -> {"type": "command", "id": "...", "text": "stats"}
+        -> {"type": "cancel", "id": "..."}
+        -> {"type": "status"}
+        <- {"type": "queued", "id": ..., "waiting": n}
+        <- {"type": "token", "id": ..., "text": "..."}
+        <- {"type": "done", "id": ..., "reply": "...", "model": "..."}
+        <- {"type": "output", "id": ..., "text": "..."}
+        <- {"type": "cancelled" | "error", "id": ..., ...}
+    Turns and commands run one at a time, in the scheduler's order, since
+    they all share the same conversation.
+    """
+
+    def __init__(self, stella, address, max_queue=16, max_per_client=4):
+        self.stella = stella
+        self.address = address
+        self.scheduler = Scheduler(max_queue, max_per_client)
+        self.current = None
+        self.current_task = None
+        self.clients = {}
+        self.client_ids = itertools.count(1)
+
+    async def handle_client(self, reader, writer):
+        client = next(self.client_ids)
+        self.clients[client] = writer
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    send(writer, {"type": "error", "message": "invalid JSON"})
+                    continue
+                self.handle_message(client, writer, message)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            del self.clients[client]
+            self.scheduler.drop_client(client)
+            if self.current and self.current["client"] == client:
+                self.current_task.cancel()
+            writer.close()
+
+    def handle_message(self, client, writer, message):
+        kind = message.get("type")
+        request_id = message.get("id")
+        if kind in ("chat", "command"):
+            text = (message.get("text") or "").strip()
+            if not text:
+                send(writer, {"type": "error", "id": request_id, "message": "empty message"})
+                return
+            request = {
+                "client": client, "id": request_id, "text": text, "writer": writer, "command": kind == "command"
+            }
+            try:
+                waiting = self.scheduler.submit(request)
+            except QueueFull as e:
+                send(writer, {"type": "error", "id": request_id, "message": str(e)})
+                return
+            send(writer, {"type": "queued", "id": request_id, "waiting": waiting})
+        elif kind == "cancel":
+            if self.scheduler.cancel(client, request_id):
+                send(writer, {"type": "cancelled", "id": request_id})
+            elif self.current and self.current["client"] == client and self.current["id"] == request_id:
+                self.current_task.cancel()
+        elif kind == "status":
+            send(writer, {
+                "type": "status",
+                "model": getattr(self.stella, "current_model", None),
+                "clients": len(self.clients),
+                "waiting": self.scheduler.waiting(),
+                "busy": self.current is not None,
+            })
+        else:
+            send(writer, {"type": "error", "id": request_id, "message": f"unknown request type {kind!r}"})
+
+    def run_command(self, text):
+        """Stella's command output, captured for the client instead of the daemon's terminal."""
+        output = io.StringIO()
+        with redirect_stdout(output):
+            handled = self.stella.handle_command(text)
+        if not handled:
+            raise ValueError(f"unknown command {text!r}")
+        return output.getvalue()
+
+    async def worker(self):
+        from engine import generate_reply
+
+        while True:
+            request = await self.scheduler.next()
+            writer = request["writer"]
+            self.current = request
+            self.scheduler.running[request["client"]] = request
+
+            def on_token(token):
+                send(writer, {"type": "token", "id": request["id"], "text": token})
+
+            if request.get("command"):
+                self.current_task = asyncio.create_task(asyncio.to_thread(self.run_command, request["text"]))
+                await asyncio.wait({self.current_task})
+            else:
+                self.current_task = asyncio.create_task(generate_reply(self.stella, request["text"], on_token))
+                await asyncio.wait({self.current_task})
+                self.stella.end_turn()
+
+            if self.current_task.cancelled():
+                send(writer, {"type": "cancelled", "id": request["id"]})
+            elif self.current_task.exception():
+                send(writer, {"type": "error", "id": request["id"], "message": str(self.current_task.exception())})
+            elif request.get("command"):
+                send(writer, {"type": "output", "id": request["id"], "text": self.current_task.result()})
+            else:
+                send(writer, {
+                    "type": "done",
+                    "id": request["id"],
+                    "reply": self.current_task.result(),
+                    "model": getattr(self.stella, "current_model", None),
+                })
+            self.scheduler.running.pop(request["client"], None)
+            self.current = None
+            self.current_task = None
+
+    async def serve(self):
+        if isinstance(self.address, tuple):
+            server = await asyncio.start_server(self.handle_client, *self.address)
+        else:
+            if os.path.exists(self.address):
+                os.unlink(self.address)
+            server = await asyncio.start_unix_server(self.handle_client, self.address)
+            os.chmod(self.address, 0o600)
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        worker = asyncio.create_task(self.worker())
+        print(f"Stella is listening on {self.address}", flush=True)
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+            if not isinstance(self.address, tuple):
+                try:
+                    os.unlink(self.address)
+                except OSError:
+                    pass
+            await asyncio.to_thread(self.stella.memory.close)
+
+
+def serve(stella_module, reprobe=False, profile=None):
+    """`stella serve`: keep one warm Stella for every terminal."""
+    from config import load_config
+
+    address = default_address(load_config())
+    if is_running(address):
+        print(f"A Stella daemon is already running on {address}")
+        return 1
+
+    stella = stella_module.Stella(reprobe=reprobe, headless=True, profile=profile)
+    if stella.config["residency"]["warmup"]:
+        stella.residency.warm_async()
+    stella.residency.start()
+    stella.governor.start()
+    settings = stella.config["daemon"]
+    daemon = StellaDaemon(
+        stella, address, max_queue=settings["max_queue"], max_per_client=settings["max_per_client"]
+    )
+    asyncio.run(daemon.serve())
+    return 0
+
+
+class StellaClient:
+    """Thin terminal client for a running daemon."""
+
+    def __init__(self, address):
+        self.address = address
+        self.request_ids = itertools.count(1)
+
+    def print_colored(self, text, color, end="\n"):
+        colors = {"magenta": "\033[95m\033[1m", "yellow": "\033[93m", "red": "\033[91m", "green": "\033[92m"}
+        print(f"{colors.get(color, '')}{text}\033[0m", end=end, flush=True)
+
+    async def turn(self, reader, writer, text, kind="chat"):
+        request_id = str(next(self.request_ids))
+        send(writer, {"type": kind, "id": request_id, "text": text})
+        await writer.drain()
+
+        loop = asyncio.get_running_loop()
+        interrupted = False
+
+        def interrupt():
+            nonlocal interrupted
+            if not interrupted:
+                interrupted = True
+                send(writer, {"type": "cancel", "id": request_id})
+
+        try:
+            loop.add_signal_handler(signal.SIGINT, interrupt)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+        started = False
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    raise ConnectionError("the daemon closed the connection")
+                message = json.loads(line)
+                if message.get("id") != request_id:
+                    continue
+                kind = message["type"]
+                if kind == "queued" and message["waiting"] > 1:
+                    self.print_colored(f"(waiting behind {message['waiting'] - 1} other requests)", "yellow")
+                elif kind == "token":
+                    if not started:
+                        self.print_colored("Stella: ", "magenta", end="")
+                        started = True
+                    print(message["text"], end="", flush=True)
+                elif kind == "done":
+                    if not started:
+                        self.print_colored("Stella: ", "magenta", end="")
+                        print(message["reply"], end="")
+                    print("\n", flush=True)
+                    return
+                elif kind == "output":
+                    print(message["text"], end="", flush=True)
+                    return
+                elif kind == "cancelled":
+                    self.print_colored("\n(stopped)\n", "yellow")
+                    return
+                elif kind == "error":
+                    self.print_colored(f"\nError: {message['message']}\n", "red")
+                    return
+        finally:
+            try:
+                loop.remove_signal_handler(signal.SIGINT)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+    async def run(self):
+        from prompt_toolkit import PromptSession
+        from prompt_toolkit.formatted_text import HTML
+
+        reader, writer = await open_connection(self.address)
+        session = PromptSession()
+        self.print_colored(f"Connected to the Stella daemon on {self.address}. Type 'exit' to leave.\n", "green")
+        try:
+            while True:
+                try:
+                    text = await session.prompt_async(HTML("<ansicyan>You:</ansicyan> "))
+                except (KeyboardInterrupt, EOFError):
+                    break
+                if text.strip().lower() == "exit":
+                    break
+                if text.strip():
+                    await self.turn(reader, writer, text, "command" if is_command(text) else "chat")
+        except ConnectionError as e:
+            self.print_colored(str(e), "red")
+        finally:
+            writer.close()
+        self.print_colored("\nStella: See you soon, okay? 🌼", "magenta")
+
+
+def connect(address=None):
+    """`stella connect`: talk to a running daemon from this terminal."""
+    from config import load_config
+
+    address = address or default_address(load_config())
+    if not is_running(address):
+        print(f"No Stella daemon on {address}; start one with: python stella.py serve")
+        return 1
+    asyncio.run(StellaClient(address).run())
+    return 0
@@ -0,0 +1,191 @@
+import asyncio
+
+
+async def stream_reply(stella, prompt, messages, turn, on_token=None):
+    """Cached reply or streamed generation with model fallbacks, for one turn.
+
+    Returns (reply, model), or (None, None) with turn["error"] set when no
+    model answered. Metrics are recorded for every reply.
+    """
+    models = stella.models.models_for_turn()
+    if not models:
+        turn["error"] = "no model available"
+    else:
+        reply = await asyncio.to_thread(stella.cached_reply, prompt, models[0], turn)
+        if reply is not None:
+            if on_token:
+                on_token(reply)
+            await asyncio.to_thread(stella.record_metrics, models[0], turn, True)
+            return reply, models[0]
+
+    for model in models:
+        parts = []
+        complete = False
+        try:
+            await stella.stream_chat(model, messages, turn, parts, on_token)
+            complete = True
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Once tokens have been shown, keep what arrived rather than
+            # restarting the reply on another model.
+            if not parts:
+                stella.models.record_failure(model)
+                turn["error"] = str(e)
+                continue
+
+        stella.models.record_success(model)
+        turn["error"] = None
+        reply = "".join(parts)
+        if complete:
+            await asyncio.to_thread(stella.cache_reply, prompt, model, turn, reply)
+        await asyncio.to_thread(stella.record_metrics, model, turn)
+        return reply, model
+
+    return None, None
+
+
+async def generate_reply(stella, user_input, on_token=None):
+    """One chat turn on the event loop: the user's message in, Stella's reply out and remembered."""
+    messages, turn = await asyncio.to_thread(stella.prepare_turn, user_input)
+    reply, model = await stream_reply(stella, user_input, messages, turn, on_token)
+    stella.last_eval = turn["eval"]
+    stella.last_prefill = turn.get("prefill_ms")
+    if reply is None:
+        return stella.FALLBACK_REPLY
+    await asyncio.to_thread(stella.finish_turn, user_input, model, reply)
+    return reply
+
+
+class AsyncEngine:
+    """Asyncio front end for the interactive chat.
+
+    The prompt stays live while a reply is generated: submitted messages are
+    queued for a single worker, the in-flight reply is rendered above the
+    input line as tokens arrive, and Ctrl-C cancels the generation instead of
+    ending the session. Journaling and memory flushing run off the event
+    loop.
+    """
+
+    def __init__(self, stella):
+        # prompt_toolkit is only needed for the interactive chat, not by the
+        # daemon, batch mode or the benchmarks that share this module.
+        from prompt_toolkit.styles import Style
+
+        self.stella = stella
+        self.queue = None
+        self.partial = None
+        self.current = None
+        self.tasks = set()
+        self.style = Style.from_dict({
+            'prompt': 'ansicyan bold',
+        })
+
+    def spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def invalidate(self):
+        app = self.stella.session.app
+        if app.is_running:
+            app.invalidate()
+
+    def prompt_message(self):
+        from prompt_toolkit.formatted_text import ANSI, HTML
+
+        queued = self.queue.qsize() if self.queue else 0
+        if self.partial is None and not queued:
+            return HTML("<ansicyan>You:</ansicyan> ")
+
+        text = ""
+        if self.partial is not None:
+            text += f"\033[95m\033[1mStella:\033[0m {''.join(self.partial) or '...'}\n"
+        if queued:
+            text += f"\033[93m({queued} queued)\033[0m\n"
+        return ANSI(text + "\033[96mYou:\033[0m ")
+
+    async def generate(self, user_input):
+        parts = self.partial
+
+        def on_token(token):
+            parts.append(token)
+            self.invalidate()
+
+        previous = getattr(self.stella, 'current_model', None)
+        reply = await generate_reply(self.stella, user_input, on_token)
+        model = getattr(self.stella, 'current_model', None)
+        if model and model != previous:
+            self.stella.ui.print_colored(f"✅ Using model: {model}", "green")
+        return reply
+
+    async def worker(self):
+        while True:
+            user_input = await self.queue.get()
+            self.partial = []
+            self.invalidate()
+            self.current = asyncio.create_task(self.generate(user_input))
+            await asyncio.wait({self.current})
+            self.stella.end_turn()
+
+            self.partial = None
+            if self.current.cancelled():
+                self.stella.ui.print_reply(None)
+            elif self.current.exception():
+                self.stella.ui.print_error(str(self.current.exception()))
+            else:
+                self.stella.ui.print_reply(self.current.result())
+            self.current = None
+            self.invalidate()
+
+    def cancel_generation(self):
+        if self.current is not None and not self.current.done():
+            self.current.cancel()
+            return True
+        return False
+
+    async def run(self):
+        from prompt_toolkit.patch_stdout import patch_stdout
+
+        self.queue = asyncio.Queue()
+        self.stella.print_welcome()
+
+        self.spawn(self.worker())
+
+        with patch_stdout(raw=True):
+            while True:
+                try:
+                    user_input = await self.stella.session.prompt_async(
+                        self.prompt_message,
+                        style=self.style
+                    )
+
+                    if user_input.lower() == "exit":
+                        self.stella.ui.print_goodbye()
+                        break
+
+                    if self.stella.handle_command(user_input):
+                        continue
+
+                    self.queue.put_nowait(user_input)
+                    self.invalidate()
+
+                except KeyboardInterrupt:
+                    if self.cancel_generation():
+                        continue
+                    self.stella.ui.print_divider()
+                    self.stella.ui.print_slowly("\nStella: See you soon, okay? 🌼\n")
+                    break
+                except EOFError:
+                    self.stella.ui.print_divider()
+                    self.stella.ui.print_slowly("\nStella: See you soon, okay? 🌼\n")
+                    break
+                except Exception as e:
+                    self.stella.ui.print_error(str(e))
+
+        self.cancel_generation()
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await asyncio.to_thread(self.stella.memory.close)
@@ -1,20 +1,40 @@
+import asyncio
 import json
 import os
+import sys
 from datetime import datetime
 import subprocess
 import time
 import random
 import shutil
-import multiprocessing
 import platform
-from prompt_toolkit import PromptSession
-from prompt_toolkit.styles import Style
-from prompt_toolkit.formatted_text import HTML
-import ollama
+from concurrent.futures import ThreadPoolExecutor
+from backends import create_backend
+from memory_store import MemoryStore
+from journal import Journal, parse_day
+from memory_sqlite import SqliteCold, SqliteStore
+from memory_tiers import ColdSegments, TieredLog, cold_directory
+from context_builder import ContextBuilder, message_tokens, eval_stats, describe_eval
+from model_resolver import ModelResolver
+import hwprobe
+import tuner
+from engine import AsyncEngine, generate_reply
+from config import load_config
+from recall_index import RecallIndex
+from summarizer import Summarizer
+from residency import ResidencyManager
+from prefill import Prefiller, saved_prompt_ms
+from response_cache import ResponseCache
+from metrics import MetricsStore
+from profiles import PROFILES, ResourceGovernor
+from idle import BreakReminder, IdleMonitor, Scheduler
 
 class SystemCapabilities:
-    def __init__(self):
-        self.cpu_threads = min(multiprocessing.cpu_count(), 16)
+    CACHED_FIELDS = ["gpu_available", "gpu_type", "batch_size", "gpu_details", "rocm_version", "ollama_version"]
+    
+    def __init__(self, reprobe=False):
+        self.cpu_threads = min(os.cpu_count() or 1, 16)
+        self.seed = int(time.time())
         self.gpu_available = False
         self.gpu_type = "none"
         self.batch_size = 128
@@ -22,46 +42,104 @@ class SystemCapabilities:
         self.gpu_details = {}
         self.rocm_version = None
         self.ollama_version = "unknown"
+        self.from_cache = False
+        self.fingerprint = None
+        self.profiles = {}
         
-        self.detect_capabilities()
+        self.detect_capabilities(reprobe)
         
-    def detect_capabilities(self):
-        self._detect_amd_gpu()
+    def detect_capabilities(self, reprobe=False):
+        key = hwprobe.fingerprint()
+        self.fingerprint = key
+        capabilities = None if reprobe else hwprobe.load_cached(key)
+        self.from_cache = capabilities is not None
         
-        if not self.gpu_available:
-            self._detect_nvidia_gpu()
-            
-        self._detect_ollama_version()
+        if capabilities is None:
+            capabilities = self._probe()
+            hwprobe.save_cache(key, capabilities)
+        
+        for field in self.CACHED_FIELDS:
+            if field in capabilities:
+                setattr(self, field, capabilities[field])
         
+        if self.gpu_type == "amd":
+            self._set_rocm_env_variables()
+    
+    def _probe(self):
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            amd = pool.submit(self._detect_amd_gpu)
+            nvidia = pool.submit(self._detect_nvidia_gpu)
+            rocm_version = pool.submit(self._get_rocm_version)
+            ollama_version = pool.submit(self._detect_ollama_version)
+        
+        capabilities = {
+            "gpu_available": False,
+            "gpu_type": "none",
+            "batch_size": self.batch_size,
+            "gpu_details": {},
+            "rocm_version": None,
+            "ollama_version": ollama_version.result() or self.ollama_version,
+        }
+        
+        gpu = amd.result() or nvidia.result()
+        if gpu:
+            capabilities.update(gpu)
+            capabilities["gpu_available"] = True
+            if gpu["gpu_type"] == "amd":
+                capabilities["rocm_version"] = rocm_version.result()
+        
+        return capabilities
+    
+    def _batch_size_for_vram(self, mem_mb):
+        if mem_mb > 16000:
+            return 256
+        elif mem_mb > 8000:
+            return 192
+        elif mem_mb > 4000:
+            return 128
+        return self.batch_size
+    
     def _detect_amd_gpu(self):
+        for gpu in hwprobe.drm_gpus():
+            if gpu["vendor"] == "amd" and gpu.get("vram_bytes"):
+                mem_gb = round(gpu["vram_bytes"] / (1024 ** 3), 1)
+                return {
+                    "gpu_type": "amd",
+                    "gpu_details": {"id": gpu["card"], "memory": f"{mem_gb}GB"},
+                    "batch_size": self._batch_size_for_vram(mem_gb * 1000),
+                }
+        
+        if not shutil.which("rocm-smi"):
+            return None
         try:
             rocm_output = subprocess.run(["rocm-smi"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=2)
             if rocm_output.returncode == 0 and "GPU" in rocm_output.stdout:
-                self.gpu_available = True
-                self.gpu_type = "amd"
-                
-                self._get_rocm_version()
-                self._extract_amd_memory_info(rocm_output.stdout)
-                self._set_rocm_env_variables()
+                gpu = {"gpu_type": "amd", "gpu_details": {}, "batch_size": self.batch_size}
+                self._extract_amd_memory_info(rocm_output.stdout, gpu)
+                return gpu
         except Exception:
             pass
+        return None
     
     def _get_rocm_version(self):
+        version = hwprobe.rocm_version()
+        if version or not shutil.which("rocminfo"):
+            return version
         try:
             rocm_version_output = subprocess.run(["rocminfo"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=2)
             for line in rocm_version_output.stdout.split('\n'):
                 if "ROCm Version" in line:
-                    self.rocm_version = line.split(':')[1].strip()
-                    break
+                    return line.split(':')[1].strip()
         except Exception:
             pass
+        return None
     
-    def _extract_amd_memory_info(self, output):
+    def _extract_amd_memory_info(self, output, gpu):
         if "Memory" in output:
             for line in output.split('\n'):
                 if "GPU" in line and "Card" in line:
                     gpu_id = line.strip()
-                    self.gpu_details["id"] = gpu_id
+                    gpu["gpu_details"]["id"] = gpu_id
                 if "Memory" in line and ("GB" in line or "MB" in line):
                     try:
                         if "GB" in line:
@@ -69,13 +147,8 @@ class SystemCapabilities:
                             for i, part in enumerate(mem_parts):
                                 if "GB" in part:
                                     mem_size = float(mem_parts[i-1])
-                                    self.gpu_details["memory"] = f"{mem_size}GB"
-                                    if mem_size > 16:
-                                        self.batch_size = 256
-                                    elif mem_size > 8:
-                                        self.batch_size = 192
-                                    elif mem_size > 4:
-                                        self.batch_size = 128
+                                    gpu["gpu_details"]["memory"] = f"{mem_size}GB"
+                                    gpu["batch_size"] = self._batch_size_for_vram(mem_size * 1000)
                                     break
                     except:
                         pass
@@ -89,43 +162,47 @@ class SystemCapabilities:
         os.environ["HSA_ENABLE_SDMA"] = "0"
     
     def _detect_nvidia_gpu(self):
+        if platform.system() == "Linux":
+            # The kernel already tells us whether an NVIDIA card and driver are
+            # present; only ask nvidia-smi for VRAM when they are.
+            has_card = any(gpu["vendor"] == "nvidia" for gpu in hwprobe.drm_gpus())
+            if not has_card and not hwprobe.nvidia_driver_version():
+                return None
+        if not shutil.which("nvidia-smi"):
+            return None
         try:
-            nvidia_output = subprocess.run(["nvidia-smi"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=2)
+            nvidia_output = subprocess.run(
+                ["nvidia-smi", "--query-gpu=memory.total", "--format=csv,noheader,nounits"],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=2
+            )
             if nvidia_output.returncode == 0:
-                self.gpu_available = True
-                self.gpu_type = "nvidia"
-                
-                self._extract_nvidia_memory_info(nvidia_output.stdout)
+                gpu = {"gpu_type": "nvidia", "gpu_details": {}, "batch_size": self.batch_size}
+                self._extract_nvidia_memory_info(nvidia_output.stdout, gpu)
+                return gpu
         except Exception:
             pass
+        return None
     
-    def _extract_nvidia_memory_info(self, output):
-        if "MiB" in output:
-            for line in output.split('\n'):
-                if "MiB" in line:
-                    try:
-                        mem_parts = line.split()
-                        for i, part in enumerate(mem_parts):
-                            if "MiB" in part:
-                                mem_size = int(mem_parts[i-1])
-                                self.gpu_details["memory"] = f"{mem_size}MiB"
-                                if mem_size > 16000:
-                                    self.batch_size = 256
-                                elif mem_size > 8000:
-                                    self.batch_size = 192
-                                elif mem_size > 4000:
-                                    self.batch_size = 128
-                                break
-                    except:
-                        pass
+    def _extract_nvidia_memory_info(self, output, gpu):
+        for line in output.split('\n'):
+            try:
+                mem_size = int(line.strip())
+            except ValueError:
+                continue
+            gpu["gpu_details"]["memory"] = f"{mem_size}MiB"
+            gpu["batch_size"] = self._batch_size_for_vram(mem_size)
+            break
     
     def _detect_ollama_version(self):
+        if not shutil.which("ollama"):
+            return None
         try:
             ollama_version = subprocess.run(["ollama", "version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=2)
             if ollama_version.returncode == 0:
-                self.ollama_version = ollama_version.stdout.strip()
+                return ollama_version.stdout.strip()
         except Exception:
             pass
+        return None
     
     def configure_gpu(self):
         if not self.gpu_available:
@@ -161,12 +238,17 @@ class SystemCapabilities:
             if platform.system() == "Linux":
                 os.environ["CUDA_VISIBLE_DEVICES"] = "0"
     
-    def get_ollama_options(self):
+    def tuned_profile(self, model):
+        if model not in self.profiles:
+            self.profiles[model] = tuner.load_profile(model, self.fingerprint)
+        return self.profiles[model]
+    
+    def get_ollama_options(self, model=None):
         options = {
             "num_thread": self.cpu_threads,
             "num_ctx": self.context_size,
             "batch_size": self.batch_size,
-            "seed": int(time.time()),
+            "seed": self.seed,
             "repeat_penalty": 1.05,
             "temperature": 0.7,
             "top_k": 30,
@@ -185,6 +267,12 @@ class SystemCapabilities:
             elif self.gpu_type == "nvidia":
                 options["gpu_layers"] = -1
         
+        profile = self.tuned_profile(model)
+        if profile:
+            options["num_thread"] = profile["num_thread"]
+            options["batch_size"] = profile["batch_size"]
+            options["num_ctx"] = profile["num_ctx"]
+        
         return options
     
     def get_system_info(self):
@@ -198,6 +286,8 @@ class SystemCapabilities:
         info.append(f"CPU Threads: {self.cpu_threads}")
         info.append(f"Context Size: {self.context_size}")
         info.append(f"Batch Size: {self.batch_size}")
+        if self.from_cache:
+            info.append("Hardware: cached probe (run with --reprobe to refresh)")
         
         return info
 
@@ -207,7 +297,7 @@ class StellaUI:
 ╭────────────────────────────────────────────────────────╮
 │                                                        │
 │   ⋆｡°✩  𝓢𝓽𝓮𝓵𝓵𝓪 - Your Terminal Companion  ✩°｡⋆    │
-│                     [FULL POWER MODE]                  │
+│                      [ADAPTIVE MODE]                   │
 ╰────────────────────────────────────────────────────────╯
 """
 
@@ -233,7 +323,7 @@ class StellaUI:
         self.divider = "─" * shutil.get_terminal_size().columns
     
     def clear_screen(self):
-        os.system('cls' if os.name == 'nt' else 'clear')
+        print("\033[2J\033[3J\033[H", end="", flush=True)
         
     def print_colored(self, text, color="white", bold=False):
         colors = {
@@ -264,17 +354,13 @@ class StellaUI:
     def print_divider(self):
         self.print_colored(self.divider, "blue")
     
-    def print_thinking(self):
-        self.print_colored("Stella is thinking", "magenta", bold=True)
-        for _ in range(2):
-            print(".", end='', flush=True)
-            time.sleep(0.2)
-        print("\r" + " " * 20 + "\r", end='')
-    
-    def print_response(self, response):
+    def print_reply(self, reply):
         self.print_divider()
         self.print_colored(random.choice(self.FACES), "cyan")
-        self.print_slowly(f"Stella: {response}")
+        if reply is None:
+            self.print_colored("(stopped)", "yellow")
+        else:
+            print(f"Stella: {reply}")
         self.print_divider()
     
     def print_error(self, error_message):
@@ -293,72 +379,144 @@ class StellaUI:
 
 
 class StellaMemory:
-    def __init__(self, memory_file="memory.json", journal_file="journal.txt"):
+    def __init__(self, memory_file="memory.json", journal_file="journal.txt", backend="auto", db_file="memory.db",
+                 journal=None, hot_messages=500):
         self.memory_file = memory_file
         self.journal_file = journal_file
-        self.memory = self.load_memory()
+        self.hot_messages = hot_messages
+        self.journal = None
+        if backend == "sqlite" or (backend == "auto" and os.path.exists(db_file)):
+            self.store = SqliteStore(db_file)
+        else:
+            self.store = MemoryStore(memory_file, snapshot=self._snapshot)
+            self.journal = Journal(journal_file, **(journal or {}))
+        self.memory, archive = self.load_memory()
+        if archive:
+            # A memory.json from before the cold tier: archive it once, in the
+            # background. The snapshot reads self.memory, so not before now.
+            self.store.compact(wait=False)
     
     def load_memory(self):
-        if os.path.exists(self.memory_file):
-            try:
-                with open(self.memory_file, "r") as f:
-                    return json.load(f)
-            except Exception:
-                return {"log": [], "user_preferences": {}}
-        return {"log": [], "user_preferences": {}}
+        default = {"log": [], "user_preferences": {}}
+        if isinstance(self.store, SqliteStore):
+            memory, records = self.store.load(default, tail=self.hot_messages)
+            cold = SqliteCold(self.store, memory.pop("cold", 0))
+        else:
+            memory, records = self.store.load(default)
+            cold = ColdSegments(cold_directory(self.memory_file), memory.pop("cold", 0))
+        memory.setdefault("user_preferences", {})
+        memory["log"] = TieredLog(cold, memory.get("log", []), self.hot_messages)
+        for record in records:
+            self._apply(memory, record)
+        return memory, memory["log"].needs_spill()
     
     def save_memory(self):
-        with open(self.memory_file, "w") as f:
-            json.dump(self.memory, f, indent=2)
+        self.store.compact()
+    
+    def _state(self, log):
+        return {
+            "log": log,
+            "user_preferences": dict(self.memory.get("user_preferences", {})),
+            "summaries": list(self.memory.get("summaries", [])),
+        }
+    
+    def _snapshot(self):
+        log = self.memory["log"]
+        log.spill()
+        state = self._state(log.hot_entries())
+        state["cold"] = log.cold_count
+        return state
+    
+    def _apply(self, memory, record):
+        op = record.get("op")
+        if op == "log":
+            memory["log"].append(record["entry"])
+        elif op == "pref":
+            memory.setdefault("user_preferences", {})[record["key"]] = record["value"]
+        elif op == "summary":
+            memory.setdefault("summaries", []).append(record["summary"])
+        elif op == "reset":
+            log = memory["log"]
+            memory.clear()
+            memory.update(record["state"])
+            log.reset(memory.get("log", []))
+            memory["log"] = log
+    
+    def _commit(self, record):
+        with self.store.lock:
+            self._apply(self.memory, record)
+            self.store.append(record)
     
     def add_to_journal(self, thought):
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-        with open(self.journal_file, "a") as f:
-            f.write(f"[{timestamp}] {thought}\n")
+        if isinstance(self.store, SqliteStore):
+            self.store.add_journal(thought)
+            return
+        self.journal.add(thought)
+    
+    def journal_day(self, day):
+        if isinstance(self.store, SqliteStore):
+            return self.store.journal_day(day)
+        return self.journal.read_day(day)
+    
+    def _entry(self, role, message):
+        entry = {"role": role, "content": message}
+        entry["tokens"] = message_tokens(entry)
+        return entry
     
     def add_user_message(self, message):
-        self.memory["log"].append({"role": "user", "content": message})
-        self.save_memory()
+        self._commit({"op": "log", "entry": self._entry("user", message)})
     
     def add_assistant_message(self, message):
-        self.memory["log"].append({"role": "assistant", "content": message})
-        self.save_memory()
+        self._commit({"op": "log", "entry": self._entry("assistant", message)})
     
     def get_recent_messages(self, limit=10):
         return self.memory["log"][-limit:]
     
+    def add_summary(self, summary):
+        self._commit({"op": "summary", "summary": summary})
+    
     def update_user_preference(self, key, value):
-        if "user_preferences" not in self.memory:
-            self.memory["user_preferences"] = {}
-        self.memory["user_preferences"][key] = value
+        self._commit({"op": "pref", "key": key, "value": value})
+    
+    def import_json(self, path):
+        with open(path, "r") as f:
+            state = json.load(f)
+        state.pop("wal_seq", None)
+        state.pop("cold", None)
+        state.setdefault("log", [])
+        state.setdefault("user_preferences", {})
+        self._commit({"op": "reset", "state": state})
         self.save_memory()
+    
+    def export_json(self, path):
+        with self.store.lock:
+            state = self._state(self.memory["log"][:])
+        self.store.write_snapshot(state, path=path, indent=2)
+    
+    def search(self, query, limit=5):
+        if not isinstance(self.store, SqliteStore):
+            return None
+        return self.store.search(query, limit)
+    
+    def close(self):
+        if self.journal:
+            self.journal.close()
+        self.store.close()
 
 
 class StellaContext:
     IDLE_THRESHOLD = 3600
     
     @staticmethod
-    def get_idle_seconds():
-        try:
-            output = subprocess.check_output(["xprintidle"]).decode().strip()
-            return int(output) // 1000
-        except Exception:
-            try:
-                output = subprocess.check_output(["ioreg", "-c", "IOHIDSystem"]).decode()
-                for line in output.split('\n'):
-                    if "HIDIdleTime" in line:
-                        ns = int(line.split('=')[-1].strip())
-                        return ns // 1000000000
-            except Exception:
-                pass
-            return 0
-    
-    @classmethod
-    def get_system_context(cls):
-        idle = cls.get_idle_seconds()
-        if idle >= cls.IDLE_THRESHOLD:
+    def get_system_context(idle, active=None, remind_after=None):
+        if idle is None:
+            return None
+        if idle >= StellaContext.IDLE_THRESHOLD:
             return "The system has been idle for a long time."
         elif idle < 300:
+            if active and remind_after and active >= remind_after:
+                return (f"The user has been actively using the system for {active // 60:.0f} minutes "
+                        "without a break; gently suggest one.")
             return "The user has been actively using the system."
         else:
             return "The user might be away or taking a short break."
@@ -379,98 +537,445 @@ class Stella:
         "Your name is Stella. You're a kind and caring AI who lives in the user's terminal. "
         "You look after the user, gently reminding them to rest when needed. "
         "You can notice when the system has been idle. You keep a local memory of your conversations and journal thoughts. "
-        "You're currently running in FULL POWER MODE. Keep your responses helpful but concise for better performance."
+        "Keep your responses helpful but concise for better performance."
     )
     
-    def __init__(self):
-        self.system_config = SystemCapabilities()
+    MODELS = [
+        "llama3.2:3b",
+        "qwen2.5:7b",
+        "phi3.5:3.8b",
+        "llama3:8b",
+        "llama3", 
+        "llama2:7b", 
+        "llama2"
+    ]
+    
+    FALLBACK_REPLY = "I'm having trouble connecting to the AI model. Please make sure Ollama is running with 'ollama serve' and try again."
+    
+    def __init__(self, reprobe=False, headless=False, profile=None):
+        self.system_config = SystemCapabilities(reprobe=reprobe)
         self.system_config.configure_gpu()
         self.ui = StellaUI()
-        self.memory = StellaMemory()
-        self.session = PromptSession()
+        self.config = load_config()
+        self.headless = headless
+        settings = dict(self.config["profiles"])
+        configured = settings.pop("profile")
+        self.governor = ResourceGovernor(profile or configured, on_change=self.on_profile_change, **settings)
+        settings = self.config["memory"]
+        self.memory = StellaMemory(backend=settings["backend"], db_file=settings["db_path"],
+                                   journal=self.config["journal"], hot_messages=settings["hot_messages"])
+        self.session = None
+        if not headless:
+            from prompt_toolkit import PromptSession
+            self.session = PromptSession()
         
-        self.suggest_smaller_model = not self.system_config.gpu_available
-    
-    def get_user_input(self):
-        style = Style.from_dict({
-            'prompt': 'ansicyan bold',
-        })
+        settings = self.config["idle"]
+        self.scheduler = Scheduler()
+        self.idle = IdleMonitor(self.scheduler, interval=settings["interval"])
+        self.idle.start()
+        self.break_reminder = None
+        if settings["break_reminder"]:
+            self.break_reminder = BreakReminder(
+                self.idle, self.remind_break, remind_after=settings["remind_after"],
+                break_length=settings["break_length"], repeat_after=settings["repeat_after"]
+            )
+        self.scheduler.start()
         
-        return self.session.prompt(
-            HTML("<ansicyan>You:</ansicyan> "),
-            style=style
+        self.backend = create_backend(self.config["backend"])
+        self.models = ModelResolver(self.config["backend"]["models"] or self.MODELS, self.backend)
+        self.models.set_max_params(self.governor.profile["max_params"])
+        self.models.start()
+        self.context_builder = ContextBuilder(
+            self.system_config.context_size, reserve=512,
+            stable=self.config["prompt"]["layout"] == "stable"
         )
+        self.last_context = None
+        self.last_eval = None
+        self.last_status = None
+        self.last_prefill = None
+        self.turn = None
+        self.loop = None
+        
+        self.metrics = None
+        if self.config["metrics"]["enabled"]:
+            settings = self.config["metrics"]
+            self.metrics = MetricsStore(settings["path"], max_records=settings["max_records"])
+        
+        settings = self.config["residency"]
+        uses_embeddings = self.config["recall"]["enabled"] or (
+            self.config["response_cache"]["enabled"] and self.config["response_cache"]["similarity"]
+        )
+        self.residency = ResidencyManager(
+            self.backend, self.models.resolve, options=self.ollama_options,
+            idle_source=self.idle.idle_seconds, keep_alive=settings["keep_alive"],
+            unload_after=settings["unload_after"], resume_below=settings["resume_below"],
+            check_interval=settings["check_interval"],
+            embed_model=self.config["recall"]["embed_model"] if uses_embeddings else None,
+            embed_keep_alive=settings["embed_keep_alive"]
+        )
+        
+        self.recall = None
+        if self.config["recall"]["enabled"]:
+            self.recall = RecallIndex(
+                self.backend, model=self.config["recall"]["embed_model"],
+                keep_alive=self.residency.embed_keep_alive
+            )
+            self.recall.schedule(self.memory.memory["log"])
+        
+        self.prefiller = None
+        if self.config["prefill"]["enabled"]:
+            self.prefiller = Prefiller(self.backend, keep_alive=self.residency.keep_alive)
+        
+        self.response_cache = None
+        if self.config["response_cache"]["enabled"]:
+            settings = self.config["response_cache"]
+            self.response_cache = ResponseCache(
+                settings["path"], max_entries=settings["max_entries"], max_age=settings["max_age"],
+                similarity=settings["similarity"], client=self.backend, embed_model=self.config["recall"]["embed_model"],
+                keep_alive=self.residency.embed_keep_alive
+            )
+        
+        self.summarizer = None
+        if self.config["summaries"]["enabled"]:
+            settings = self.config["summaries"]
+            self.summarizer = Summarizer(
+                self.memory, self.backend, self.models.resolve,
+                span=settings["span"], fanout=settings["fanout"],
+                keep_recent=settings["keep_recent"], idle_delay=settings["idle_delay"],
+                options=self.ollama_options, keep_alive=self.residency.chat_keep_alive
+            )
+            self.summarizer.start()
+        
+        self.suggest_smaller_model = not self.system_config.gpu_available
     
     def check_available_models(self):
+        fast_models = []
+        for model in self.models.installed_models():
+            if any(size in model.lower() for size in ['7b', '3b', '1b']):
+                fast_models.append(model)
+        return fast_models
+    
+    def ollama_options(self, model=None):
+        return self.governor.options(self.system_config.get_ollama_options(model or self.models.resolve()))
+    
+    def on_profile_change(self, old, new, reason):
+        self.models.set_max_params(self.governor.profile["max_params"])
+        if not self.headless:
+            self.ui.print_colored(f"\n(Switching from the {old} to the {new} profile: {reason})", "yellow")
+    
+    def system_info(self):
+        info = self.system_config.get_system_info()
+        profile = self.governor.profile
+        options = self.ollama_options()
+        how = "pinned" if self.governor.pinned else f"adaptive, up to {PROFILES[self.governor.ceiling]['name']}"
+        info.append(f"Profile: {profile['name']} ({how}) - context {options['num_ctx']}, "
+                    f"{options['num_thread']} threads, batch {options['batch_size']}")
+        return info
+    
+    async def stream_chat(self, model, messages, turn, parts, on_token=None):
+        stream = await self.backend.achat(
+            model=model,
+            messages=messages,
+            options=turn["options"],
+            keep_alive=self.residency.keep_alive
+        )
         try:
-            result = subprocess.run(["ollama", "list"], capture_output=True, text=True)
-            models = result.stdout.strip().split('\n')[1:]
-            
-            fast_models = []
-            for model in models:
-                if any(size in model.lower() for size in ['7b', '3b', '1b']):
-                    fast_models.append(model.split()[0])
-            
-            return fast_models
-        except Exception:
-            return []
+            async for chunk in stream:
+                token = chunk["message"]["content"]
+                if token:
+                    parts.append(token)
+                    if turn["first_token"] is None:
+                        turn["first_token"] = time.perf_counter()
+                    if on_token:
+                        on_token(token)
+                if chunk.get("done"):
+                    turn["eval"] = eval_stats(chunk)
+        finally:
+            await stream.aclose()
+    
+    def new_turn(self, user_input, log, started=None):
+        """Prompt messages and the bookkeeping of one turn answering `user_input`, the last entry of `log`."""
+        turn = {"started": started or time.perf_counter(), "first_token": None, "eval": None, "prefill": None,
+                "error": None, "log": log}
+        messages, turn["options"], turn["context"] = self.build_prompt(user_input, log)
+        return messages, turn
     
-    def generate_response(self, user_input):
+    def prepare_turn(self, user_input):
+        started = time.perf_counter()
+        self.governor.begin_turn()
+        prefill = self.prefiller.begin_turn() if self.prefiller else None
+        self.last_eval = None
         self.memory.add_user_message(user_input)
-        context = StellaContext.get_system_context()
+        self.residency.touch()
+        if self.summarizer:
+            self.summarizer.begin_turn()
+        
+        messages, self.turn = self.new_turn(user_input, self.memory.memory["log"], started)
+        self.turn["prefill"] = prefill
+        self.last_context = self.turn["context"]
+        return messages, self.turn
+    
+    def build_prompt(self, user_input, log):
+        """Messages and options for answering `user_input`, the last entry of `log`."""
+        context = StellaContext.get_system_context(
+            self.idle.idle_seconds(),
+            self.break_reminder.active_seconds() if self.break_reminder else None,
+            self.config["idle"]["remind_after"]
+        )
+        self.last_status = context
+        
+        options = self.ollama_options()
+        self.context_builder.num_ctx = options["num_ctx"]
         
-        self.ui.print_thinking()
+        system = [{"role": "system", "content": self.SYSTEM_PROMPT}]
+        status = {"role": "system", "content": f"[System Status]: {context}"}
         
-        options = self.system_config.get_ollama_options()
+        # In the stable layout anything that changes from turn to turn goes
+        # after the history so the prompt prefix stays cacheable.
+        tail = []
+        volatile = tail if self.context_builder.stable else system
+        if context:
+            volatile.append(status)
         
-        models_to_try = [
-            "llama3.2:3b",
-            "qwen2.5:7b",
-            "phi3.5:3.8b",
-            "llama3:8b",
-            "llama3", 
-            "llama2:7b", 
-            "llama2"
-        ]
+        summary, history_start = self.history_summary()
+        if summary:
+            system.append(summary)
+        messages, stats = self.context_builder.build(system, log, start=history_start, tail_messages=tail)
         
-        for model in models_to_try:
+        memories = None
+        if self.governor.profile["recall"]:
+            memories = self.recall_memories(user_input, len(log) - stats["history_messages"])
+        if memories:
+            volatile.append({"role": "system", "content": memories})
+            messages, stats = self.context_builder.build(system, log, start=history_start, tail_messages=tail)
+        return messages, options, stats
+    
+    def history_summary(self):
+        """(system message with the summaries or None, log position they cover up to)."""
+        if self.summarizer:
+            summaries = self.summarizer.active_summaries()
+            if summaries:
+                # Summaries stand in for the raw turns they cover.
+                return {
+                    "role": "system",
+                    "content": "[Earlier in our conversation]:\n" + "\n".join(f"- {s['text']}" for s in summaries)
+                }, summaries[-1]["end"]
+        return None, 0
+    
+    def prefill(self):
+        """Hands the next turn's prompt prefix to the prefiller while the user types."""
+        model = getattr(self, 'current_model', None)
+        if not self.prefiller or not model or not self.context_builder.stable:
+            return
+        options = self.ollama_options()
+        self.context_builder.num_ctx = options["num_ctx"]
+        system = [{"role": "system", "content": self.SYSTEM_PROMPT}]
+        summary, history_start = self.history_summary()
+        if summary:
+            system.append(summary)
+        # The same window the next turn will start from, without moving it.
+        anchor = self.context_builder.anchor
+        messages, stats = self.context_builder.build(system, self.memory.memory["log"], start=history_start)
+        self.context_builder.anchor = anchor
+        self.prefiller.schedule(model, messages, options, stats["total_tokens"])
+    
+    def recall_memories(self, query, before):
+        if not self.recall or before <= 0:
+            return None
+        try:
+            hits = self.recall.search(
+                query,
+                k=self.config["recall"]["top_k"],
+                before=before,
+                min_score=self.config["recall"]["min_score"]
+            )
+        except Exception:
+            return None
+        
+        log = self.memory.memory["log"]
+        starts = []
+        for index, _ in hits:
+            start = index if log[index]["role"] == "user" else index - 1
+            if start >= 0 and start not in starts:
+                starts.append(start)
+        if not starts:
+            return None
+        
+        lines = []
+        for start in starts:
+            exchange = log[start:min(start + 2, before)]
+            lines.append(" / ".join(
+                f"{'User' if entry['role'] == 'user' else 'Stella'}: {entry['content'][:300]}"
+                for entry in exchange
+            ))
+        return "[Memories from earlier conversations]:\n" + "\n".join(f"- {line}" for line in lines)
+    
+    def record_metrics(self, model, turn, cached=False):
+        if not cached:
+            turn["prefill_ms"] = saved_prompt_ms(turn["prefill"], model, turn["eval"], turn["context"])
+        if not self.metrics:
+            return
+        started, first_token = turn["started"], turn["first_token"]
+        self.metrics.record(
+            model,
+            ttft=first_token - started if first_token else None,
+            latency=time.perf_counter() - started,
+            eval_stats=None if cached else turn["eval"],
+            options=turn["options"],
+            context=turn["context"],
+            cached=cached,
+            prefill_ms=turn.get("prefill_ms")
+        )
+    
+    def show_stats(self, argument=""):
+        if not self.metrics:
+            self.ui.print_colored("Metrics are off (enable metrics in config.json)", "yellow")
+            return
+        if argument.lower().startswith("export"):
+            path = argument[len("export"):].strip() or "stella_metrics.jsonl"
             try:
-                start_time = time.time()
-                
-                response = ollama.chat(
-                    model=model,
-                    messages=[
-                        {"role": "system", "content": self.SYSTEM_PROMPT},
-                        {"role": "system", "content": f"[System Status]: {context}"},
-                        *self.memory.get_recent_messages(8)
-                    ],
-                    options=options,
-                    stream=False
-                )
-                
-                reply = response["message"]["content"]
-                self.memory.add_assistant_message(reply)
-                
-                if not hasattr(self, 'current_model'):
-                    self.current_model = model
-                    print(f"\n✅ Using model: {model}")
-                
-                if len(self.memory.memory["log"]) % 10 == 0:
-                    thought = f"User said: {user_input}\nI replied: {reply}\n"
-                    self.memory.add_to_journal(thought)
-                     
-                return reply
-                
+                count = self.metrics.export(path)
+                self.ui.print_colored(f"Exported {count} turns to {path}", "green")
             except Exception as e:
-                continue
+                self.ui.print_error(f"Could not export metrics: {e}")
+            return
+        
+        def seconds(value):
+            return f"{value:.2f}s" if value is not None else "-"
+        
+        def rate(value):
+            return f"{value:.1f}" if value is not None else "-"
         
-        return "I'm having trouble connecting to the AI model. Please make sure Ollama is running with 'ollama serve' and try again."
+        for title, summary in (("This session", self.metrics.session_summary()), ("All history", self.metrics.summary())):
+            self.ui.print_colored(f"{title}:", "cyan", bold=True)
+            if not summary:
+                self.ui.print_colored("  no turns yet", "yellow")
+            for model, stats in summary.items():
+                self.ui.print_colored(
+                    f"  {model}: {stats['turns']} turns ({stats['cached']} cached), "
+                    f"{rate(stats['eval_tokens_per_second'])} tok/s, "
+                    f"prompt {rate(stats['prompt_tokens_per_second'])} tok/s, "
+                    f"TTFT p50 {seconds(stats['ttft_p50'])} p95 {seconds(stats['ttft_p95'])}, "
+                    f"latency p50 {seconds(stats['latency_p50'])} p95 {seconds(stats['latency_p95'])} "
+                    f"p99 {seconds(stats['latency_p99'])}", "green"
+                )
+                if stats["prefilled_turns"]:
+                    self.ui.print_colored(
+                        f"    prefill saved {stats['prefill_saved_ms'] / 1000:.1f}s of prompt evaluation "
+                        f"over {stats['prefilled_turns']} turns", "green"
+                    )
     
-    def run(self):
+    def remind_break(self, active):
+        minutes = int(active // 60)
+        self.ui.print_colored(
+            f"\nStella: You've been at it for {minutes} minutes. How about a short break? "
+            "Stretch, drink some water, rest your eyes for a bit. 🌿", "magenta"
+        )
+    
+    def show_profile(self):
+        governor = self.governor
+        self.ui.print_colored(f"Profile: {governor.name} ({governor.reason})", "cyan", bold=True)
+        sample = governor.last_sample
+        if sample:
+            battery = f", battery {sample['battery']:.0f}%" if sample["battery"] is not None else ""
+            self.ui.print_colored(
+                f"  last check: {sample['available'] / (1024 ** 3):.1f} GB free, CPU {sample['cpu']:.0f}%{battery}"
+                f"{' - ' + ', '.join(governor.last_reasons) if governor.last_reasons else ''}", "green"
+            )
+        elif governor.pinned:
+            self.ui.print_colored("  pinned with --profile; resources are not watched", "green")
+        for entry in governor.transitions():
+            when = datetime.fromtimestamp(entry["t"]).strftime("%Y-%m-%d %H:%M")
+            self.ui.print_colored(f"  [{when}] {entry['from']} -> {entry['to']}: {entry['reason']}", "white")
+    
+    def show_recall(self, query):
+        started = time.perf_counter()
+        results = self.memory.search(query)
+        if results is None:
+            self.ui.print_colored("Search needs the SQLite memory; run: python stella.py migrate", "yellow")
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+        
+        if not results["exchanges"] and not results["journal"]:
+            self.ui.print_colored(f"Nothing about '{query}' in my memory ({elapsed:.0f} ms)", "yellow")
+            return
+        for exchange in results["exchanges"]:
+            when = datetime.fromtimestamp(exchange["ts"]).strftime("%Y-%m-%d %H:%M")
+            self.ui.print_colored(f"[{when}] You: {exchange.get('user', '')[:200]}", "cyan")
+            if exchange.get("stella"):
+                self.ui.print_colored(f"{' ' * 19}Stella: {exchange['stella'][:200]}", "magenta")
+        for entry in results["journal"]:
+            when = datetime.fromtimestamp(entry["ts"]).strftime("%Y-%m-%d %H:%M")
+            self.ui.print_colored(f"[{when}] Journal: {entry['text'][:200]}", "white")
+        self.ui.print_colored(f"({elapsed:.0f} ms)", "green")
+    
+    def show_journal(self, when):
+        day = parse_day(when)
+        if day is None:
+            self.ui.print_colored(f"I couldn't tell which day '{when}' is; try 'journal March 3' or 'journal 2026-03-03'",
+                                  "yellow")
+            return
+        started = time.perf_counter()
+        entries = self.memory.journal_day(day)
+        elapsed = (time.perf_counter() - started) * 1000
+        if not entries:
+            self.ui.print_colored(f"No journal entries from {day} ({elapsed:.0f} ms)", "yellow")
+            return
+        for ts, text in entries:
+            when = datetime.fromtimestamp(ts).strftime("%H:%M")
+            self.ui.print_colored(f"[{day} {when}] {text[:400]}", "white")
+        self.ui.print_colored(f"({len(entries)} entries, {elapsed:.0f} ms)", "green")
+    
+    def finish_turn(self, user_input, model, reply):
+        self.memory.add_assistant_message(reply)
+        self.current_model = model
+        self.residency.touch(model)
+        if self.recall:
+            self.recall.schedule(self.memory.memory["log"])
+        
+        if len(self.memory.memory["log"]) % 10 == 0:
+            thought = f"User said: {user_input}\nI replied: {reply}\n"
+            self.memory.add_to_journal(thought)
+    
+    def cache_context(self, log):
+        turns = self.config["response_cache"]["context_turns"]
+        recent = [entry["content"] for entry in log[-1 - turns:-1]] if turns else []
+        return [self.SYSTEM_PROMPT, self.last_status, *recent]
+    
+    def cached_reply(self, user_input, model, turn):
+        if not self.response_cache:
+            return None
+        return self.response_cache.get(user_input, model, turn["options"], self.cache_context(turn["log"]))
+    
+    def cache_reply(self, user_input, model, turn, reply):
+        if self.response_cache:
+            self.response_cache.put(user_input, model, turn["options"], self.cache_context(turn["log"]), reply)
+    
+    def end_turn(self):
+        self.governor.end_turn()
+        if self.summarizer:
+            self.summarizer.end_turn()
+        self.prefill()
+    
+    def generate_response(self, user_input, on_token=None):
+        """One turn without the chat UI, for scripts and benchmarks: the engine's turn on a private loop."""
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+        task = self.loop.create_task(generate_reply(self, user_input, on_token))
+        try:
+            return self.loop.run_until_complete(task)
+        except KeyboardInterrupt:
+            task.cancel()
+            self.loop.run_until_complete(asyncio.gather(task, return_exceptions=True))
+            return None
+        finally:
+            self.end_turn()
+    
+    def print_welcome(self):
         self.ui.clear_screen()
         self.ui.print_banner()
         
-        self.ui.print_system_info(self.system_config.get_system_info())
+        self.ui.print_system_info(self.system_info())
         
         if not self.system_config.gpu_available:
             self.ui.print_colored("\n💡 Speed Tips for CPU-only mode:", "yellow", bold=True)
@@ -481,50 +986,83 @@ class Stella:
         
         greeting = f"{StellaContext.get_time_greeting()}! I'm Stella, your terminal companion."
         self.ui.print_slowly(f"\nStella: {greeting} 🌸")
-        self.ui.print_slowly("       I'm running in FULL POWER mode with enhanced capabilities.")
+        self.ui.print_slowly("       I'll use fewer resources whenever your machine gets busy.")
         self.ui.print_slowly("       Type something to talk to me or 'exit' to quit.\n")
         self.ui.print_divider()
+    
+    def handle_command(self, user_input):
+        if user_input.lower() == "system info":
+            self.ui.print_system_info(self.system_info())
+            return True
         
-        while True:
-            try:
-                user_input = self.get_user_input()
-                
-                if user_input.lower() == "exit":
-                    self.ui.print_goodbye()
-                    break
-                
-                if user_input.lower() == "system info":
-                    self.ui.print_system_info(self.system_config.get_system_info())
-                    continue
-                
-                if user_input.lower() == "current model" or user_input.lower() == "which model":
-                    current_model = getattr(self, 'current_model', 'Unknown')
-                    self.ui.print_colored(f"Currently using model: {current_model}", "green")
-                    continue
-                
-                if user_input.lower() == "models":
-                    available_models = self.check_available_models()
-                    if available_models:
-                        self.ui.print_colored("Available models:", "green")
-                        for model in available_models:
-                            self.ui.print_colored(f"  • {model}", "green")
-                    else:
-                        self.ui.print_colored("Could not retrieve model list", "yellow")
-                    continue
-                
-                reply = self.generate_response(user_input)
-                self.ui.print_response(reply)
-                
-            except (KeyboardInterrupt, EOFError):
-                self.ui.print_divider()
-                self.ui.print_slowly("\nStella: See you soon, okay? 🌼\n")
-                break
-            except Exception as e:
-                self.ui.print_error(str(e))
+        if user_input.lower() == "profile":
+            self.show_profile()
+            return True
+        
+        if user_input.lower() == "current model" or user_input.lower() == "which model":
+            current_model = getattr(self, 'current_model', 'Unknown')
+            self.ui.print_colored(f"Currently using model: {current_model}", "green")
+            return True
+        
+        if user_input.lower() == "cache":
+            if self.response_cache:
+                stats = self.response_cache.stats()
+                self.ui.print_colored(
+                    f"Response cache: {stats['entries']} entries, {stats['hits']} hits, "
+                    f"{stats['similar_hits']} similar hits, {stats['misses']} misses "
+                    f"({stats['hit_rate']:.0%} hit rate)", "green"
+                )
+            else:
+                self.ui.print_colored("The response cache is off (enable response_cache in config.json)", "yellow")
+            return True
+        
+        if user_input.lower().startswith("recall "):
+            self.show_recall(user_input[len("recall "):].strip())
+            return True
+        
+        if user_input.lower().startswith("journal "):
+            self.show_journal(user_input[len("journal "):].strip())
+            return True
+        
+        if user_input.lower() == "stats" or user_input.lower().startswith("stats "):
+            self.show_stats(user_input[len("stats"):].strip())
+            return True
+        
+        if user_input.lower() == "context":
+            if self.last_context:
+                self.ui.print_colored(f"Last turn used {ContextBuilder.describe(self.last_context)}", "green")
+                if self.last_eval:
+                    self.ui.print_colored(f"The {describe_eval(self.last_eval)}", "green")
+                if self.last_prefill is not None:
+                    self.ui.print_colored(f"Prefill saved {self.last_prefill:.0f} ms of prompt evaluation", "green")
+            else:
+                self.ui.print_colored("No turns yet this session", "yellow")
+            return True
+        
+        if user_input.lower() == "models":
+            available_models = self.check_available_models()
+            if available_models:
+                self.ui.print_colored("Available models:", "green")
+                for model in available_models:
+                    self.ui.print_colored(f"  • {model}", "green")
+            else:
+                self.ui.print_colored("Could not retrieve model list", "yellow")
+            return True
+        
+        return False
+    
+    def run(self):
+        if self.config["residency"]["warmup"]:
+            self.residency.warm_async()
+        self.residency.start()
+        self.governor.start()
+        if self.break_reminder:
+            self.break_reminder.start()
+        asyncio.run(AsyncEngine(self).run())
 
 
 if __name__ == "__main__":
-    print("Starting Stella in FULL POWER mode...")
-    print("This mode uses maximum available resources for the best experience.")
-    stella = Stella()
+    print("Starting Stella...")
+    profile = sys.argv[sys.argv.index("--profile") + 1] if "--profile" in sys.argv[:-1] else None
+    stella = Stella(reprobe="--reprobe" in sys.argv, profile=profile)
     stella.run()
@@ -0,0 +1,110 @@
+import glob
+import hashlib
+import json
+import os
+import platform
+import shutil
+
+VENDORS = {
+    "0x1002": "amd",
+    "0x10de": "nvidia",
+    "0x8086": "intel",
+}
+
+
+def cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    path = os.path.join(base, "stella")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _read(path):
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except Exception:
+        return None
+
+
+def drm_gpus():
+    """GPUs visible under /sys/class/drm, read without spawning any tool."""
+    gpus = []
+    for card in sorted(glob.glob("/sys/class/drm/card[0-9]*")):
+        if "-" in os.path.basename(card):
+            continue
+        device_dir = os.path.join(card, "device")
+        vendor_id = _read(os.path.join(device_dir, "vendor"))
+        if not vendor_id:
+            continue
+        gpu = {
+            "card": os.path.basename(card),
+            "vendor": VENDORS.get(vendor_id, vendor_id),
+            "vendor_id": vendor_id,
+            "device_id": _read(os.path.join(device_dir, "device")),
+        }
+        vram = _read(os.path.join(device_dir, "mem_info_vram_total"))
+        if vram and vram.isdigit():
+            gpu["vram_bytes"] = int(vram)
+        gpus.append(gpu)
+    return gpus
+
+
+def nvidia_driver_version():
+    version = _read("/proc/driver/nvidia/version")
+    return version.splitlines()[0] if version else None
+
+
+def rocm_version():
+    for path in ("/opt/rocm/.info/version", "/opt/rocm/.info/version-dev"):
+        version = _read(path)
+        if version:
+            return version
+    return None
+
+
+def fingerprint():
+    """Hash of everything that would change the probe results."""
+    parts = [
+        platform.system(),
+        platform.release(),
+        platform.machine(),
+        str(os.cpu_count()),
+        nvidia_driver_version() or "",
+        rocm_version() or "",
+    ]
+    for gpu in drm_gpus():
+        parts.append(f"{gpu['vendor_id']}:{gpu['device_id']}:{gpu.get('vram_bytes', '')}")
+    for tool in ("ollama", "nvidia-smi", "rocm-smi"):
+        path = shutil.which(tool)
+        if path:
+            try:
+                parts.append(f"{path}:{os.stat(path).st_mtime_ns}")
+            except OSError:
+                parts.append(path)
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+def _cache_file():
+    return os.path.join(cache_dir(), "capabilities.json")
+
+
+def load_cached(key):
+    try:
+        with open(_cache_file(), "r") as f:
+            cached = json.load(f)
+        if cached.get("fingerprint") == key:
+            return cached["capabilities"]
+    except Exception:
+        pass
+    return None
+
+
+def save_cache(key, capabilities):
+    try:
+        path = _cache_file()
+        with open(f"{path}.tmp", "w") as f:
+            json.dump({"fingerprint": key, "capabilities": capabilities}, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+    except Exception:
+        pass
@@ -0,0 +1,263 @@
+import ctypes
+import ctypes.util
+import glob
+import heapq
+import itertools
+import os
+import platform
+import shutil
+import subprocess
+import threading
+import time
+
+
+class Scheduler:
+    """Runs small periodic jobs, one after the other, on a single daemon thread."""
+
+    def __init__(self, name="stella-scheduler"):
+        self.name = name
+        self.jobs = []
+        self.lock = threading.Lock()
+        self._order = itertools.count()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def every(self, interval, job, delay=0):
+        with self.lock:
+            heapq.heappush(self.jobs, (time.monotonic() + delay, next(self._order), interval, job))
+        self._wake.set()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self.lock:
+                due = self.jobs[0][0] if self.jobs else None
+            wait = None if due is None else due - time.monotonic()
+            if wait is None or wait > 0:
+                self._wake.wait(wait)
+                self._wake.clear()
+                continue
+
+            with self.lock:
+                due, order, interval, job = heapq.heappop(self.jobs)
+                # After a stall (suspend, a slow job) skip the missed runs.
+                heapq.heappush(self.jobs, (max(due + interval, time.monotonic()), order, interval, job))
+            try:
+                job()
+            except Exception:
+                pass
+
+
+class XScreenSaverInfo(ctypes.Structure):
+    _fields_ = [
+        ("window", ctypes.c_ulong),
+        ("state", ctypes.c_int),
+        ("kind", ctypes.c_int),
+        ("til_or_since", ctypes.c_ulong),
+        ("idle", ctypes.c_ulong),
+        ("event_mask", ctypes.c_ulong),
+    ]
+
+
+def x11_source():
+    """Idle time from the X server's screensaver extension, without spawning xprintidle."""
+    if not os.environ.get("DISPLAY"):
+        return None
+    xlib_path = ctypes.util.find_library("X11")
+    xss_path = ctypes.util.find_library("Xss")
+    if not xlib_path or not xss_path:
+        return None
+    try:
+        xlib = ctypes.cdll.LoadLibrary(xlib_path)
+        xss = ctypes.cdll.LoadLibrary(xss_path)
+        xlib.XOpenDisplay.restype = ctypes.c_void_p
+        xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        xss.XScreenSaverAllocInfo.restype = ctypes.POINTER(XScreenSaverInfo)
+        xss.XScreenSaverQueryInfo.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(XScreenSaverInfo)]
+        display = xlib.XOpenDisplay(None)
+        if not display:
+            return None
+        root = xlib.XDefaultRootWindow(display)
+        info = xss.XScreenSaverAllocInfo()
+    except Exception:
+        return None
+
+    def idle():
+        if not xss.XScreenSaverQueryInfo(display, root, info):
+            return None
+        return info.contents.idle / 1000
+
+    return idle
+
+
+def macos_source():
+    """Seconds since the last input event, from CoreGraphics."""
+    if platform.system() != "Darwin":
+        return None
+    path = ctypes.util.find_library("ApplicationServices") or ctypes.util.find_library("CoreGraphics")
+    if not path:
+        return None
+    try:
+        graphics = ctypes.cdll.LoadLibrary(path)
+        seconds_since = graphics.CGEventSourceSecondsSinceLastEventType
+        seconds_since.restype = ctypes.c_double
+        seconds_since.argtypes = [ctypes.c_uint32, ctypes.c_uint32]
+    except Exception:
+        return None
+    # kCGEventSourceStateHIDSystemState, kCGAnyInputEventType
+    return lambda: seconds_since(1, 0xFFFFFFFF)
+
+
+def terminal_source():
+    """Idle time of the user's terminals: a tty's atime moves on every keystroke.
+
+    This is what `w` shows as IDLE, and it works over SSH and on consoles
+    where there is no display server.
+    """
+    if not os.path.isdir("/dev/pts"):
+        return None
+    uid = os.getuid()
+
+    def idle():
+        paths = glob.glob("/dev/pts/[0-9]*")
+        for fd in (0, 1):
+            try:
+                paths.append(os.ttyname(fd))
+            except OSError:
+                pass
+        latest = None
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if stat.st_uid == uid and (latest is None or stat.st_atime > latest):
+                latest = stat.st_atime
+        return None if latest is None else max(0, time.time() - latest)
+
+    return idle
+
+
+def command_source():
+    """Last resort: xprintidle or ioreg. Only ever run from the background thread."""
+    if os.environ.get("DISPLAY") and shutil.which("xprintidle"):
+        def idle():
+            output = subprocess.check_output(["xprintidle"], stderr=subprocess.DEVNULL, timeout=2)
+            return int(output.decode().strip()) / 1000
+        return idle
+    if platform.system() == "Darwin" and shutil.which("ioreg"):
+        def idle():
+            output = subprocess.check_output(["ioreg", "-c", "IOHIDSystem"], timeout=2).decode()
+            for line in output.split("\n"):
+                if "HIDIdleTime" in line:
+                    return int(line.split("=")[-1].strip()) / 1e9
+            return None
+        return idle
+    return None
+
+
+def detect_sources():
+    desktop = macos_source() or x11_source()
+    sources = [source for source in (desktop, terminal_source()) if source]
+    if desktop is None:
+        fallback = command_source()
+        if fallback:
+            sources.append(fallback)
+    return sources
+
+
+class IdleMonitor:
+    """Keeps a recent sample of the user's idle time, refreshed on a timer.
+
+    Readers get the cached value and never wait on a probe. Sources are
+    found on the first sample, in the background: the X screensaver
+    extension or CoreGraphics, plus terminal activity; xprintidle/ioreg only
+    when neither desktop source works. The shortest idle time of all sources
+    wins. With no usable source (a headless server with no terminal) the
+    idle time is None.
+    """
+
+    def __init__(self, scheduler, interval=15, sources=None):
+        self.scheduler = scheduler
+        self.interval = interval
+        self.sources = sources
+        self.idle = None
+        self.sampled_at = None
+
+    def sample(self):
+        if self.sources is None:
+            self.sources = detect_sources()
+        values = []
+        for source in self.sources:
+            try:
+                value = source()
+            except Exception:
+                value = None
+            if value is not None:
+                values.append(value)
+        self.idle = min(values) if values else None
+        self.sampled_at = time.time()
+        return self.idle
+
+    def idle_seconds(self):
+        return self.idle
+
+    def start(self):
+        self.scheduler.every(self.interval, self.sample)
+
+
+class BreakReminder:
+    """Reminds the user to take a break after a long stretch at the machine.
+
+    Activity is judged from the idle monitor: an idle gap of `break_length`
+    seconds counts as a break. After `remind_after` seconds without one,
+    `notify(active_seconds)` is called, then again every `repeat_after`
+    seconds until the user takes a break.
+    """
+
+    def __init__(self, monitor, notify, remind_after=50 * 60, break_length=5 * 60, repeat_after=20 * 60):
+        self.monitor = monitor
+        self.notify = notify
+        self.remind_after = remind_after
+        self.break_length = break_length
+        self.repeat_after = repeat_after
+        self.active_since = None
+        self.reminded_at = None
+
+    def active_seconds(self):
+        if self.active_since is None:
+            return 0
+        return time.time() - self.active_since
+
+    def check(self):
+        idle = self.monitor.idle_seconds()
+        if idle is None:
+            return
+        now = time.time()
+        if idle >= self.break_length:
+            self.active_since = None
+            self.reminded_at = None
+            return
+        if self.active_since is None:
+            self.active_since = now
+            return
+
+        active = now - self.active_since
+        due = self.reminded_at is None or now - self.reminded_at >= self.repeat_after
+        if active >= self.remind_after and due:
+            self.reminded_at = now
+            self.notify(active)
+
+    def start(self, interval=60):
+        self.monitor.scheduler.every(interval, self.check, delay=interval)
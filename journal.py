@@ -0,0 +1,320 @@
+import gzip
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import datetime, timedelta
+
+ENTRY = re.compile(r"^\[(\d{4}-\d{2}-\d{2}) \d{2}:\d{2}\] ", re.MULTILINE)
+ENTRY_BYTES = re.compile(rb"^\[(\d{4}-\d{2}-\d{2}) \d{2}:\d{2}\] ", re.MULTILINE)
+TIMESTAMP = "%Y-%m-%d %H:%M"
+
+PERIODS = {
+    "daily": "%Y-%m-%d",
+    "weekly": "%G-W%V",
+    "monthly": "%Y-%m",
+}
+
+MONTHS = {
+    name: number
+    for number, names in enumerate([
+        ("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"), ("may",),
+        ("jun", "june"), ("jul", "july"), ("aug", "august"), ("sep", "sept", "september"),
+        ("oct", "october"), ("nov", "november"), ("dec", "december"),
+    ], 1)
+    for name in names
+}
+
+
+def format_entry(text, ts):
+    return f"[{datetime.fromtimestamp(ts).strftime(TIMESTAMP)}] {text}\n"
+
+
+def parse_entries(text):
+    """(timestamp, text) entries from journal text, multi-line entries included."""
+    entries = []
+    matches = list(ENTRY.finditer(text))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        try:
+            ts = datetime.strptime(text[match.start() + 1:match.end() - 2], TIMESTAMP).timestamp()
+        except ValueError:
+            ts = time.time()
+        entries.append((ts, text[match.end():end].strip()))
+    return entries
+
+
+def day_offsets(data, base=0):
+    """Byte offset of the first entry of each day in `data`."""
+    days = {}
+    for match in ENTRY_BYTES.finditer(data):
+        days.setdefault(match.group(1).decode(), base + match.start())
+    return days
+
+
+def parse_day(text, today=None):
+    """A date as "YYYY-MM-DD" from "2026-03-03", "March 3rd", "3 mar", "yesterday"..."""
+    today = today or datetime.now()
+    text = text.strip().lower().rstrip("?.!")
+    if text in ("today", "yesterday"):
+        return (today - timedelta(days=1 if text == "yesterday" else 0)).strftime("%Y-%m-%d")
+    try:
+        return datetime.strptime(text, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        pass
+
+    words = re.findall(r"[a-z]+|\d+", text)
+    month = next((MONTHS[word] for word in words if word in MONTHS), None)
+    numbers = [int(word) for word in words if word.isdigit()]
+    day = next((n for n in numbers if 1 <= n <= 31), None)
+    year = next((n for n in numbers if n > 31), None)
+    if month is None or day is None:
+        return None
+    try:
+        date = datetime(year or today.year, month, day)
+    except ValueError:
+        return None
+    if year is None and date > today:
+        # "December 24th" asked in January means the one just past.
+        date = date.replace(year=today.year - 1)
+    return date.strftime("%Y-%m-%d")
+
+
+class Journal:
+    """Stella's journal: buffered appends, rotated into compressed segments.
+
+    `add()` only queues the entry; a background thread appends queued
+    entries to the active file every `flush_interval` seconds. The active
+    file is rotated once it reaches `max_bytes` or a new `rotate` period
+    ("daily", "weekly", "monthly" or None) begins: it is gzipped into a
+    segment with one gzip member per day, and only the newest
+    `max_segments` segments are kept. `<name>.idx.json` records where each
+    day starts, in the active file and in every segment, so reading a day
+    is a seek and one small decompression rather than a scan.
+    """
+
+    BATCH = 64
+
+    def __init__(self, path="journal.txt", max_bytes=1024 * 1024, rotate="monthly", max_segments=24,
+                 flush_interval=5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.period = PERIODS.get(rotate)
+        self.max_segments = max_segments
+        self.flush_interval = flush_interval
+        base, _ = os.path.splitext(path)
+        self.base = base
+        self.index_path = f"{base}.idx.json"
+        self.rotating_path = f"{path}.rotating"
+
+        self.lock = threading.RLock()
+        self.pending = deque()
+        self.index = None
+        self._file = None
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = None
+
+    def add(self, text, ts=None):
+        self.pending.append((ts or time.time(), text))
+        if self._thread is None:
+            with self.lock:
+                if self._thread is None and not self._closed:
+                    self._thread = threading.Thread(target=self._run, name="stella-journal", daemon=True)
+                    self._thread.start()
+        if len(self.pending) >= self.BATCH:
+            self._wake.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def _load_index(self):
+        if self.index is not None:
+            return
+        try:
+            with open(self.index_path, "r") as f:
+                self.index = json.load(f)
+        except Exception:
+            self.index = {"segments": [], "active": None}
+        self._recover()
+
+        # A journal.txt from before the index, or one that changed behind
+        # our back: index it once.
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        active = self.index.get("active")
+        if size and (not active or active.get("size") != size):
+            with open(self.path, "rb") as f:
+                data = f.read()
+            days = day_offsets(data)
+            first = min(days) if days else datetime.now().strftime("%Y-%m-%d")
+            self.index["active"] = {"size": size, "days": days, "period": self._period_of(first)}
+        elif not size:
+            self.index["active"] = None
+
+    def _save_index(self):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _period_of(self, day):
+        if not self.period:
+            return None
+        return datetime.strptime(day, "%Y-%m-%d").strftime(self.period)
+
+    def flush(self):
+        with self.lock:
+            if not self.pending:
+                return
+            self._load_index()
+            while self.pending:
+                ts, text = self.pending.popleft()
+                self._write(ts, text)
+            self._file.flush()
+            self._save_index()
+
+    def _write(self, ts, text):
+        day = datetime.fromtimestamp(ts).strftime("%Y-%m-%d")
+        active = self.index.get("active")
+        if active and (active["size"] >= self.max_bytes or active.get("period") != self._period_of(day)):
+            self._rotate()
+            active = None
+        if active is None:
+            active = self.index["active"] = {"size": 0, "days": {}, "period": self._period_of(day)}
+        if self._file is None:
+            self._file = open(self.path, "ab")
+
+        data = format_entry(text, ts).encode()
+        active["days"].setdefault(day, active["size"])
+        self._file.write(data)
+        active["size"] += len(data)
+
+    def _segment_name(self, first_day):
+        number = 1
+        while True:
+            name = f"{os.path.basename(self.base)}-{first_day}.{number}.txt.gz"
+            if not os.path.exists(os.path.join(os.path.dirname(self.path), name)):
+                return name
+            number += 1
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        # Renamed first, so a crash half way is finished on the next start.
+        os.replace(self.path, self.rotating_path)
+        self.index["active"] = None
+        self._compress_rotating()
+
+    def _compress_rotating(self):
+        with open(self.rotating_path, "rb") as f:
+            data = f.read()
+        days = day_offsets(data)
+        if not days:
+            os.remove(self.rotating_path)
+            return
+
+        name = self._segment_name(min(days))
+        path = os.path.join(os.path.dirname(self.path), name)
+        starts = sorted(days.items(), key=lambda item: item[1])
+        members = {}
+        offset = 0
+        with open(f"{path}.tmp", "wb") as f:
+            for i, (day, start) in enumerate(starts):
+                end = starts[i + 1][1] if i + 1 < len(starts) else len(data)
+                # One gzip member per day: the segment is still a valid
+                # .gz file and each day can be decompressed on its own.
+                member = gzip.compress(data[start:end], mtime=0)
+                f.write(member)
+                members[day] = [offset, len(member)]
+                offset += len(member)
+        os.replace(f"{path}.tmp", path)
+
+        self.index["segments"].append({"file": name, "days": members})
+        while len(self.index["segments"]) > self.max_segments:
+            old = self.index["segments"].pop(0)
+            try:
+                os.remove(os.path.join(os.path.dirname(self.path), old["file"]))
+            except OSError:
+                pass
+        self._save_index()
+        os.remove(self.rotating_path)
+
+    def _recover(self):
+        if not os.path.exists(self.rotating_path):
+            return
+        with open(self.rotating_path, "rb") as f:
+            days = day_offsets(f.read())
+        done = days and any(
+            set(days) <= set(segment["days"]) for segment in self.index["segments"][-1:]
+        )
+        if done:
+            os.remove(self.rotating_path)
+        else:
+            self._compress_rotating()
+
+    def read_day(self, day):
+        """(timestamp, text) entries written on `day` ("YYYY-MM-DD")."""
+        self.flush()
+        entries = []
+        with self.lock:
+            self._load_index()
+            directory = os.path.dirname(self.path)
+            for segment in self.index["segments"]:
+                if day not in segment["days"]:
+                    continue
+                offset, length = segment["days"][day]
+                try:
+                    with open(os.path.join(directory, segment["file"]), "rb") as f:
+                        f.seek(offset)
+                        data = zlib.decompress(f.read(length), wbits=31)
+                except (OSError, zlib.error):
+                    continue
+                entries += parse_entries(data.decode(errors="replace"))
+
+            active = self.index.get("active")
+            if active and day in active["days"]:
+                start = active["days"][day]
+                end = min([o for o in active["days"].values() if o > start] + [active["size"]])
+                with open(self.path, "rb") as f:
+                    f.seek(start)
+                    entries += parse_entries(f.read(end - start).decode(errors="replace"))
+        return [(ts, text) for ts, text in entries if datetime.fromtimestamp(ts).strftime("%Y-%m-%d") == day]
+
+    def entries(self):
+        """Every entry, oldest first: the kept segments, then the active file."""
+        self.flush()
+        entries = []
+        with self.lock:
+            self._load_index()
+            directory = os.path.dirname(self.path)
+            for segment in self.index["segments"]:
+                try:
+                    with gzip.open(os.path.join(directory, segment["file"]), "rb") as f:
+                        entries += parse_entries(f.read().decode(errors="replace"))
+                except OSError:
+                    continue
+            if os.path.exists(self.path):
+                with open(self.path, "rb") as f:
+                    entries += parse_entries(f.read().decode(errors="replace"))
+        return entries
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,341 @@
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    session TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    tokens INTEGER
+);
+CREATE INDEX IF NOT EXISTS messages_ts ON messages (ts);
+CREATE INDEX IF NOT EXISTS messages_role ON messages (role, ts);
+CREATE INDEX IF NOT EXISTS messages_session ON messages (session, ts);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5 (
+    content, content='messages', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+
+CREATE TABLE IF NOT EXISTS journal (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS journal_ts ON journal (ts);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS journal_fts USING fts5 (
+    content, content='journal', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS journal_ai AFTER INSERT ON journal BEGIN
+    INSERT INTO journal_fts (rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS journal_ad AFTER DELETE ON journal BEGIN
+    INSERT INTO journal_fts (journal_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+
+CREATE TABLE IF NOT EXISTS preferences (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS summaries (
+    id INTEGER PRIMARY KEY,
+    level INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    "end" INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+"""
+
+
+def fts_query(text, any_word=False):
+    """User text as an FTS5 query: every word quoted, so punctuation is harmless."""
+    words = re.findall(r"\w+", text, re.UNICODE)
+    if not words:
+        return None
+    return (" OR " if any_word else " ").join('"' + word.replace('"', '""') + '"' for word in words)
+
+
+class SqliteStore:
+    """SQLite storage for StellaMemory, with full-text search.
+
+    Drop-in for MemoryStore: `load()` returns the memory dict and `append()`
+    takes the same records, each applied in its own transaction. The database
+    runs in WAL mode, so readers never block the writer. Messages and journal
+    entries are indexed by FTS5 for `search()`.
+    """
+
+    def __init__(self, path="memory.db"):
+        # Imported here: most sessions never open a database.
+        import sqlite3
+
+        self.path = path
+        self.session = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.lock = threading.RLock()
+        self.first_id = None
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def load(self, default=None, tail=None):
+        """The memory dict; with `tail`, only the newest `tail` messages and
+        the number left out as "cold" (read them with `read_messages`)."""
+        with self.lock:
+            if tail is None:
+                rows = self.db.execute("SELECT role, content, tokens FROM messages ORDER BY id").fetchall()
+                cold = 0
+            else:
+                rows = self.db.execute(
+                    "SELECT role, content, tokens FROM messages ORDER BY id DESC LIMIT ?", (tail,)
+                ).fetchall()[::-1]
+                cold = self.db.execute("SELECT COUNT(*) FROM messages").fetchone()[0] - len(rows)
+            log = [{"role": role, "content": content, "tokens": tokens} for role, content, tokens in rows]
+            preferences = {key: json.loads(value) for key, value in self.db.execute("SELECT key, value FROM preferences")}
+            summaries = [
+                {"level": level, "start": start, "end": end, "text": text}
+                for level, start, end, text in self.db.execute('SELECT level, start, "end", text FROM summaries ORDER BY id')
+            ]
+        state = dict(default or {})
+        state.update({"log": log, "user_preferences": preferences})
+        if cold:
+            state["cold"] = cold
+        if summaries:
+            state["summaries"] = summaries
+        return state, []
+
+    def read_messages(self, start, count):
+        """Messages at log positions start..start+count, oldest first."""
+        with self.lock:
+            if self.first_id is None:
+                self.first_id = self.db.execute("SELECT MIN(id) FROM messages").fetchone()[0]
+                if self.first_id is None:
+                    return []
+            # Rows are only ever appended or all deleted together, so ids are
+            # dense and a position is a key range rather than an OFFSET scan.
+            return [
+                {"role": role, "content": content, "tokens": tokens}
+                for role, content, tokens in self.db.execute(
+                    "SELECT role, content, tokens FROM messages WHERE id >= ? ORDER BY id LIMIT ?",
+                    (self.first_id + start, count)
+                )
+            ]
+
+    def _insert_messages(self, entries, ts=None):
+        ts = ts or time.time()
+        self.db.executemany(
+            "INSERT INTO messages (ts, session, role, content, tokens) VALUES (?, ?, ?, ?, ?)",
+            ((entry.get("ts", ts), self.session, entry["role"], entry["content"], entry.get("tokens")) for entry in entries)
+        )
+
+    def _insert_summaries(self, summaries):
+        self.db.executemany(
+            'INSERT INTO summaries (level, start, "end", text) VALUES (?, ?, ?, ?)',
+            ((s["level"], s["start"], s["end"], s["text"]) for s in summaries)
+        )
+
+    def _set_preferences(self, preferences):
+        self.db.executemany(
+            "INSERT INTO preferences (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            ((key, json.dumps(value)) for key, value in preferences.items())
+        )
+
+    def append(self, record):
+        op = record.get("op")
+        with self.lock:
+            self.db.execute("BEGIN")
+            try:
+                if op == "log":
+                    self._insert_messages([record["entry"]])
+                elif op == "pref":
+                    self._set_preferences({record["key"]: record["value"]})
+                elif op == "summary":
+                    self._insert_summaries([record["summary"]])
+                elif op == "reset":
+                    state = record["state"]
+                    self.db.execute("DELETE FROM messages")
+                    self.db.execute("DELETE FROM preferences")
+                    self.db.execute("DELETE FROM summaries")
+                    self.first_id = None
+                    self._insert_messages(state.get("log", []))
+                    self._set_preferences(state.get("user_preferences", {}))
+                    self._insert_summaries(state.get("summaries", []))
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+
+    def add_journal(self, text, ts=None):
+        with self.lock:
+            self.db.execute("INSERT INTO journal (ts, content) VALUES (?, ?)", (ts or time.time(), text))
+
+    def journal_day(self, day):
+        """(timestamp, text) journal entries written on `day` ("YYYY-MM-DD")."""
+        start = datetime.strptime(day, "%Y-%m-%d")
+        end = start + timedelta(days=1)
+        with self.lock:
+            return self.db.execute(
+                "SELECT ts, content FROM journal WHERE ts >= ? AND ts < ? ORDER BY ts",
+                (start.timestamp(), end.timestamp())
+            ).fetchall()
+
+    def search(self, query, limit=5):
+        """Past exchanges and journal entries matching `query`, best first."""
+        with self.lock:
+            exchanges = self._search_messages(query, limit)
+            journal = self._search_journal(query, limit)
+        return {"exchanges": exchanges, "journal": journal}
+
+    def _match(self, table, query, limit, columns):
+        for any_word in (False, True):
+            match = fts_query(query, any_word)
+            if match is None:
+                return []
+            rows = self.db.execute(
+                f"SELECT {columns} FROM {table}_fts JOIN {table} ON {table}.id = {table}_fts.rowid "
+                f"WHERE {table}_fts MATCH ? ORDER BY rank LIMIT ?",
+                (match, limit * 2)
+            ).fetchall()
+            if rows:
+                return rows
+        return []
+
+    def _search_messages(self, query, limit):
+        exchanges = []
+        seen = set()
+        for message_id, ts, role in self._match("messages", query, limit, "messages.id, messages.ts, messages.role"):
+            # Show the whole exchange: the user's message and Stella's answer.
+            if role == "user":
+                user_id = message_id
+            else:
+                row = self.db.execute(
+                    "SELECT id FROM messages WHERE id < ? AND role = 'user' ORDER BY id DESC LIMIT 1", (message_id,)
+                ).fetchone()
+                user_id = row[0] if row else message_id
+            if user_id in seen:
+                continue
+            seen.add(user_id)
+
+            rows = self.db.execute(
+                "SELECT role, content, ts FROM messages WHERE id >= ? ORDER BY id LIMIT 2", (user_id,)
+            ).fetchall()
+            exchange = {"ts": rows[0][2] if rows else ts}
+            for row_role, content, _ in rows:
+                key = "user" if row_role == "user" else "stella"
+                if key in exchange:
+                    break
+                exchange[key] = content
+            exchanges.append(exchange)
+            if len(exchanges) >= limit:
+                break
+        return exchanges
+
+    def _search_journal(self, query, limit):
+        rows = self._match("journal", query, limit, "journal.ts, journal.content")
+        return [{"ts": ts, "text": content} for ts, content in rows[:limit]]
+
+    def flush(self, timeout=None):
+        return True
+
+    def compact(self, wait=True):
+        with self.lock:
+            self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+    def write_snapshot(self, state, path=None, indent=None):
+        path = path or f"{os.path.splitext(self.path)[0]}.json"
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=indent, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+class SqliteCold:
+    """Cold tier of a TieredLog backed by the messages table.
+
+    Every message is already a row, so spilling only forgets the hot copy;
+    reads fetch aligned pages of `block_size` rows.
+    """
+
+    inline = True
+
+    def __init__(self, store, count=0, block_size=256):
+        self.store = store
+        self.count = count
+        self.block_size = block_size
+
+    def block(self, index):
+        start = index - index % self.block_size
+        entries = self.store.read_messages(start, min(self.block_size, self.count - start))
+        return (start, entries) if entries else None
+
+    def spill(self, entries):
+        self.count += len(entries)
+
+    def reset(self):
+        self.count = 0
+
+
+def read_journal(path):
+    """(timestamp, text) entries from a journal.txt and its rotated segments."""
+    from journal import Journal
+
+    return Journal(path).entries()
+
+
+def migrate(memory_file="memory.json", journal_file="journal.txt", db_file="memory.db", force=False):
+    """One-shot copy of memory.json (and its log) and the journal into SQLite."""
+    from memory_store import MemoryStore
+    from memory_tiers import ColdSegments, cold_directory
+
+    if os.path.exists(db_file) and not force:
+        raise FileExistsError(f"{db_file} already exists (use --force to rebuild it)")
+
+    # Raises RuntimeError while a chat holds memory.json, before anything is removed.
+    json_store = MemoryStore(memory_file)
+    state, records = json_store.load({"log": [], "user_preferences": {}})
+    json_store.close()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_file + suffix):
+            os.remove(db_file + suffix)
+    cold = state.pop("cold", 0)
+    if cold:
+        state["log"] = ColdSegments(cold_directory(memory_file), cold).entries() + state.get("log", [])
+    for record in records:
+        op = record.get("op")
+        if op == "log":
+            state.setdefault("log", []).append(record["entry"])
+        elif op == "pref":
+            state.setdefault("user_preferences", {})[record["key"]] = record["value"]
+        elif op == "summary":
+            state.setdefault("summaries", []).append(record["summary"])
+        elif op == "reset":
+            state = record["state"]
+
+    store = SqliteStore(db_file)
+    store.append({"op": "reset", "state": state})
+    journal = read_journal(journal_file)
+    with store.lock:
+        store.db.execute("BEGIN")
+        store.db.executemany("INSERT INTO journal (ts, content) VALUES (?, ?)", journal)
+        store.db.execute("COMMIT")
+    store.compact()
+    store.close()
+    return len(state.get("log", [])), len(journal)
@@ -0,0 +1,273 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows has no flock; keeping to one Stella per memory file is up to the user there.
+    fcntl = None
+
+
+class MemoryStore:
+    """Snapshot file plus an append-only write-ahead log.
+
+    Every change is appended to the log as one JSON line and made durable by a
+    background writer that batches fsyncs. Once enough records pile up the
+    writer folds them into a fresh snapshot (the memory.json layout) and
+    truncates the log. Each record carries a sequence number and the snapshot
+    remembers the last one it contains, so a crash at any point replays cleanly.
+
+    The log is held under an exclusive flock from load() to close(), so a
+    second process cannot append to or truncate it. A batch that fails to
+    write is kept and retried; until it lands, flush() raises the error. A
+    failed compaction is reported on stderr and stays requested until it
+    succeeds.
+    """
+
+    RETRY_INTERVAL = 1.0
+
+    def __init__(self, snapshot_file, log_file=None, snapshot=None,
+                 fsync_interval=0.05, compact_every=500, sync=True):
+        self.snapshot_file = snapshot_file
+        self.log_file = log_file or f"{snapshot_file}.wal"
+        self.snapshot = snapshot
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+        self.sync = sync
+
+        self.lock = threading.RLock()
+        self.seq = 0
+        self.durable_seq = 0
+        self.log_records = 0
+        self.error = None
+        self.compact_error = None
+
+        self._cond = threading.Condition(self.lock)
+        self._pending = []
+        self._compact_requested = False
+        self._closed = False
+        self._log = None
+        self._writer = None
+        atexit.register(self.close)
+
+    def load(self, default=None):
+        self._open_log()
+        state = self._read_snapshot(default)
+        base_seq = state.pop("wal_seq", 0)
+        records = [r for r in self._read_log() if r.get("seq", 0) > base_seq]
+
+        self.seq = max([base_seq] + [r["seq"] for r in records])
+        self.durable_seq = self.seq
+        self.log_records = len(records)
+        return state, records
+
+    def _read_snapshot(self, default):
+        if os.path.exists(self.snapshot_file):
+            try:
+                with open(self.snapshot_file, "r") as f:
+                    return json.load(f)
+            except Exception:
+                pass
+        return dict(default or {})
+
+    def _read_log(self):
+        records = []
+        if not os.path.exists(self.log_file):
+            return records
+
+        good_offset = 0
+        with open(self.log_file, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+                good_offset += len(line)
+
+        # A torn tail from a crash mid-write is dropped so new appends start
+        # on a clean line.
+        if good_offset < os.path.getsize(self.log_file):
+            with open(self.log_file, "r+b") as f:
+                f.truncate(good_offset)
+        return records
+
+    def append(self, record):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("memory store is closed")
+            self.seq += 1
+            record["seq"] = self.seq
+            self._pending.append(record)
+            self._ensure_writer()
+            self._cond.notify_all()
+            return self.seq
+
+    def flush(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            target = self.seq
+            self._cond.notify_all()
+            while self.durable_seq < target:
+                if self.error is not None:
+                    raise OSError(f"could not write {self.log_file}: {self.error}") from self.error
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                if self._writer is None or not self._writer.is_alive():
+                    self._ensure_writer()
+                self._cond.wait(remaining)
+        return True
+
+    def compact(self, wait=True):
+        with self._cond:
+            self._compact_requested = True
+            self._ensure_writer()
+            self._cond.notify_all()
+            while wait and self._compact_requested:
+                if self.error is not None:
+                    raise OSError(f"could not write {self.log_file}: {self.error}") from self.error
+                if self.compact_error is not None:
+                    raise OSError(f"could not write {self.snapshot_file}: {self.compact_error}") from self.compact_error
+                self._cond.wait()
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._writer is not None:
+            self._writer.join()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def _ensure_writer(self):
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._run_writer, name="stella-memory-writer", daemon=True)
+            self._writer.start()
+
+    def _run_writer(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._compact_requested and not self._closed:
+                    self._cond.wait()
+                if self._pending and not self._closed and self.fsync_interval:
+                    # Group commit: give concurrent appends a moment to join
+                    # this batch so they share a single fsync.
+                    self._cond.wait(self.fsync_interval)
+                batch, self._pending = self._pending, []
+                closing = self._closed
+
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    with self._cond:
+                        # Keep the batch for the next attempt, and wake
+                        # anyone waiting in flush() so they can report it.
+                        self._pending = batch + self._pending
+                        self.error = e
+                        self._cond.notify_all()
+                    if closing:
+                        return
+                    time.sleep(self.RETRY_INTERVAL)
+                    continue
+
+            with self._cond:
+                if batch:
+                    self.durable_seq = batch[-1]["seq"]
+                    self.log_records += len(batch)
+                    self.error = None
+                compact = self._compact_requested or (self.compact_every and self.log_records >= self.compact_every)
+                self._cond.notify_all()
+
+            if compact and self.snapshot is not None:
+                try:
+                    self._compact()
+                except Exception as e:
+                    with self._cond:
+                        if self.compact_error is None:
+                            print(f"Stella could not write {self.snapshot_file}: {e}", file=sys.stderr)
+                        self._compact_requested = True
+                        self.compact_error = e
+                        self._cond.notify_all()
+                    if closing:
+                        return
+                    time.sleep(self.RETRY_INTERVAL)
+                    continue
+
+            with self._cond:
+                self._compact_requested = False
+                if compact:
+                    self.compact_error = None
+                self._cond.notify_all()
+                if closing and not self._pending:
+                    return
+
+    def _open_log(self):
+        if self._log is not None:
+            return
+        log = open(self.log_file, "ab", buffering=0)
+        if fcntl is not None:
+            try:
+                fcntl.flock(log.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                log.close()
+                raise RuntimeError(
+                    f"{self.log_file} is in use by another Stella. Close it first, "
+                    "or run 'python stella.py serve' so every terminal shares one."
+                )
+        self._log = log
+
+    def _write_batch(self, batch):
+        self._open_log()
+        fd = self._log.fileno()
+        size = os.fstat(fd).st_size
+        data = memoryview("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in batch).encode("utf-8"))
+        try:
+            while data:
+                data = data[self._log.write(data):]
+            if self.sync:
+                os.fsync(fd)
+        except Exception:
+            # Drop whatever part of the batch landed, so the retry does not
+            # leave a torn line in the middle of the log.
+            try:
+                os.ftruncate(fd, size)
+            except OSError:
+                pass
+            raise
+
+    def _compact(self):
+        with self.lock:
+            state = self.snapshot()
+            seq = self.seq
+            # Anything still pending is already part of the captured state and
+            # will be skipped on replay because its seq is <= wal_seq.
+        state["wal_seq"] = seq
+        self.write_snapshot(state)
+
+        # Truncated through the locked descriptor: reopening would drop the lock.
+        self._open_log()
+        os.ftruncate(self._log.fileno(), 0)
+        if self.sync:
+            os.fsync(self._log.fileno())
+        with self.lock:
+            self.log_records = 0
+
+    def write_snapshot(self, state, path=None, indent=None):
+        path = path or self.snapshot_file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=indent, ensure_ascii=False)
+            f.flush()
+            if self.sync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
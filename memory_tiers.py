@@ -0,0 +1,280 @@
+import bisect
+import json
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+from context_builder import MESSAGE_OVERHEAD, message_tokens
+
+SEGMENT = re.compile(r"^(\d+)-(\d+)\.jsonl\.gz$")
+TABLE = re.compile(r"^(\d+)-(\d+)\.idx$")
+FIELDS = ("role", "content", "tokens")
+BLOCK = 64
+
+
+def pack(entry):
+    """A log entry as a tuple: a fraction of the size of the dict."""
+    extra = {key: value for key, value in entry.items() if key not in FIELDS} or None
+    return (entry.get("role"), entry.get("content", ""), message_tokens(entry), extra)
+
+
+def unpack(item):
+    role, content, tokens, extra = item
+    entry = {"role": role, "content": content, "tokens": tokens}
+    if extra:
+        entry.update(extra)
+    return entry
+
+
+def cold_directory(memory_file):
+    return f"{os.path.splitext(memory_file)[0]}.cold"
+
+
+def inflate(data):
+    """All members of a gzip stream; zlib alone stops after the first."""
+    parts = []
+    while data:
+        member = zlib.decompressobj(wbits=31)
+        parts.append(member.decompress(data))
+        data = member.unused_data
+    return b"".join(parts)
+
+
+class ColdSegments:
+    """Archived turns of memory.json: gzipped JSON-lines files, one per spill.
+
+    Each file is named after the log positions it holds (`start-end`) and is
+    never rewritten. It is a series of gzip members of `BLOCK` entries each,
+    and `start-end.idx` lists where each member begins, so reading an old
+    turn is a seek and one small decompression. The snapshot records how many
+    turns are archived, so a segment past that count was written by a spill
+    whose snapshot never landed; its turns are still in the snapshot or the
+    log, and it is removed.
+    """
+
+    inline = False
+
+    def __init__(self, directory, count=0):
+        self.directory = directory
+        self.count = count
+        self.segments = []
+        self.tables = {}
+        if os.path.isdir(directory):
+            names = os.listdir(directory)
+            for name in names:
+                match = SEGMENT.match(name) or TABLE.match(name)
+                if not match:
+                    continue
+                start, end = int(match.group(1)), int(match.group(2))
+                if end > count or (TABLE.match(name) and f"{name[:-4]}.jsonl.gz" not in names):
+                    try:
+                        os.remove(os.path.join(directory, name))
+                    except OSError:
+                        pass
+                elif SEGMENT.match(name):
+                    self.segments.append((start, end, name))
+        self.segments.sort()
+        self.starts = [start for start, _, _ in self.segments]
+
+    def _table(self, name):
+        if name not in self.tables:
+            try:
+                with open(os.path.join(self.directory, f"{name[:-len('.jsonl.gz')]}.idx"), "r") as f:
+                    self.tables[name] = json.load(f)
+            except (OSError, ValueError):
+                # A segment from before block tables: one block.
+                self.tables[name] = None
+        return self.tables[name]
+
+    def _read(self, name, offset=0, length=None):
+        with open(os.path.join(self.directory, name), "rb") as f:
+            f.seek(offset)
+            data = f.read() if length is None else f.read(length)
+        return [json.loads(line) for line in inflate(data).splitlines() if line]
+
+    def block(self, index):
+        """(start, entries) of the block holding log position `index`."""
+        i = bisect.bisect_right(self.starts, index) - 1
+        if i < 0 or index >= self.segments[i][1]:
+            return None
+        start, _, name = self.segments[i]
+        try:
+            table = self._table(name)
+            if table is None:
+                return start, self._read(name)
+            number = (index - start) // table["block"]
+            offsets = table["offsets"]
+            entries = self._read(name, offsets[number], offsets[number + 1] - offsets[number])
+            return start + number * table["block"], entries
+        except (OSError, ValueError, IndexError, zlib.error):
+            return None
+
+    def entries(self):
+        entries = []
+        for _, _, name in self.segments:
+            entries += self._read(name)
+        return entries
+
+    def spill(self, entries):
+        os.makedirs(self.directory, exist_ok=True)
+        start, end = self.count, self.count + len(entries)
+        base = os.path.join(self.directory, f"{start:09d}-{end:09d}")
+        name = f"{start:09d}-{end:09d}.jsonl.gz"
+        offsets = [0]
+        with open(f"{base}.jsonl.gz.tmp", "wb") as f:
+            for i in range(0, len(entries), BLOCK):
+                data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries[i:i + BLOCK])
+                compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+                f.write(compressor.compress(data.encode("utf-8")) + compressor.flush())
+                offsets.append(f.tell())
+            f.flush()
+            os.fsync(f.fileno())
+        table = {"block": BLOCK, "offsets": offsets}
+        with open(f"{base}.idx.tmp", "w") as f:
+            json.dump(table, f)
+            f.flush()
+            os.fsync(f.fileno())
+        # The table lands first: a segment is never seen without its own.
+        os.replace(f"{base}.idx.tmp", f"{base}.idx")
+        os.replace(f"{base}.jsonl.gz.tmp", f"{base}.jsonl.gz")
+        self.tables[name] = table
+        self.segments.append((start, end, name))
+        self.starts.append(start)
+        self.count = end
+
+    def reset(self):
+        for _, _, name in self.segments:
+            for path in (name, f"{name[:-len('.jsonl.gz')]}.idx"):
+                try:
+                    os.remove(os.path.join(self.directory, path))
+                except OSError:
+                    pass
+        self.segments = []
+        self.starts = []
+        self.tables = {}
+        self.count = 0
+
+
+class TieredLog:
+    """The conversation log: a hot tail in RAM, older turns in cold storage.
+
+    Behaves like the list it replaces (len, indexing, slicing, append) but
+    only the newest turns are held, as tuples. Earlier positions are read
+    from `cold` a block at a time and the last few blocks are cached, so
+    retrieval, summaries and export can still reach all of history while
+    startup and RSS depend only on the hot window. `spill()` moves all but
+    `hot_messages` turns to cold storage; with a store whose rows are already
+    durable (`cold.inline`) that happens on append, otherwise at snapshot time.
+    """
+
+    def __init__(self, cold, entries=(), hot_messages=500, cached_blocks=4):
+        self.cold = cold
+        # (cold count, hot items) swapped in one assignment, so readers
+        # never take the lock for the hot window, even during a spill.
+        self.view = (cold.count, [pack(entry) for entry in entries])
+        self.hot_messages = hot_messages
+        self.cached_blocks = cached_blocks
+        self.blocks = OrderedDict()
+        self.lock = threading.RLock()
+
+    @property
+    def hot(self):
+        return self.view[1]
+
+    @property
+    def cold_count(self):
+        return self.view[0]
+
+    def __len__(self):
+        offset, hot = self.view
+        return offset + len(hot)
+
+    def _cold_item(self, index):
+        with self.lock:
+            for start, items in self.blocks.items():
+                if start <= index < start + len(items):
+                    self.blocks.move_to_end(start)
+                    return items[index - start]
+            block = self.cold.block(index)
+            if block is None:
+                # A lost segment: keep positions stable rather than fail.
+                return ("assistant", "", MESSAGE_OVERHEAD, None)
+            start, entries = block
+            items = [pack(entry) for entry in entries]
+            self.blocks[start] = items
+            while len(self.blocks) > self.cached_blocks:
+                self.blocks.popitem(last=False)
+            return items[index - start]
+
+    def _item(self, index, view):
+        offset, hot = view
+        return hot[index - offset] if index >= offset else self._cold_item(index)
+
+    def __getitem__(self, index):
+        view = self.view
+        length = view[0] + len(view[1])
+        if isinstance(index, slice):
+            start, stop, step = index.indices(length)
+            if step == 1 and start >= view[0]:
+                return [unpack(item) for item in view[1][start - view[0]:stop - view[0]]]
+            return [unpack(self._item(i, view)) for i in range(start, stop, step)]
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("log index out of range")
+        return unpack(self._item(index, view))
+
+    def tokens_at(self, index):
+        """The token estimate of entry `index`, without building the entry."""
+        offset, hot = self.view
+        if index >= offset:
+            return hot[index - offset][2]
+        return self._cold_item(index)[2]
+
+    def messages(self, start):
+        """Entries from `start` on as bare chat messages (role and content)."""
+        offset, hot = self.view
+        cold = [self._cold_item(i) for i in range(start, offset)]
+        return [{"role": item[0], "content": item[1]} for item in cold + hot[max(0, start - offset):]]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def append(self, entry):
+        with self.lock:
+            self.view[1].append(pack(entry))
+            if self.cold.inline and self.needs_spill():
+                self.spill()
+
+    def needs_spill(self):
+        return len(self.view[1]) >= 2 * self.hot_messages
+
+    def spill(self):
+        with self.lock:
+            offset, hot = self.view
+            excess = len(hot) - self.hot_messages
+            if excess <= 0:
+                return
+            self.cold.spill([unpack(item) for item in hot[:excess]])
+            self.view = (offset + excess, hot[excess:])
+
+    def hot_entries(self):
+        return [unpack(item) for item in self.view[1]]
+
+    def reset(self, entries):
+        with self.lock:
+            self.cold.reset()
+            self.blocks.clear()
+            self.view = (0, [pack(entry) for entry in entries])
+
+    def extended(self, entries):
+        """This log plus `entries`, as a read-only view; the log is unchanged."""
+        offset, hot = self.view
+        view = TieredLog(self.cold, (), self.hot_messages, self.cached_blocks)
+        view.view = (offset, hot + [pack(entry) for entry in entries])
+        view.blocks = self.blocks
+        view.lock = self.lock
+        return view
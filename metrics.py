@@ -0,0 +1,177 @@
+import csv
+import json
+import math
+import os
+import threading
+import time
+
+# Options worth keeping with each turn; the seed changes every session.
+RECORDED_OPTIONS = ("num_thread", "num_ctx", "batch_size", "num_gpu", "gpu_layers", "temperature")
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    # Nearest rank: the smallest value with at least q% of values at or below it.
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _rate(tokens, duration_ms):
+    if not tokens or not duration_ms:
+        return None
+    return tokens / duration_ms * 1000
+
+
+class MetricsStore:
+    """Rolling per-turn inference metrics, one compact JSON line per turn.
+
+    The file is append-only; once it holds twice `max_records` lines it is
+    rewritten with the newest `max_records`, so appends stay cheap and the
+    file stays bounded.
+    """
+
+    def __init__(self, path="metrics.jsonl", max_records=10000):
+        self.path = path
+        self.max_records = max_records
+        self.session_started = time.time()
+        self.lock = threading.Lock()
+        self.records = self._read()
+
+    def _read(self):
+        records = []
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # A torn last line from a crash.
+                        continue
+        except Exception:
+            pass
+        return records[-self.max_records:]
+
+    def record(self, model, ttft, latency, eval_stats=None, options=None, context=None, cached=False,
+               prefill_ms=None):
+        eval_stats = eval_stats or {}
+        record = {
+            "t": round(time.time(), 3),
+            "model": model,
+            "ttft": round(ttft, 4) if ttft is not None else None,
+            "latency": round(latency, 4),
+            "prompt_tokens": eval_stats.get("prompt_eval_count"),
+            "prompt_ms": round(eval_stats["prompt_eval_duration"] / 1e6, 2) if eval_stats.get("prompt_eval_duration") is not None else None,
+            "eval_tokens": eval_stats.get("eval_count"),
+            "eval_ms": round(eval_stats["eval_duration"] / 1e6, 2) if eval_stats.get("eval_duration") is not None else None,
+            "load_ms": round(eval_stats["load_duration"] / 1e6, 2) if eval_stats.get("load_duration") is not None else None,
+            "context_tokens": context.get("total_tokens") if context else None,
+            "options": {k: options[k] for k in RECORDED_OPTIONS if options and k in options},
+        }
+        if cached:
+            record["cached"] = True
+        if prefill_ms is not None:
+            record["prefill_saved_ms"] = round(prefill_ms, 2)
+
+        with self.lock:
+            self.records.append(record)
+            compact = len(self.records) >= 2 * self.max_records
+            if compact:
+                self.records = self.records[-self.max_records:]
+            try:
+                if compact:
+                    self._rewrite()
+                else:
+                    with open(self.path, "a") as f:
+                        f.write(json.dumps(record, separators=(",", ":")) + "\n")
+            except Exception:
+                pass
+        return record
+
+    def _rewrite(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            for record in self.records:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def summary(self, since=None):
+        """Per-model aggregates for turns recorded after `since` (all if None)."""
+        with self.lock:
+            records = [r for r in self.records if since is None or r["t"] >= since]
+
+        by_model = {}
+        for record in records:
+            by_model.setdefault(record["model"], []).append(record)
+
+        summary = {}
+        for model, turns in sorted(by_model.items()):
+            generated = [r for r in turns if not r.get("cached")]
+            eval_rates = [x for x in (_rate(r["eval_tokens"], r["eval_ms"]) for r in generated) if x]
+            prompt_rates = [x for x in (_rate(r["prompt_tokens"], r["prompt_ms"]) for r in generated) if x]
+            ttft = [r["ttft"] for r in generated if r["ttft"] is not None]
+            latency = [r["latency"] for r in turns]
+            prefilled = [r["prefill_saved_ms"] for r in turns if r.get("prefill_saved_ms") is not None]
+            summary[model] = {
+                "turns": len(turns),
+                "cached": len(turns) - len(generated),
+                "eval_tokens_per_second": percentile(eval_rates, 50),
+                "prompt_tokens_per_second": percentile(prompt_rates, 50),
+                "ttft_p50": percentile(ttft, 50),
+                "ttft_p95": percentile(ttft, 95),
+                "latency_p50": percentile(latency, 50),
+                "latency_p95": percentile(latency, 95),
+                "latency_p99": percentile(latency, 99),
+                "prefilled_turns": len(prefilled),
+                "prefill_saved_ms": sum(prefilled),
+            }
+        return summary
+
+    def session_summary(self):
+        return self.summary(since=self.session_started)
+
+    def export(self, path):
+        """Writes every record as JSONL, CSV (.csv) or Prometheus text (.prom)."""
+        with self.lock:
+            records = list(self.records)
+
+        if path.endswith(".csv"):
+            fields = ["t", "model", "ttft", "latency", "prompt_tokens", "prompt_ms", "eval_tokens",
+                      "eval_ms", "load_ms", "context_tokens", "cached", "prefill_saved_ms", "options"]
+            with open(path, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+                writer.writeheader()
+                for record in records:
+                    writer.writerow({**record, "options": json.dumps(record.get("options", {}))})
+        elif path.endswith(".prom"):
+            with open(path, "w") as f:
+                f.write(self._prometheus())
+        else:
+            with open(path, "w") as f:
+                for record in records:
+                    f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        return len(records)
+
+    def _prometheus(self):
+        metrics = [
+            ("turns", "counter", "Turns answered"),
+            ("eval_tokens_per_second", "gauge", "Median generation speed"),
+            ("prompt_tokens_per_second", "gauge", "Median prompt processing speed"),
+            ("ttft_p50", "gauge", "Median time to first token in seconds"),
+            ("ttft_p95", "gauge", "95th percentile time to first token in seconds"),
+            ("latency_p50", "gauge", "Median turn latency in seconds"),
+            ("latency_p95", "gauge", "95th percentile turn latency in seconds"),
+            ("latency_p99", "gauge", "99th percentile turn latency in seconds"),
+            ("prefill_saved_ms", "counter", "Prompt evaluation time saved by prefill in milliseconds"),
+        ]
+        summary = self.summary()
+        lines = []
+        for key, kind, description in metrics:
+            name = f"stella_{key}"
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for model, stats in summary.items():
+                if stats[key] is not None:
+                    lines.append(f'{name}{{model="{model}"}} {stats[key]}')
+        return "\n".join(lines) + "\n"
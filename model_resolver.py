@@ -0,0 +1,172 @@
+import re
+import threading
+import time
+
+
+def normalize_model_name(name):
+    return name if ":" in name else f"{name}:latest"
+
+
+def parameter_billions(name, parameter_size=None):
+    """Model size in billions of parameters, from the server's details or the tag."""
+    for text in (parameter_size, name.split(":")[-1] if ":" in name else None, name):
+        if not text:
+            continue
+        match = re.search(r"(\d+(?:\.\d+)?)\s*([bm])\b", text.lower())
+        if match:
+            value = float(match.group(1))
+            return value / 1000 if match.group(2) == "m" else value
+    return None
+
+
+class ModelResolver:
+    """Picks the model to talk to without probing the server every turn.
+
+    Installed models are listed once and cached; the first healthy candidate
+    that is installed is remembered for `ttl` seconds. Failures open a
+    per-model circuit with exponential backoff so broken models are skipped
+    until the backoff expires. A background thread re-lists the server and
+    re-resolves whenever the set of installed models changes. With
+    `max_params` set, candidates of that size or smaller are preferred and
+    larger ones are kept only as fallbacks.
+    """
+
+    def __init__(self, candidates, client, ttl=600, refresh_interval=60,
+                 base_backoff=5, max_backoff=600):
+        self.candidates = list(candidates)
+        self.client = client
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self.lock = threading.RLock()
+        self.installed = None
+        self.details = {}
+        self.listed_at = 0
+        self.resolved = None
+        self.resolved_at = 0
+        self.health = {}
+        self.max_params = None
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stella-model-resolver", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.refresh():
+                self.resolve(force=True)
+            self._stop.wait(self.refresh_interval)
+
+    def refresh(self):
+        """List installed models. Returns True when the set changed."""
+        try:
+            response = self.client.list()
+        except Exception:
+            return False
+
+        installed = []
+        details = {}
+        for model in response["models"]:
+            name = model.get("model") or model.get("name")
+            if not name:
+                continue
+            installed.append(name)
+            info = model.get("details")
+            details[name] = {
+                "size": model.get("size"),
+                "parameter_size": info.get("parameter_size") if info else None,
+            }
+
+        with self.lock:
+            changed = self.installed is None or set(installed) != set(self.installed)
+            self.installed = installed
+            self.details = details
+            self.listed_at = time.time()
+            if changed:
+                self.resolved = None
+        return changed
+
+    def installed_models(self, refresh=False):
+        with self.lock:
+            stale = self.installed is None or time.time() - self.listed_at > self.ttl
+        if refresh or stale:
+            self.refresh()
+        with self.lock:
+            return list(self.installed or [])
+
+    def set_max_params(self, max_params):
+        with self.lock:
+            if max_params != self.max_params:
+                self.max_params = max_params
+                self.resolved = None
+
+    def _fits(self, model):
+        if self.max_params is None:
+            return True
+        details = self.details.get(model) or {}
+        size = parameter_billions(model, details.get("parameter_size"))
+        return size is None or size <= self.max_params
+
+    def is_available(self, model):
+        state = self.health.get(model)
+        return state is None or state["open_until"] <= time.time()
+
+    def _installed_candidates(self):
+        installed = self.installed_models()
+        if not installed:
+            # Listing failed (old server, no permissions...); fall back to
+            # trying the candidates blindly, as before.
+            return list(self.candidates)
+        names = {normalize_model_name(name): name for name in installed}
+        models = [m for m in self.candidates if normalize_model_name(m) in names]
+        if self.max_params is None:
+            return models
+        with self.lock:
+            fits = [m for m in models if self._fits(names[normalize_model_name(m)])]
+        return fits + [m for m in models if m not in fits]
+
+    def resolve(self, force=False):
+        with self.lock:
+            fresh = self.resolved and time.time() - self.resolved_at < self.ttl
+            if fresh and not force and self.is_available(self.resolved):
+                return self.resolved
+
+        for model in self._installed_candidates():
+            if self.is_available(model):
+                with self.lock:
+                    self.resolved = model
+                    self.resolved_at = time.time()
+                return model
+
+        with self.lock:
+            self.resolved = None
+        return None
+
+    def models_for_turn(self):
+        """Resolved model first, then any other healthy installed fallback."""
+        first = self.resolve()
+        models = [first] if first else []
+        models += [m for m in self._installed_candidates() if m != first and self.is_available(m)]
+        return models
+
+    def record_success(self, model):
+        with self.lock:
+            self.health.pop(model, None)
+
+    def record_failure(self, model):
+        with self.lock:
+            state = self.health.setdefault(model, {"failures": 0, "open_until": 0})
+            state["failures"] += 1
+            backoff = min(self.max_backoff, self.base_backoff * 2 ** (state["failures"] - 1))
+            state["open_until"] = time.time() + backoff
+            if self.resolved == model:
+                self.resolved = None
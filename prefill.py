@@ -0,0 +1,91 @@
+import threading
+import time
+
+from context_builder import eval_stats
+
+
+class Prefiller:
+    """Evaluates the next turn's prompt prefix while the user is typing.
+
+    After a reply, `schedule()` is handed the messages the next turn will
+    start with (system prompt, summaries and the history window). A
+    background thread sends them as a one-token chat request, so the server
+    has their KV state cached and only the user's new message is left to
+    evaluate on submit. Nothing ever waits on it: `begin_turn()` drops a
+    prefill that has not been sent yet and ignores one still in flight.
+    """
+
+    def __init__(self, backend, keep_alive=None):
+        self.backend = backend
+        self.keep_alive = keep_alive
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.pending = None
+        self.result = None
+        self._wake = threading.Event()
+        self._thread = None
+
+    def schedule(self, model, messages, options, prefix_tokens):
+        with self.lock:
+            self.generation += 1
+            self.pending = (self.generation, model, messages, dict(options or {}), prefix_tokens)
+            self.result = None
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stella-prefill", daemon=True)
+            self._thread.start()
+        self._wake.set()
+
+    def begin_turn(self):
+        """The prefill that finished before this turn, or None."""
+        with self.lock:
+            self.generation += 1
+            self.pending = None
+            result, self.result = self.result, None
+        return result
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self.lock:
+                job, self.pending = self.pending, None
+            if job is None:
+                continue
+            generation, model, messages, options, prefix_tokens = job
+            options["num_predict"] = 1
+            started = time.perf_counter()
+            try:
+                response = self.backend.chat(
+                    model=model, messages=messages, options=options, stream=False, keep_alive=self.keep_alive
+                )
+            except Exception:
+                continue
+            stats = eval_stats(response)
+            with self.lock:
+                if generation == self.generation:
+                    self.result = {
+                        "model": model,
+                        "prefix_tokens": prefix_tokens,
+                        "prompt_tokens": stats.get("prompt_eval_count"),
+                        "prompt_ms": stats.get("prompt_eval_duration", 0) / 1e6,
+                        "wall_ms": (time.perf_counter() - started) * 1000,
+                    }
+
+
+def saved_prompt_ms(prefill, model, turn_stats, context):
+    """Prompt-eval time the prefill took off this turn: None without a
+    prefill, 0 when the server did not reuse it.
+
+    Reuse shows in the turn's own prompt_eval_count: with the prefix cached
+    the server evaluates roughly the new part only (the context estimate
+    minus the prefix estimate); without it, the prefill's tokens as well.
+    """
+    if not prefill or not turn_stats or turn_stats.get("prompt_eval_count") is None:
+        return None
+    if prefill["model"] != model or not context:
+        return 0
+    new_tokens = max(0, context["total_tokens"] - prefill["prefix_tokens"])
+    prefilled = prefill["prompt_tokens"] or 0
+    if turn_stats["prompt_eval_count"] >= new_tokens + prefilled / 2 + 16:
+        return 0
+    return prefill["prompt_ms"]
@@ -0,0 +1,280 @@
+import json
+import os
+import threading
+import time
+
+# Lowest to highest. Each profile caps what the machine would otherwise use:
+# the context window, the share of CPU threads, the prompt batch size and the
+# size of the model (in billions of parameters; None means no cap).
+PROFILES = [
+    {"name": "minimal", "num_ctx": 1024, "thread_share": 0.25, "batch_size": 16, "max_params": 2, "recall": False},
+    {"name": "low", "num_ctx": 2048, "thread_share": 0.25, "batch_size": 32, "max_params": 4, "recall": False},
+    {"name": "balanced", "num_ctx": 4096, "thread_share": 0.5, "batch_size": 64, "max_params": 8, "recall": True},
+    {"name": "full", "num_ctx": None, "thread_share": 1.0, "batch_size": None, "max_params": None, "recall": True},
+]
+PROFILE_NAMES = [profile["name"] for profile in PROFILES]
+
+# Below these amounts of RAM the higher profiles are never used.
+CEILING_BY_MEMORY_GB = [(4, "low"), (8, "balanced")]
+
+
+def profile_index(name):
+    return PROFILE_NAMES.index(name)
+
+
+def ceiling_for_memory(total_bytes):
+    total_gb = total_bytes / (1024 ** 3)
+    for limit, name in CEILING_BY_MEMORY_GB:
+        if total_gb < limit:
+            return name
+    return PROFILE_NAMES[-1]
+
+
+def apply_profile(options, profile, cpu_count=None):
+    """`options` with the profile's caps applied; never raises a setting."""
+    options = dict(options)
+    if profile["num_ctx"] and options.get("num_ctx"):
+        options["num_ctx"] = min(options["num_ctx"], profile["num_ctx"])
+    if profile["batch_size"] and options.get("batch_size"):
+        options["batch_size"] = min(options["batch_size"], profile["batch_size"])
+    if options.get("num_thread"):
+        threads = max(1, int((cpu_count or os.cpu_count() or 1) * profile["thread_share"]))
+        options["num_thread"] = min(options["num_thread"], threads)
+    return options
+
+
+def read_resources():
+    """A snapshot of memory, swap, CPU and battery from psutil."""
+    import psutil
+
+    memory = psutil.virtual_memory()
+    sample = {
+        "t": time.time(),
+        "total": memory.total,
+        "available": memory.available,
+        "cpu": psutil.cpu_percent(interval=None),
+        "swapped": None,
+        "battery": None,
+        "plugged": None,
+    }
+    try:
+        swap = psutil.swap_memory()
+        sample["swapped"] = swap.sin + swap.sout
+    except Exception:
+        pass
+    try:
+        battery = psutil.sensors_battery()
+    except Exception:
+        battery = None
+    if battery is not None:
+        sample["battery"] = battery.percent
+        sample["plugged"] = battery.power_plugged
+    return sample
+
+
+class ResourceGovernor:
+    """Moves Stella between resource profiles as the machine's load changes.
+
+    A background thread samples available memory, swap traffic, CPU load and
+    the battery every `interval` seconds, but only between turns: samples
+    that overlap a reply are dropped, since the model itself is what loads
+    the machine then. Any sign of pressure steps the profile down one level
+    at once; it steps back up one level after `calm_samples` calm samples in
+    a row, never above the ceiling set by the machine's RAM. Running on a low
+    battery caps the profile directly. Every transition is appended to `log`
+    as a JSON line.
+    """
+
+    def __init__(self, profile="auto", interval=15, calm_samples=3, min_available=0.1,
+                 min_available_mb=1024, max_swap_rate=1024 * 1024, max_cpu=85,
+                 battery_low=20, battery_critical=10, log="profiles.log",
+                 on_change=None, total_memory=None):
+        self.pinned = profile != "auto"
+        self.interval = interval
+        self.calm_samples = calm_samples
+        self.min_available = min_available
+        self.min_available_mb = min_available_mb
+        self.max_swap_rate = max_swap_rate
+        self.max_cpu = max_cpu
+        self.battery_low = battery_low
+        self.battery_critical = battery_critical
+        self.log = log
+        self.on_change = on_change
+
+        if self.pinned:
+            self.ceiling = profile_index(profile)
+        else:
+            self.ceiling = profile_index(ceiling_for_memory(total_memory or _total_memory()))
+        self.index = self.ceiling
+        self.reason = "pinned" if self.pinned else "start"
+        self.calm = 0
+        self.last_sample = None
+        self.last_reasons = []
+
+        self.lock = threading.Lock()
+        self.busy = False
+        self.turns = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def profile(self):
+        return PROFILES[self.index]
+
+    @property
+    def name(self):
+        return self.profile["name"]
+
+    def options(self, options):
+        return apply_profile(options, self.profile)
+
+    def begin_turn(self):
+        with self.lock:
+            self.busy = True
+
+    def end_turn(self):
+        with self.lock:
+            self.busy = False
+            self.turns += 1
+
+    def pressure(self, sample, previous):
+        """(reasons to step down, reasons to hold, cap from the battery)."""
+        down = []
+        hold = []
+        available_mb = sample["available"] / (1024 * 1024)
+        share = sample["available"] / sample["total"] if sample["total"] else 1
+        if share < self.min_available or available_mb < self.min_available_mb:
+            down.append(f"memory low ({available_mb:.0f} MB free)")
+        elif share < 2 * self.min_available or available_mb < 2 * self.min_available_mb:
+            hold.append("memory tight")
+
+        if previous and sample["swapped"] is not None and previous["swapped"] is not None:
+            elapsed = max(sample["t"] - previous["t"], 1e-3)
+            rate = (sample["swapped"] - previous["swapped"]) / elapsed
+            if rate > self.max_swap_rate:
+                down.append(f"swapping ({rate / (1024 * 1024):.1f} MB/s)")
+            elif rate > 0:
+                hold.append("some swapping")
+
+        if sample["cpu"] >= self.max_cpu:
+            down.append(f"CPU busy ({sample['cpu']:.0f}%)")
+        elif sample["cpu"] >= self.max_cpu * 0.7:
+            hold.append("CPU fairly busy")
+
+        cap = len(PROFILES) - 1
+        if sample["battery"] is not None and sample["plugged"] is False:
+            if sample["battery"] <= self.battery_critical:
+                cap = profile_index("minimal")
+            elif sample["battery"] <= self.battery_low:
+                cap = profile_index("low")
+            else:
+                cap = profile_index("balanced")
+        return down, hold, cap
+
+    def evaluate(self, sample, previous=None):
+        """Applies one sample; returns (old, new) profile names on a transition."""
+        down, hold, cap = self.pressure(sample, previous)
+        self.last_sample = sample
+        self.last_reasons = down + hold
+        ceiling = min(self.ceiling, cap)
+        target = self.index
+        reason = None
+        if self.index > ceiling:
+            target = ceiling
+            reason = f"on battery ({sample['battery']:.0f}%)"
+            self.calm = 0
+        elif down:
+            target = max(0, self.index - 1)
+            reason = ", ".join(down)
+            self.calm = 0
+        elif hold:
+            self.calm = 0
+        else:
+            self.calm += 1
+            if self.calm >= self.calm_samples and self.index < ceiling:
+                target = self.index + 1
+                reason = "resources available again"
+                self.calm = 0
+
+        if target == self.index:
+            return None
+        old = self.name
+        self.index = target
+        self.reason = reason
+        self._record(old, self.name, reason, sample)
+        return old, self.name
+
+    def _record(self, old, new, reason, sample):
+        if self.log:
+            entry = {
+                "t": round(sample["t"], 3),
+                "from": old,
+                "to": new,
+                "reason": reason,
+                "available_mb": round(sample["available"] / (1024 * 1024)),
+                "cpu": sample["cpu"],
+                "battery": sample["battery"],
+            }
+            try:
+                with open(self.log, "a") as f:
+                    f.write(json.dumps(entry) + "\n")
+            except Exception:
+                pass
+        if self.on_change:
+            try:
+                self.on_change(old, new, reason)
+            except Exception:
+                pass
+
+    def transitions(self, limit=5):
+        try:
+            with open(self.log, "r") as f:
+                lines = f.readlines()[-limit:]
+        except Exception:
+            return []
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+        return entries
+
+    def start(self):
+        if self.pinned or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="stella-resources", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        previous = None
+        turns = None
+        try:
+            read_resources()
+        except Exception:
+            # Without psutil the starting profile stays.
+            return
+        while not self._stop.wait(self.interval):
+            try:
+                sample = read_resources()
+            except Exception:
+                continue
+            with self.lock:
+                # CPU load during or since a reply is the model's own work.
+                if self.busy or self.turns != turns:
+                    turns = self.turns
+                    previous = sample
+                    continue
+                self.evaluate(sample, previous)
+            previous = sample
+
+
+def _total_memory():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        import psutil
+        return psutil.virtual_memory().total
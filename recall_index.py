@@ -0,0 +1,203 @@
+import json
+import os
+import threading
+import time
+
+
+class RecallIndex:
+    """Embedding index over the conversation log for long-term recall.
+
+    Vectors are L2-normalised float32 rows appended to `<prefix>.f32`, the
+    log position of each row to `<prefix>.ids`, and `<prefix>.json` records
+    the embedding model, dimension and how far into the log we have indexed.
+    New messages are embedded by a background thread; nothing is re-indexed
+    on startup. The stored vectors are memory-mapped rather than read, and
+    only on first use (numpy too), so the index costs neither startup time
+    nor RAM in proportion to the history.
+    """
+
+    RETRY_AFTER = 300
+
+    def __init__(self, client, prefix="memory.vectors", model="nomic-embed-text", batch_size=32,
+                 keep_alive=None):
+        self.client = client
+        self.model = model
+        self.keep_alive = keep_alive
+        self.batch_size = batch_size
+        self.vectors_file = f"{prefix}.f32"
+        self.ids_file = f"{prefix}.ids"
+        self.meta_file = f"{prefix}.json"
+
+        self.lock = threading.RLock()
+        self.dim = None
+        self.count = 0
+        self.indexed_upto = 0
+        self.vectors = None
+        self.ids = None
+        self.loaded = False
+        self.failed_at = None
+
+        self._log = None
+        self._wake = threading.Event()
+        self._thread = None
+
+    def _ensure_loaded(self):
+        with self.lock:
+            if not self.loaded:
+                self.load()
+                self.loaded = True
+
+    def load(self):
+        import numpy as np
+
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.ids = np.zeros(0, dtype=np.int64)
+        try:
+            with open(self.meta_file, "r") as f:
+                meta = json.load(f)
+        except Exception:
+            meta = {}
+        if meta.get("model") != self.model or not meta.get("dim"):
+            # Rows of another model, or never described: appending would
+            # mix them with new ones, so start afresh.
+            for path in (self.vectors_file, self.ids_file):
+                if os.path.exists(path):
+                    os.remove(path)
+            return
+
+        dim = meta["dim"]
+        try:
+            for path in (self.vectors_file, self.ids_file):
+                open(path, "ab").close()
+            count = min(os.path.getsize(self.vectors_file) // (4 * dim), os.path.getsize(self.ids_file) // 8)
+            # Keep only rows that made it to both files before any crash,
+            # so later appends line up again.
+            os.truncate(self.vectors_file, count * 4 * dim)
+            os.truncate(self.ids_file, count * 8)
+        except OSError:
+            return
+
+        self.dim = dim
+        self._map(count)
+        self.indexed_upto = meta.get("indexed_upto", 0)
+        if count and self.indexed_upto <= int(self.ids[-1]):
+            self.indexed_upto = int(self.ids[-1]) + 1
+
+    def reset(self):
+        import numpy as np
+
+        with self.lock:
+            self.loaded = True
+            self.dim = None
+            self.count = 0
+            self.indexed_upto = 0
+            self.vectors = np.zeros((0, 0), dtype=np.float32)
+            self.ids = np.zeros(0, dtype=np.int64)
+            for path in (self.vectors_file, self.ids_file, self.meta_file):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    @property
+    def available(self):
+        return self.failed_at is None or time.time() - self.failed_at > self.RETRY_AFTER
+
+    def embed(self, texts):
+        import numpy as np
+
+        try:
+            keep_alive = self.keep_alive() if callable(self.keep_alive) else self.keep_alive
+            response = self.client.embed(model=self.model, input=texts, keep_alive=keep_alive)
+        except Exception:
+            self.failed_at = time.time()
+            raise
+        self.failed_at = None
+        vectors = np.asarray(response["embeddings"], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return vectors / norms
+
+    def _map(self, count):
+        """Maps the first `count` rows of both files; searches read them through the page cache."""
+        import numpy as np
+
+        self.count = count
+        if not count:
+            self.vectors = np.zeros((0, self.dim or 0), dtype=np.float32)
+            self.ids = np.zeros(0, dtype=np.int64)
+            return
+        self.vectors = np.memmap(self.vectors_file, dtype=np.float32, mode="r", shape=(count, self.dim))
+        self.ids = np.memmap(self.ids_file, dtype=np.int64, mode="r", shape=(count,))
+
+    def _append(self, ids, vectors):
+        import numpy as np
+
+        with self.lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            with open(self.vectors_file, "ab") as f:
+                vectors.astype(np.float32).tofile(f)
+            with open(self.ids_file, "ab") as f:
+                np.asarray(ids, dtype=np.int64).tofile(f)
+            self._map(self.count + len(ids))
+
+    def _save_meta(self):
+        tmp_path = f"{self.meta_file}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"model": self.model, "dim": self.dim, "indexed_upto": self.indexed_upto}, f)
+        os.replace(tmp_path, self.meta_file)
+
+    def update(self, log):
+        """Embed log entries that are not indexed yet."""
+        self._ensure_loaded()
+        if len(log) < self.indexed_upto:
+            # The log was replaced (e.g. by an import); start over.
+            self.reset()
+
+        while self.indexed_upto < len(log) and self.available:
+            start = self.indexed_upto
+            batch = [(i, log[i]) for i in range(start, min(len(log), start + self.batch_size))]
+            batch = [(i, entry) for i, entry in batch if entry.get("content", "").strip()]
+            if batch:
+                vectors = self.embed([entry["content"] for _, entry in batch])
+                self._append([i for i, _ in batch], vectors)
+            self.indexed_upto = min(len(log), start + self.batch_size)
+            self._save_meta()
+
+    def search(self, query, k=3, before=None, min_score=0.0):
+        """Log positions of the k entries closest to `query`, best first."""
+        import numpy as np
+
+        self._ensure_loaded()
+        with self.lock:
+            count = self.count
+            if not count or not self.available:
+                return []
+            vectors = self.vectors[:count]
+            ids = self.ids[:count]
+        query_vector = self.embed([query])[0]
+        if query_vector.shape[0] != vectors.shape[1]:
+            return []
+
+        scores = vectors @ query_vector
+        if before is not None:
+            scores = np.where(ids < before, scores, -1.0)
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top if scores[i] >= min_score]
+
+    def schedule(self, log):
+        self._log = log
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stella-recall-indexer", daemon=True)
+            self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self.update(self._log)
+            except Exception:
+                pass
@@ -0,0 +1,132 @@
+import threading
+import time
+
+
+class ResidencyManager:
+    """Keeps the chat model loaded while the user is around and frees it when not.
+
+    The model is preloaded in the background at launch. Afterwards a timer
+    thread watches idle time: after `unload_after` seconds without any
+    activity the model is unloaded with keep_alive=0, and as soon as the user
+    is back (idle drops under `resume_below`) it is loaded again so the first
+    reply after a break does not pay for a cold load.
+
+    Background work (summaries, embeddings) asks `chat_keep_alive()` and
+    `embed_keep_alive()` rather than using `keep_alive` directly, so it never
+    keeps a model loaded past an idle unload: until the user is back both are
+    0, and the embedding model is only kept `embed_keep_alive` after its last
+    use.
+    """
+
+    def __init__(self, client, model, options=None, idle_source=None, keep_alive="2h",
+                 unload_after=1200, resume_below=60, check_interval=30,
+                 embed_model=None, embed_keep_alive="5m"):
+        self.client = client
+        self.model = model
+        self.options = options
+        self.idle_source = idle_source
+        self.keep_alive = keep_alive
+        self.embed_model = embed_model
+        self.embed_keep = embed_keep_alive
+        self.embed_loaded = False
+        self.idle_unloaded = False
+        self.unload_after = unload_after
+        self.resume_below = resume_below
+        self.check_interval = check_interval
+
+        self.loaded_model = None
+        self.last_turn = time.time()
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _model(self):
+        return self.model() if callable(self.model) else self.model
+
+    def _options(self):
+        return self.options() if callable(self.options) else self.options
+
+    def warm(self):
+        model = self._model()
+        if not model:
+            return False
+        with self.lock:
+            if self.loaded_model == model:
+                return True
+            try:
+                # An empty prompt only loads the model; nothing is generated.
+                self.client.generate(model=model, prompt="", options=self._options(), keep_alive=self.keep_alive)
+            except Exception:
+                return False
+            self.loaded_model = model
+            self.idle_unloaded = False
+            return True
+
+    def warm_async(self):
+        threading.Thread(target=self.warm, name="stella-warmup", daemon=True).start()
+
+    def chat_keep_alive(self):
+        # The chat model's own keep_alive while the user is around: a shorter
+        # one would cut its residency short.
+        return 0 if self.idle_unloaded else self.keep_alive
+
+    def embed_keep_alive(self):
+        if self.idle_unloaded:
+            return 0
+        self.embed_loaded = True
+        return self.embed_keep
+
+    def unload(self):
+        with self.lock:
+            self.idle_unloaded = True
+            if self.embed_loaded and self.embed_model:
+                try:
+                    self.client.embed(model=self.embed_model, input=[], keep_alive=0)
+                except Exception:
+                    pass
+                self.embed_loaded = False
+            if not self.loaded_model:
+                return
+            try:
+                self.client.generate(model=self.loaded_model, prompt="", keep_alive=0)
+            except Exception:
+                pass
+            self.loaded_model = None
+
+    def touch(self, model=None):
+        self.last_turn = time.time()
+        self.idle_unloaded = False
+        if model:
+            self.loaded_model = model
+
+    def idle_seconds(self):
+        since_turn = time.time() - self.last_turn
+        if self.idle_source is None:
+            return since_turn
+        try:
+            idle = self.idle_source()
+        except Exception:
+            return since_turn
+        return since_turn if idle is None else min(since_turn, idle)
+
+    def check(self):
+        idle = self.idle_seconds()
+        if (self.loaded_model or self.embed_loaded) and idle >= self.unload_after:
+            self.unload()
+        elif not self.loaded_model and idle < self.resume_below:
+            self.warm()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stella-residency", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.check()
+            except Exception:
+                pass
@@ -0,0 +1,173 @@
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+VOLATILE_OPTIONS = {"seed"}
+
+
+def normalize_prompt(prompt):
+    prompt = re.sub(r"\s+", " ", prompt.strip().lower())
+    return prompt.rstrip(" .!?~")
+
+
+class ResponseCache:
+    """LRU cache of replies for repeated prompts, persisted across restarts.
+
+    Entries are keyed on the normalised prompt plus a scope made of the
+    model, the sampling options (minus the seed) and whatever context the
+    caller considers relevant. Entries expire after `max_age` seconds and the
+    least recently used ones are evicted past `max_entries`. With a
+    `similarity` threshold, a prompt with no exact match may also reuse the
+    reply of the closest cached prompt in the same scope, compared by
+    embedding.
+    """
+
+    SAVE_INTERVAL = 30
+
+    def __init__(self, path="response_cache.json", max_entries=256, max_age=7 * 86400,
+                 similarity=None, client=None, embed_model=None, keep_alive=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.similarity = similarity
+        self.client = client
+        self.embed_model = embed_model
+        self.keep_alive = keep_alive
+
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.dirty = False
+        self.saved_at = time.time()
+
+        self.load()
+        atexit.register(self.save)
+
+    def scope(self, model, options, context):
+        options = {k: v for k, v in (options or {}).items() if k not in VOLATILE_OPTIONS}
+        payload = json.dumps([model, options, context], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _key(self, prompt, scope):
+        return hashlib.sha256(f"{scope}\0{normalize_prompt(prompt)}".encode()).hexdigest()
+
+    def _embed(self, text):
+        import numpy as np
+
+        keep_alive = self.keep_alive() if callable(self.keep_alive) else self.keep_alive
+        response = self.client.embed(model=self.embed_model, input=[text], keep_alive=keep_alive)
+        vector = np.asarray(response["embeddings"][0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self):
+        cutoff = time.time() - self.max_age
+        for key in [k for k, e in self.entries.items() if e["created"] < cutoff]:
+            del self.entries[key]
+            self.dirty = True
+
+    def get(self, prompt, model, options, context):
+        scope = self.scope(model, options, context)
+        key = self._key(prompt, scope)
+        with self.lock:
+            self._expire()
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry["reply"]
+            candidates = [(k, e) for k, e in self.entries.items() if e["scope"] == scope and e.get("vector")]
+
+        if self.similarity and candidates and self.client:
+            import numpy as np
+
+            try:
+                vector = self._embed(normalize_prompt(prompt))
+            except Exception:
+                vector = None
+            if vector is not None:
+                best_key, best_score = None, self.similarity
+                for candidate_key, entry in candidates:
+                    score = float(np.dot(vector, np.asarray(entry["vector"], dtype=np.float32)))
+                    if score >= best_score:
+                        best_key, best_score = candidate_key, score
+                if best_key is not None:
+                    with self.lock:
+                        entry = self.entries.get(best_key)
+                        if entry is not None:
+                            self.entries.move_to_end(best_key)
+                            self.similar_hits += 1
+                            return entry["reply"]
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, prompt, model, options, context, reply):
+        scope = self.scope(model, options, context)
+        entry = {
+            "prompt": normalize_prompt(prompt),
+            "scope": scope,
+            "reply": reply,
+            "created": time.time(),
+        }
+        if self.similarity and self.client:
+            try:
+                entry["vector"] = self._embed(entry["prompt"]).tolist()
+            except Exception:
+                pass
+
+        with self.lock:
+            key = self._key(prompt, scope)
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.dirty = True
+            due = time.time() - self.saved_at > self.SAVE_INTERVAL
+        if due:
+            self.save()
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except Exception:
+            return
+        for entry in data.get("entries", []):
+            key = self._key(entry["prompt"], entry["scope"])
+            self.entries[key] = entry
+        self._expire()
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            data = {"entries": list(self.entries.values())}
+            self.dirty = False
+            self.saved_at = time.time()
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            pass
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.similar_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.similar_hits) / lookups if lookups else 0.0,
+            }
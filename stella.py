@@ -1,15 +1,24 @@
+import argparse
 import os
 import sys
+import importlib
 import importlib.util
 import platform
-import psutil
+
+from profiles import PROFILE_NAMES
 
 def clear_screen():
-    os.system('cls' if os.name == 'nt' else 'clear')
+    # Escape sequences instead of spawning `clear`: erase screen and scrollback, cursor home.
+    print("\033[2J\033[3J\033[H", end="", flush=True)
 
 def get_system_memory():
     """Get system memory in GB"""
-    return round(psutil.virtual_memory().total / (1024 ** 3), 1)
+    try:
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        import psutil
+        total = psutil.virtual_memory().total
+    return round(total / (1024 ** 3), 1)
 
 def print_header():
     print("\033[96m\033[1m")
@@ -22,7 +31,109 @@ def print_header():
     """)
     print("\033[0m")
 
+def daemon_running():
+    import daemon
+    from config import load_config
+    return daemon.is_running(daemon.default_address(load_config()))
+
+def migrate(force=False):
+    import memory_sqlite
+    from config import load_config
+    db_path = load_config()["memory"]["db_path"]
+    try:
+        messages, journal = memory_sqlite.migrate(db_file=db_path, force=force)
+    except FileExistsError as e:
+        print(e)
+        return 1
+    except RuntimeError as e:
+        # Another Stella holds memory.json.
+        print(f"{e}\nClose the running Stella first, then run 'python stella.py migrate' again.")
+        return 1
+    print(f"Copied {messages} messages and {journal} journal entries into {db_path}.")
+    print("Stella will use it from now on; memory.json and journal.txt are left as a backup.")
+    return 0
+
+def transfer_memory(command, path):
+    from config import load_config
+    from full import StellaMemory
+    config = load_config()
+    settings = config["memory"]
+    try:
+        memory = StellaMemory(backend=settings["backend"], db_file=settings["db_path"],
+                              journal=config["journal"], hot_messages=settings["hot_messages"])
+    except RuntimeError as e:
+        print(e)
+        return 1
+    try:
+        if command == "export":
+            memory.export_json(path)
+            print(f"Exported {len(memory.memory['log'])} messages to {path}.")
+        else:
+            memory.import_json(path)
+            print(f"Imported {len(memory.memory['log'])} messages from {path}; they replace the previous memory.")
+    except (OSError, ValueError) as e:
+        print(f"Could not {command} {path}: {e}")
+        return 1
+    finally:
+        memory.close()
+    return 0
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Stella - your terminal companion")
+    parser.add_argument("command", nargs="?", default="chat", choices=["chat", "tune", "batch", "serve", "connect", "migrate", "export", "import"],
+                        help="'tune' measures the best thread, batch and context settings for your model; "
+                             "'batch' answers prompts from a JSONL file or stdin without the interactive UI; "
+                             "'serve' keeps one Stella running for every terminal and 'connect' talks to it; "
+                             "'migrate' moves memory.json and journal.txt into a searchable SQLite database; "
+                             "'export' and 'import' copy the whole memory to and from a memory.json-style file")
+    parser.add_argument("path", nargs="?", help="export/import: the file (export defaults to stella_export.json)")
+    parser.add_argument("--reprobe", action="store_true",
+                        help="ignore the cached hardware capabilities and probe again")
+    parser.add_argument("--model", help="model to tune (defaults to the one Stella would pick)")
+    parser.add_argument("--input", default="-", help="batch: JSONL or text file of prompts, - for stdin")
+    parser.add_argument("--output", help="batch: JSONL file for the results (resumes if it exists)")
+    parser.add_argument("--concurrency", type=int, default=4, help="batch: requests in flight at once")
+    parser.add_argument("--profile", choices=["auto"] + PROFILE_NAMES,
+                        help="resource profile: 'auto' (the default) adapts to how busy the machine is, "
+                             "any other pins that profile for the session")
+    # The old low/full split; --mode low is --profile low.
+    parser.add_argument("--mode", choices=["full", "low"], help=argparse.SUPPRESS)
+    parser.add_argument("--remember", action="store_true", help="batch: save the exchanges to memory")
+    parser.add_argument("--force", action="store_true", help="migrate: rebuild an existing database")
+    args = parser.parse_args()
+    if args.profile is None and args.mode == "low":
+        args.profile = "low"
+    return args
+
 def main():
+    args = parse_args()
+    if args.command == "tune":
+        import tuner
+        sys.exit(tuner.main(model=args.model, reprobe=args.reprobe))
+    if args.command == "migrate":
+        sys.exit(migrate(args.force))
+    if args.command in ("export", "import"):
+        if args.command == "import" and not args.path:
+            print("Usage: python stella.py import <file>")
+            sys.exit(2)
+        sys.exit(transfer_memory(args.command, args.path or "stella_export.json"))
+    if args.command in ("serve", "connect") or (args.command == "chat" and daemon_running()):
+        import daemon
+        if args.command == "serve":
+            import full
+            sys.exit(daemon.serve(full, reprobe=args.reprobe, profile=args.profile))
+        if args.profile or args.reprobe:
+            print("\033[93mConnecting to the running Stella daemon, which keeps its own settings: "
+                  "--profile and --reprobe only apply to 'python stella.py serve'.\033[0m")
+        sys.exit(daemon.connect())
+    if args.command == "batch":
+        import batch
+        import full
+        sys.exit(batch.main(
+            full, args.input, args.output, concurrency=args.concurrency,
+            remember=args.remember, reprobe=args.reprobe, profile=args.profile
+        ))
+    
     clear_screen()
     print_header()
     
@@ -30,39 +141,23 @@ def main():
     
     print(f"System detected: {platform.system()} {platform.release()}")
     print(f"Available memory: {system_memory} GB")
-    print("\nPlease select a mode to run Stella:")
-    print("\033[93m1. Low Memory Mode\033[0m - Uses minimal resources (recommended for systems with < 8GB RAM)")
-    print("\033[96m2. Full Power Mode\033[0m - Uses all available resources for best experience")
-    
-    if system_memory < 8:
-        print("\n\033[93mRecommendation: Low Memory Mode for your system\033[0m")
+    if args.profile in (None, "auto"):
+        print("\nStella adapts to your machine, using less of it while it is busy and more once it calms down.")
+        print("\nStarting Stella...")
     else:
-        print("\n\033[96mRecommendation: Full Power Mode for your system\033[0m")
-    
-    while True:
-        try:
-            choice = input("\nEnter your choice (1 or 2): ")
-            if choice == "1":
-                print("\nStarting Stella in Low Memory Mode...")
-                import low as stella_module
-                break
-            elif choice == "2":
-                print("\nStarting Stella in Full Power Mode...")
-                import full as stella_module  
-                break
-            else:
-                print("Invalid choice. Please enter 1 or 2.")
-        except Exception as e:
-            print(f"Error: {str(e)}")
-            print("Make sure both 'low.py' and 'full.py' are in the same directory.")
-            sys.exit(1)
+        print(f"\nStarting Stella with the {args.profile} profile...")
     
-    
-    stella = stella_module.Stella()
+    import full as stella_module
+    try:
+        stella = stella_module.Stella(reprobe=args.reprobe, profile=args.profile)
+    except RuntimeError as e:
+        # Most likely another Stella already holds this memory.
+        print(f"\n{e}")
+        sys.exit(1)
     stella.run()
 
 if __name__ == "__main__":
-    required_modules = ['ollama', 'prompt_toolkit', 'psutil']
+    required_modules = ['ollama', 'httpx', 'prompt_toolkit', 'psutil']
     missing_modules = []
     
     for module in required_modules:
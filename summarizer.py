@@ -0,0 +1,174 @@
+import threading
+import time
+
+SPAN_PROMPT = (
+    "Summarize this part of a conversation between the user and Stella, their terminal companion, "
+    "in a few sentences. Keep names, facts, preferences, promises and unfinished topics. "
+    "Write it from Stella's point of view in the past tense."
+)
+
+MERGE_PROMPT = (
+    "Combine these consecutive summaries of a conversation between the user and Stella into one "
+    "shorter summary. Keep names, facts, preferences, promises and unfinished topics."
+)
+
+
+class Summarizer:
+    """Folds old history into hierarchical summaries while Stella is idle.
+
+    Level-0 summaries each cover `span` raw messages that have fallen out of
+    the recent window; every `fanout` adjacent summaries of one level are
+    merged into a summary of the next level. Summaries are stored in memory
+    (and therefore in the write-ahead log) as soon as each one finishes, so
+    the work resumes where it left off after a restart. Raw messages are never
+    removed. A request in flight is abandoned as soon as a turn starts.
+    """
+
+    def __init__(self, memory, client, model, span=20, fanout=4, keep_recent=40,
+                 idle_delay=30, options=None, keep_alive=None):
+        self.memory = memory
+        self.client = client
+        self.model = model
+        self.span = span
+        self.fanout = fanout
+        self.keep_recent = keep_recent
+        self.idle_delay = idle_delay
+        self.options = options
+        self.keep_alive = keep_alive
+
+        self.busy = False
+        self.last_activity = time.time()
+        self._lock = threading.Lock()
+        # The active frontier, brought up to date as summaries are appended.
+        self._frontier_lock = threading.Lock()
+        self._source = None
+        self._seen = 0
+        self._active = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def begin_turn(self):
+        self.busy = True
+        self.last_activity = time.time()
+
+    def end_turn(self):
+        self.busy = False
+        self.last_activity = time.time()
+
+    def is_idle(self):
+        return not self.busy and time.time() - self.last_activity >= self.idle_delay
+
+    @property
+    def summaries(self):
+        return self.memory.memory.get("summaries", [])
+
+    def covered_end(self):
+        return max((s["end"] for s in self.summaries), default=0)
+
+    def active_summaries(self):
+        """Top-level summaries, oldest first, covering log[:covered_end()]."""
+        summaries = self.summaries
+        with self._frontier_lock:
+            if summaries is not self._source or len(summaries) < self._seen:
+                # Replaced by a reset or an import: start over.
+                self._source, self._seen, self._active = summaries, 0, []
+            count = len(summaries)
+            if self._seen < count:
+                for summary in summaries[self._seen:count]:
+                    self._add_to_frontier(summary)
+                self._seen = count
+                self._active.sort(key=lambda s: s["start"])
+            return list(self._active)
+
+    def _add_to_frontier(self, summary):
+        def covers(p, s):
+            return p["level"] > s["level"] and p["start"] <= s["start"] and s["end"] <= p["end"]
+
+        # Anything covering a superseded summary is covered by an active one.
+        if any(covers(p, summary) for p in self._active):
+            return
+        self._active = [s for s in self._active if not covers(summary, s)]
+        self._active.append(summary)
+
+    def next_job(self):
+        by_level = {}
+        for summary in self.active_summaries():
+            by_level.setdefault(summary["level"], []).append(summary)
+        for level in sorted(by_level):
+            if len(by_level[level]) >= self.fanout:
+                return ("merge", level + 1, by_level[level][:self.fanout])
+
+        start = self.covered_end()
+        archive_end = len(self.memory.memory["log"]) - self.keep_recent
+        if start + self.span <= archive_end:
+            return ("span", 0, (start, start + self.span))
+        return None
+
+    def step(self):
+        with self._lock:
+            return self._step()
+
+    def _step(self):
+        job = self.next_job()
+        if job is None:
+            return False
+        model = self.model() if callable(self.model) else self.model
+        if not model:
+            return False
+
+        kind, level, target = job
+        if kind == "span":
+            start, end = target
+            transcript = "\n".join(
+                f"{'User' if entry['role'] == 'user' else 'Stella'}: {entry['content']}"
+                for entry in self.memory.memory["log"][start:end]
+            )
+            text = self._summarize(model, SPAN_PROMPT, transcript)
+        else:
+            start, end = target[0]["start"], target[-1]["end"]
+            text = self._summarize(model, MERGE_PROMPT, "\n\n".join(s["text"] for s in target))
+
+        if text is None:
+            return False
+        self.memory.add_summary({"level": level, "start": start, "end": end, "text": text.strip()})
+        return True
+
+    def _summarize(self, model, instruction, text):
+        stream = self.client.chat(
+            model=model,
+            messages=[
+                {"role": "system", "content": instruction},
+                {"role": "user", "content": text},
+            ],
+            options=self.options() if callable(self.options) else self.options,
+            stream=True,
+            keep_alive=self.keep_alive() if callable(self.keep_alive) else self.keep_alive
+        )
+        parts = []
+        try:
+            for chunk in stream:
+                if self.busy:
+                    # The user is back; drop this attempt and redo it later.
+                    return None
+                parts.append(chunk["message"]["content"])
+        finally:
+            stream.close()
+        return "".join(parts)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stella-summarizer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(5):
+            if not self.is_idle():
+                continue
+            try:
+                while self.is_idle() and self.step():
+                    pass
+            except Exception:
+                pass
@@ -0,0 +1,46 @@
+from context_builder import ContextBuilder
+from memory_tiers import ColdSegments, TieredLog
+
+
+def entry(i):
+    return {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i} " + "word " * 20}
+
+
+def tiered_log(directory, total=5000, hot=500):
+    cold = ColdSegments(str(directory))
+    cold.spill([entry(i) for i in range(total - hot)])
+    return TieredLog(cold, [entry(i) for i in range(total - hot, total)], hot_messages=hot)
+
+
+def test_first_stable_turn_does_not_read_cold_blocks(tmp_path):
+    log = tiered_log(tmp_path / "memory.cold")
+    reads = []
+    block = log.cold.block
+    log.cold.block = lambda index: reads.append(index) or block(index)
+
+    builder = ContextBuilder(4096, reserve=512, stable=True)
+    system = [{"role": "system", "content": "You are Stella."}]
+    messages, stats = builder.build(system, log)
+
+    assert reads == []
+    assert builder.anchor >= log.cold_count
+    assert messages[-1]["content"] == entry(4999)["content"]
+    assert stats["history_tokens"] <= builder.budget
+
+
+def test_anchor_holds_until_the_window_overflows(tmp_path):
+    log = tiered_log(tmp_path / "memory.cold")
+    builder = ContextBuilder(4096, reserve=512, stable=True)
+    system = [{"role": "system", "content": "You are Stella."}]
+    builder.build(system, log)
+    anchor = builder.anchor
+
+    log.append(entry(5000))
+    builder.build(system, log)
+    assert builder.anchor == anchor
+
+    for i in range(5001, 5200):
+        log.append(entry(i))
+        _, stats = builder.build(system, log)
+        assert stats["total_tokens"] <= builder.budget
+    assert builder.anchor > anchor
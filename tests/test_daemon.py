@@ -0,0 +1,70 @@
+import asyncio
+import json
+import socket
+
+import daemon
+from config import DEFAULTS
+
+
+class Writer:
+    def __init__(self):
+        self.messages = []
+
+    def is_closing(self):
+        return False
+
+    def write(self, data):
+        self.messages.append(json.loads(data))
+
+
+def test_tcp_fallback_is_keyed_on_the_memory_directory(monkeypatch, tmp_path):
+    monkeypatch.delattr(socket, "AF_UNIX", raising=False)
+    config = {"daemon": dict(DEFAULTS["daemon"])}
+    first = daemon.default_address(config, str(tmp_path / "a"))
+    second = daemon.default_address(config, str(tmp_path / "b"))
+    assert first != second
+    assert first == daemon.default_address(config, str(tmp_path / "a"))
+
+    config["daemon"]["port"] = 12345
+    assert daemon.default_address(config, str(tmp_path / "a")) == ("127.0.0.1", 12345)
+
+
+def test_new_client_is_served_before_the_last_served_client():
+    async def order():
+        scheduler = daemon.Scheduler()
+        for i in range(3):
+            scheduler.submit({"client": "a", "id": f"a{i}"})
+        served = [(await scheduler.next())["id"]]
+        scheduler.submit({"client": "b", "id": "b0"})
+        while scheduler.waiting():
+            served.append((await scheduler.next())["id"])
+        return served
+
+    assert asyncio.run(order()) == ["a0", "b0", "a1", "a2"]
+
+
+def test_commands_run_on_the_daemon_and_their_output_goes_to_the_client():
+    class Stella:
+        def handle_command(self, text):
+            if text == "stats":
+                print("12 turns")
+                return True
+            return False
+
+    assert daemon.is_command("stats") and daemon.is_command("Recall tea")
+    assert not daemon.is_command("how are you?")
+
+    async def run():
+        server = daemon.StellaDaemon(Stella(), None)
+        worker = asyncio.create_task(server.worker())
+        writer = Writer()
+        server.handle_message(1, writer, {"type": "command", "id": "1", "text": "stats"})
+        server.handle_message(1, writer, {"type": "command", "id": "2", "text": "dance"})
+        while len([m for m in writer.messages if m["type"] != "queued"]) < 2:
+            await asyncio.sleep(0.01)
+        worker.cancel()
+        return [m for m in writer.messages if m["type"] != "queued"]
+
+    output, error = asyncio.run(run())
+    assert output == {"type": "output", "id": "1", "text": "12 turns\n"}
+    assert error["type"] == "error" and error["id"] == "2"
@@ -0,0 +1,62 @@
+import json
+import time
+
+import full
+from memory_store import MemoryStore
+
+
+def write_memory(path, count):
+    log = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"} for i in range(count)]
+    path.write_text(json.dumps({"log": log, "user_preferences": {}}))
+
+
+def open_memory(tmp_path, hot_messages=100):
+    return full.StellaMemory(memory_file=str(tmp_path / "memory.json"), journal_file=str(tmp_path / "journal.txt"),
+                             backend="json", hot_messages=hot_messages)
+
+
+def test_archiving_on_load_starts_once_memory_is_set(tmp_path, monkeypatch):
+    write_memory(tmp_path / "memory.json", 1000)
+    snapshots = []
+    # Take the snapshot right away, as a fast writer thread would.
+    monkeypatch.setattr(full.MemoryStore, "compact", lambda store, wait=True: snapshots.append(store.snapshot()))
+
+    open_memory(tmp_path).store.close()
+
+    assert [snapshot["cold"] for snapshot in snapshots] == [900]
+
+
+def test_oversized_memory_json_is_archived_on_load(tmp_path):
+    write_memory(tmp_path / "memory.json", 1000)
+
+    open_memory(tmp_path).close()
+
+    with open(tmp_path / "memory.json") as f:
+        state = json.load(f)
+    assert state["cold"] == 900
+    assert len(state["log"]) == 100
+    assert (tmp_path / "memory.cold").is_dir()
+
+
+def test_failed_compaction_is_reported_and_retried(tmp_path, capsys):
+    attempts = []
+
+    def snapshot():
+        attempts.append(None)
+        if len(attempts) == 1:
+            raise OSError("disk full")
+        return {"log": []}
+
+    store = MemoryStore(str(tmp_path / "memory.json"), snapshot=snapshot, fsync_interval=0)
+    store.RETRY_INTERVAL = 0.01
+    store.load({"log": []})
+    store.compact(wait=False)
+    deadline = time.monotonic() + 5
+    while len(attempts) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    store.close()
+
+    assert len(attempts) == 2
+    assert store.compact_error is None
+    assert "disk full" in capsys.readouterr().err
+    assert (tmp_path / "memory.json").exists()
@@ -0,0 +1,21 @@
+import random
+
+from metrics import percentile
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    random.Random(1).shuffle(values)
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile(values, 0) == 1
+
+
+def test_percentile_small_samples():
+    assert percentile([], 50) is None
+    assert percentile([7], 99) == 7
+    assert percentile([1, 2, 3, 4], 50) == 2
+    assert percentile([1, 2, 3, 4], 75) == 3
+    assert percentile([1, 2, 3, 4], 76) == 4
@@ -0,0 +1,19 @@
+import json
+
+import stella
+from memory_store import MemoryStore
+
+
+def test_migrate_refuses_while_a_chat_holds_memory(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "memory.json").write_text(json.dumps({"log": [], "user_preferences": {}}))
+    (tmp_path / "memory.db").write_text("keep me")
+    running = MemoryStore("memory.json")
+    running.load({"log": []})
+    try:
+        assert stella.migrate(force=True) == 1
+    finally:
+        running.close()
+
+    assert "Close the running Stella first" in capsys.readouterr().out
+    assert (tmp_path / "memory.db").read_text() == "keep me"
@@ -0,0 +1,39 @@
+from residency import ResidencyManager
+
+
+class Client:
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, model, prompt="", options=None, keep_alive=None):
+        self.calls.append(("generate", model, keep_alive))
+
+    def embed(self, model, input, keep_alive=None):
+        self.calls.append(("embed", model, keep_alive))
+
+
+def test_background_work_does_not_reload_models_after_an_idle_unload():
+    client = Client()
+    residency = ResidencyManager(client, "llama3", keep_alive="2h", embed_model="nomic-embed-text",
+                                 embed_keep_alive="5m", unload_after=0)
+    residency.warm()
+    assert residency.chat_keep_alive() == "2h"
+    assert residency.embed_keep_alive() == "5m"
+
+    residency.check()
+    assert ("embed", "nomic-embed-text", 0) in client.calls
+    assert ("generate", "llama3", 0) in client.calls
+    assert residency.chat_keep_alive() == 0
+    assert residency.embed_keep_alive() == 0
+
+    residency.touch("llama3")
+    assert residency.chat_keep_alive() == "2h"
+    assert residency.embed_keep_alive() == "5m"
+
+
+def test_unused_embedding_model_is_left_alone():
+    client = Client()
+    residency = ResidencyManager(client, "llama3", embed_model="nomic-embed-text")
+    residency.warm()
+    residency.unload()
+    assert [call[0] for call in client.calls] == ["generate", "generate"]
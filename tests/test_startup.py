@@ -0,0 +1,22 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use (a background thread, a database, the chat prompt),
+# never just by importing Stella; benchmarks/startup.py times the rest.
+HEAVY_MODULES = ("ollama", "httpx", "numpy", "prompt_toolkit", "sqlite3")
+
+
+@pytest.mark.parametrize("module", ["stella", "full"])
+def test_import_stays_off_heavy_modules(module, tmp_path):
+    code = (
+        f"import sys; sys.path.insert(0, {ROOT!r}); import {module}, json; "
+        f"print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))"
+    )
+    output = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, capture_output=True, text=True, check=True)
+    assert json.loads(output.stdout) == []
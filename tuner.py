@@ -0,0 +1,213 @@
+import json
+import os
+import statistics
+import time
+import uuid
+
+import hwprobe
+from context_builder import eval_stats
+from model_resolver import normalize_model_name
+
+TUNE_PASSAGE = (
+    "Stella keeps a small journal of the day. In the morning the user fixed a flaky build, "
+    "argued with a date parser and forgot to eat lunch. In the afternoon it rained, the music "
+    "got quieter and the commits got smaller. Stella noticed the long stretch without a break "
+    "and suggested a walk, some water and a stretch before the next meeting. "
+)
+TUNE_PROMPT = TUNE_PASSAGE * 8 + "\nIn two short paragraphs, tell the user how their day went and what to do next."
+
+# A typical turn: a well filled prompt window and a short reply.
+REFERENCE_PROMPT_TOKENS = 1000
+REFERENCE_REPLY_TOKENS = 150
+
+BATCH_SIZES = [32, 64, 128, 256, 512]
+CONTEXT_SIZES = [2048, 4096, 8192]
+
+
+def _profiles_file():
+    return os.path.join(hwprobe.cache_dir(), "profiles.json")
+
+
+def _read_profiles():
+    try:
+        with open(_profiles_file(), "r") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def load_profile(model, key=None):
+    """The tuned options for `model` on this machine, or None."""
+    if not model:
+        return None
+    key = key or hwprobe.fingerprint()
+    return _read_profiles().get(key, {}).get(normalize_model_name(model))
+
+
+def save_profile(model, profile, key=None):
+    key = key or hwprobe.fingerprint()
+    profiles = _read_profiles()
+    profiles.setdefault(key, {})[normalize_model_name(model)] = profile
+    path = _profiles_file()
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(profiles, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def thread_candidates(logical, physical=None):
+    candidates = {max(1, logical // 4), max(1, logical // 2), logical}
+    if physical:
+        candidates.add(physical)
+    return sorted(candidates)
+
+
+class Tuner:
+    """Sweeps num_thread, batch size and num_ctx on one model and keeps the fastest.
+
+    Each setting is measured on a fixed prompt after a warm-up request (a
+    changed num_thread, num_batch or num_ctx makes Ollama reload the model).
+    Every run starts with a fresh nonce so no cached prompt prefix is reused.
+    The options are tuned one after the other, each keeping the best value
+    found so far, scored by the time a reference turn would take. For num_ctx
+    the largest window within `ctx_tolerance` of the fastest one wins, since
+    a larger window is worth a little speed.
+    """
+
+    def __init__(self, backend, model, base_options, threads=None, batch_sizes=None,
+                 context_sizes=None, num_predict=64, repeats=2, ctx_tolerance=0.1, report=print):
+        self.backend = backend
+        self.model = model
+        self.base_options = dict(base_options)
+        self.threads = threads or thread_candidates(os.cpu_count() or 1)
+        self.batch_sizes = batch_sizes or BATCH_SIZES
+        self.context_sizes = context_sizes or CONTEXT_SIZES
+        self.num_predict = num_predict
+        self.repeats = repeats
+        self.ctx_tolerance = ctx_tolerance
+        self.report = report
+        self.results = []
+
+    def _run(self, options, num_predict):
+        stream = self.backend.chat(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": f"Benchmark run {uuid.uuid4().hex}."},
+                {"role": "user", "content": TUNE_PROMPT},
+            ],
+            options={**options, "num_predict": num_predict, "temperature": 0},
+            stream=True
+        )
+        stats = {}
+        try:
+            for chunk in stream:
+                if chunk.get("done"):
+                    stats = eval_stats(chunk)
+        finally:
+            stream.close()
+        return stats
+
+    def measure(self, options):
+        self._run(options, 1)
+        prompt_rates = []
+        eval_rates = []
+        for _ in range(self.repeats):
+            stats = self._run(options, self.num_predict)
+            if stats.get("prompt_eval_count") and stats.get("prompt_eval_duration"):
+                prompt_rates.append(stats["prompt_eval_count"] / stats["prompt_eval_duration"] * 1e9)
+            if stats.get("eval_count") and stats.get("eval_duration"):
+                eval_rates.append(stats["eval_count"] / stats["eval_duration"] * 1e9)
+        if not prompt_rates or not eval_rates:
+            raise RuntimeError("the server did not report timings")
+
+        prompt_rate = statistics.median(prompt_rates)
+        eval_rate = statistics.median(eval_rates)
+        return {
+            "prompt_tokens_per_second": prompt_rate,
+            "eval_tokens_per_second": eval_rate,
+            "turn_seconds": REFERENCE_PROMPT_TOKENS / prompt_rate + REFERENCE_REPLY_TOKENS / eval_rate,
+        }
+
+    def _sweep(self, options, name, values):
+        measured = []
+        for value in values:
+            candidate = {**options, name: value}
+            try:
+                result = self.measure(candidate)
+            except Exception as e:
+                self.report(f"  {name}={value}: failed ({e})")
+                continue
+            self.report(
+                f"  {name}={value}: prompt {result['prompt_tokens_per_second']:.1f} tok/s, "
+                f"generation {result['eval_tokens_per_second']:.1f} tok/s"
+            )
+            self.results.append({"options": candidate, **result})
+            measured.append((value, result))
+        return measured
+
+    def tune(self):
+        options = dict(self.base_options)
+        best = None
+
+        for name, values in (("num_thread", self.threads), ("batch_size", self.batch_sizes)):
+            measured = self._sweep(options, name, values)
+            if measured:
+                value, best = min(measured, key=lambda item: item[1]["turn_seconds"])
+                options[name] = value
+
+        measured = self._sweep(options, "num_ctx", self.context_sizes)
+        if measured:
+            fastest = min(result["turn_seconds"] for _, result in measured)
+            value, best = max(
+                (item for item in measured if item[1]["turn_seconds"] <= fastest * (1 + self.ctx_tolerance)),
+                key=lambda item: item[0]
+            )
+            options["num_ctx"] = value
+
+        if best is None:
+            return None
+        return {
+            "num_thread": options["num_thread"],
+            "batch_size": options["batch_size"],
+            "num_ctx": options["num_ctx"],
+            "prompt_tokens_per_second": round(best["prompt_tokens_per_second"], 2),
+            "eval_tokens_per_second": round(best["eval_tokens_per_second"], 2),
+            "tuned_at": time.time(),
+        }
+
+
+def main(model=None, reprobe=False):
+    """`stella tune`: measure this machine and store the best profile."""
+    import psutil
+
+    from backends import create_backend
+    from config import load_config
+    from full import Stella, SystemCapabilities
+    from model_resolver import ModelResolver
+
+    config = load_config()
+    backend = create_backend(config["backend"])
+    system_config = SystemCapabilities(reprobe=reprobe)
+    model = model or ModelResolver(config["backend"]["models"] or Stella.MODELS, backend).resolve()
+    if not model:
+        print("No installed model to tune. Pull one first, e.g. ollama pull llama3.2:3b")
+        return 1
+
+    logical = os.cpu_count() or 1
+    tuner = Tuner(
+        backend, model, system_config.get_ollama_options(),
+        threads=thread_candidates(logical, psutil.cpu_count(logical=False))
+    )
+    print(f"Tuning {model}. This loads the model several times and can take a few minutes.")
+    profile = tuner.tune()
+    if profile is None:
+        print("Could not measure any setting; is the model server running?")
+        return 1
+
+    save_profile(model, profile, system_config.fingerprint)
+    print(
+        f"\nBest for {model}: num_thread={profile['num_thread']}, batch_size={profile['batch_size']}, "
+        f"num_ctx={profile['num_ctx']} (prompt {profile['prompt_tokens_per_second']:.1f} tok/s, "
+        f"generation {profile['eval_tokens_per_second']:.1f} tok/s)"
+    )
+    print("Stella will use these settings automatically with this model on this machine.")
+    return 0